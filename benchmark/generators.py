@@ -0,0 +1,98 @@
+'''
+Synthetic menu graphs for benchmarking.
+
+Every generator returns a list of menu node dictionaries in the menunodes.json format, including the special
+CONFIRMATION, YES, NO and OUTPUT nodes. All execution nodes use the BENCH executor node, see executor_nodes().
+'''
+
+import json, random
+from typing import Dict, List
+
+BENCH_EXECUTOR_ID = "BENCH"
+BENCH_METHOD_NAME = "bench_method"
+BENCH_SCRIPT_EXECUTOR_ID = "BENCH_SCRIPT"
+BENCH_SCRIPT_NAME = "bench.sh"
+
+
+def special_menu_nodes() -> List[Dict]:
+    return [
+        {"_id_": "CONFIRMATION", "type": "selection",
+         "selectionOptions": [{"menuNodeId": "YES", "displayName": "Yes"}, {"menuNodeId": "NO", "displayName": "No"}]},
+        {"_id_": "YES", "type": "execution", "executorNodeId": "YES"},
+        {"_id_": "NO", "type": "execution", "executorNodeId": "NO"},
+        {"_id_": "OUTPUT", "type": "output"},
+    ]
+
+
+def executor_nodes() -> List[Dict]:
+    return [
+        {"_id_": "YES", "type": "method", "name": "handle_confirmation_yes"},
+        {"_id_": "NO", "type": "method", "name": "handle_confirmation_no", "destinationOverride": "lastSelectOptionMenu"},
+        {"_id_": BENCH_EXECUTOR_ID, "type": "method", "name": BENCH_METHOD_NAME},
+        {"_id_": BENCH_SCRIPT_EXECUTOR_ID, "type": "script", "name": BENCH_SCRIPT_NAME},
+    ]
+
+
+def _selection_node(menuNodeId: str, targetIds: List[str]) -> Dict:
+    return {"_id_": menuNodeId, "type": "selection",
+            "selectionOptions": [{"menuNodeId": targetId, "displayName": "Option "+targetId} for targetId in targetIds]}
+
+
+def _execution_node(menuNodeId: str) -> Dict:
+    return {"_id_": menuNodeId, "type": "execution", "executorNodeId": BENCH_EXECUTOR_ID}
+
+
+def wide_menu_nodes(numNodes: int) -> List[Dict]:
+    '''
+    A root menu with one execution node per option, i.e. a single very long selection menu.
+    '''
+    leafIds = ["E"+str(i) for i in range(max(numNodes-1, 1))]
+    return special_menu_nodes() + [_selection_node("ROOT", leafIds)] + [_execution_node(leafId) for leafId in leafIds]
+
+
+def deep_menu_nodes(numNodes: int) -> List[Dict]:
+    '''
+    A chain of selection menus, each with an option to go one level deeper and an option to execute.
+    '''
+    depth = max(numNodes//2, 1)
+    ids = ["ROOT"] + ["S"+str(i) for i in range(1, depth)]
+    menunodes = special_menu_nodes()
+    for level, menuNodeId in enumerate(ids):
+        targetIds = ["E"+str(level)]
+        if level+1 < depth:
+            targetIds.insert(0, ids[level+1])
+        menunodes.append(_selection_node(menuNodeId, targetIds))
+        menunodes.append(_execution_node("E"+str(level)))
+    return menunodes
+
+
+def random_dag_menu_nodes(numNodes: int, maxOptions: int = 8, seed: int = 0) -> List[Dict]:
+    '''
+    A random directed acyclic graph. Half of the nodes are selection menus whose options only point to nodes with
+    a higher index, the other half are execution nodes. Menus may be shared by several parents.
+    '''
+    rng = random.Random(seed)
+    numSelection = max(numNodes//2, 1)
+    numNodes = max(numNodes, numSelection+1)
+    ids = ["ROOT"] + ["S"+str(i) for i in range(1, numSelection)] + ["E"+str(i) for i in range(numSelection, numNodes)]
+
+    menunodes = special_menu_nodes()
+    for index in range(numSelection):
+        numOptions = rng.randint(1, min(maxOptions, numNodes-index-1))
+        targetIndexes = rng.sample(range(index+1, numNodes), numOptions)
+        menunodes.append(_selection_node(ids[index], [ids[targetIndex] for targetIndex in targetIndexes]))
+    for index in range(numSelection, numNodes):
+        menunodes.append(_execution_node(ids[index]))
+    return menunodes
+
+
+GENERATORS = {
+    'wide': wide_menu_nodes,
+    'deep': deep_menu_nodes,
+    'dag': random_dag_menu_nodes,
+}
+
+
+def write_json(nodes: List[Dict], filename: str):
+    with open(filename, "w") as json_file:
+        json.dump(nodes, json_file)
@@ -0,0 +1,40 @@
+import random
+from typing import List
+
+from menu.action.menuaction import MenuAction
+from menu.menus import Menus, MenuNode, MenuNodeType, Navigator
+
+
+def random_walk(menus: Menus, numActions: int, seed: int = 0) -> List[MenuAction.Action]:
+    '''
+    Returns a random but valid sequence of actions for a menu graph, as a user scrolling through menus and
+    running executions would produce. Executions are assumed to return home, output nodes are left with HOME.
+    '''
+    rng = random.Random(seed)
+    navigator = Navigator(menus)
+    actions = []
+    while len(actions) < numActions:
+        menunode = navigator.current_menu_node
+        if menunode.type != MenuNodeType.SELECTION:
+            action = MenuAction.Action.HOME
+        else:
+            action = rng.choices([MenuAction.Action.DOWN, MenuAction.Action.UP, MenuAction.Action.SELECT], weights=[6, 2, 2])[0]
+        actions.append(action)
+
+        match action:
+            case MenuAction.Action.DOWN:
+                navigator.scroll_down()
+            case MenuAction.Action.UP:
+                navigator.scroll_up()
+            case MenuAction.Action.SELECT:
+                navigator.navigate_to_selected_option()
+            case MenuAction.Action.HOME:
+                navigator.home()
+
+        menunode = navigator.current_menu_node
+        if menunode.type == MenuNodeType.EXECUTION:
+            if menunode.is_confirm:
+                navigator.navigate_to_confirmation_menu()
+            else:
+                navigator.home()
+    return actions
@@ -0,0 +1,120 @@
+import json, math, time, tracemalloc
+from typing import Callable, Dict, List
+
+
+def percentile(samples: List[float], percent: float) -> float:
+    '''
+    Nearest-rank percentile of a list of samples.
+    '''
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(percent/100.0*len(ordered)), 1)
+    return ordered[min(rank, len(ordered))-1]
+
+
+class BenchmarkResult(object):
+    '''
+    Timings of one benchmark. samples are the seconds taken by each operation.
+    '''
+    def __init__(self, name: str, samples: List[float], peakMemory: int = None):
+        self._name = name
+        self._samples = samples
+        self._peakMemory = peakMemory
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def samples(self) -> List[float]:
+        return self._samples
+
+    @property
+    def peak_memory(self) -> int:
+        return self._peakMemory
+
+    @property
+    def operations_per_second(self) -> float:
+        total = sum(self._samples)
+        return len(self._samples)/total if total > 0 else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            'name': self._name,
+            'operations': len(self._samples),
+            'opsPerSecond': self.operations_per_second,
+            'p50': percentile(self._samples, 50),
+            'p95': percentile(self._samples, 95),
+            'p99': percentile(self._samples, 99),
+            'max': max(self._samples) if self._samples else 0.0,
+            'peakMemory': self._peakMemory,
+        }
+
+
+def time_operation(operation: Callable, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter()-start)
+    return samples
+
+
+def peak_memory(operation: Callable) -> int:
+    '''
+    Peak number of bytes allocated by python while running the operation once. Measured separately from the
+    timings since tracing allocations slows everything down.
+    '''
+    tracemalloc.start()
+    try:
+        operation()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def retained_memory(build: Callable) -> int:
+    '''
+    Number of bytes still allocated by python after build() returns, i.e. the size of what it built and
+    returned. Temporary allocations made while building are not counted.
+    '''
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        built = build()
+        size = tracemalloc.get_traced_memory()[0]-before
+        del built
+        return size
+    finally:
+        tracemalloc.stop()
+
+
+def save_baseline(results: List[BenchmarkResult], filename: str):
+    with open(filename, "w") as baseline_file:
+        json.dump({result.name: result.as_dict() for result in results}, baseline_file, indent=4)
+
+
+def load_baseline(filename: str) -> Dict[str, Dict]:
+    with open(filename, "r") as baseline_file:
+        return json.load(baseline_file)
+
+
+def compare_to_baseline(results: List[BenchmarkResult], baseline: Dict[str, Dict], tolerance: float = 0.1) -> List[str]:
+    '''
+    Returns a description of every regression: throughput dropping, or p95 latency or peak memory growing, by
+    more than the tolerance (a fraction) compared to the baseline. Benchmarks missing from the baseline are skipped.
+    '''
+    regressions = []
+    for result in results:
+        if result.name not in baseline:
+            continue
+        current = result.as_dict()
+        previous = baseline[result.name]
+        if previous['opsPerSecond'] and current['opsPerSecond'] < previous['opsPerSecond']*(1-tolerance):
+            regressions.append("%s: %.1f ops/s, baseline %.1f ops/s" % (result.name, current['opsPerSecond'], previous['opsPerSecond']))
+        if previous['p95'] and current['p95'] > previous['p95']*(1+tolerance):
+            regressions.append("%s: p95 %.4f ms, baseline %.4f ms" % (result.name, current['p95']*1000, previous['p95']*1000))
+        if previous.get('peakMemory') and current['peakMemory'] and current['peakMemory'] > previous['peakMemory']*(1+tolerance):
+            regressions.append("%s: peak memory %d bytes, baseline %d bytes" % (result.name, current['peakMemory'], previous['peakMemory']))
+    return regressions
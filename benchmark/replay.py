@@ -0,0 +1,103 @@
+'''
+Replays a recorded action log against a menu on a headless display and reports the latency of every action,
+e.g. to reproduce a slowdown reported from the field under CI.
+
+    python -m benchmark.replay session.log menuservice/menunodes.json menuservice/executors.json --scripts menuservice/scripts
+    python -m benchmark.replay session.log menunodes.json executors.json --fast --max-p95 0.05
+
+Actions are replayed with their recorded timing (idle periods shortened to --max-delay seconds) or, with
+--fast, each as soon as the previous one is displayed. Registered methods belong to the service that runs the
+menu, so method executor nodes are replaced by methods that do nothing. The replayed session can be written
+to another action log with --output and replayed again. With --max-p95 the exit status is non-zero if the 95th
+percentile latency is higher.
+'''
+
+import argparse, logging, os, sys, tempfile
+from pathlib import Path
+from typing import List
+
+from menu.action.replaymenuaction import ReplayMenuAction, RecordingQueue, ActionRecord, read_action_log
+from menu.display.headless import HeadlessDisplay
+from menu.menus import Menus, Navigator, Executor, ExecutorNodeType
+from menu.menusystem import MenuSystem
+from .metrics import BenchmarkResult, percentile
+
+SLOWEST_ACTIONS = 5
+
+
+def _register_stub_methods(executor: Executor):
+    for executorNode in executor.executor_nodes.values():
+        if executorNode.executor_type == ExecutorNodeType.METHOD:
+            def stub(**kwargs):
+                return None
+            stub.__name__ = executorNode.name
+            executor.register_method(stub)
+
+
+def replay(records: List[ActionRecord], menuNodesFilename: str, executorsFilename: str, scriptsLocation: str = '.',
+           realTime: bool = True, speed: float = 1.0, maxDelay: float = None, outputFilename: str = None) -> List[ActionRecord]:
+    '''
+    Replays the records through a MenuSystem and returns the replayed actions with their latencies.
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        if outputFilename is None:
+            outputFilename = os.path.join(directory, "replay.log")
+        menus = Menus(menuNodesFilename)
+        executor = Executor(executorsFilename, Path(scriptsLocation))
+        _register_stub_methods(executor)
+        actionQueue = RecordingQueue(outputFilename)
+        menuAction = ReplayMenuAction(actionQueue, records, realTime, speed, maxDelay)
+        menuSystem = MenuSystem(menus, executor, Navigator(menus), HeadlessDisplay(maxFrames=0), actionQueue, menuAction)
+        try:
+            menuSystem.run()
+        finally:
+            actionQueue.close()
+            executor.shutdown()
+        return read_action_log(outputFilename)
+
+
+def format_report(recorded: List[ActionRecord], replayed: List[ActionRecord]) -> str:
+    lines = ["%-10s %8s %10s %10s %10s %10s" % ("session", "actions", "p50 ms", "p95 ms", "p99 ms", "max ms")]
+    for name, records in (("recorded", recorded), ("replayed", replayed)):
+        latencies = [record.latency for record in records if record.latency is not None]
+        if latencies:
+            result = BenchmarkResult(name, latencies).as_dict()
+            lines.append("%-10s %8d %10.3f %10.3f %10.3f %10.3f" % (name, len(latencies), result['p50']*1000, result['p95']*1000,
+                                                                   result['p99']*1000, result['max']*1000))
+    slowest = sorted(range(len(replayed)), key=lambda position: -(replayed[position].latency or 0.0))[:SLOWEST_ACTIONS]
+    for position in sorted(slowest):
+        lines.append("slow action %d %s at %.3fs: %.3f ms" % (position+1, replayed[position].action.name, replayed[position].timestamp,
+                                                             (replayed[position].latency or 0.0)*1000))
+    return "\n".join(lines)
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a recorded action log and report action latencies")
+    parser.add_argument('log', help="action log recorded with a RecordingQueue")
+    parser.add_argument('menunodes', help="menu nodes json file")
+    parser.add_argument('executors', help="executors json file")
+    parser.add_argument('--scripts', default='.', help="scripts directory")
+    parser.add_argument('--fast', action='store_true', help="send each action as soon as the previous one is displayed")
+    parser.add_argument('--speed', type=float, default=1.0, help="replay speed factor of the recorded timing")
+    parser.add_argument('--max-delay', type=float, default=5.0, help="longest idle period in seconds replayed with recorded timing")
+    parser.add_argument('--output', help="write the replayed session to this action log")
+    parser.add_argument('--max-p95', type=float, help="fail if the 95th percentile latency in seconds is higher")
+    parsedArgs = parser.parse_args(args)
+
+    logging.disable(logging.INFO)
+
+    recorded = read_action_log(parsedArgs.log)
+    replayed = replay(recorded, parsedArgs.menunodes, parsedArgs.executors, parsedArgs.scripts, not parsedArgs.fast,
+                      parsedArgs.speed, parsedArgs.max_delay, parsedArgs.output)
+    print(format_report(recorded, replayed))
+
+    if parsedArgs.max_p95 is not None:
+        p95 = percentile([record.latency for record in replayed if record.latency is not None], 95)
+        if p95 > parsedArgs.max_p95:
+            print("REGRESSION p95 latency %.3f ms exceeds %.3f ms" % (p95*1000, parsedArgs.max_p95*1000))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,297 @@
+'''
+Benchmarks for the navigation, rendering and execution hot paths.
+
+    python -m benchmark.run --graph dag --nodes 100000
+    python -m benchmark.run --save-baseline baseline.json
+    python -m benchmark.run --baseline baseline.json
+
+Reports operations per second, per operation latency percentiles, peak memory and the memory held per loaded
+menu node. With --baseline the run is compared to a stored baseline and exits with a non-zero status if
+anything regressed by more than --tolerance.
+'''
+
+import argparse, logging, os, random, sys, tempfile
+from pathlib import Path
+from queue import Queue
+from typing import Callable, List
+
+from menu.menus import Menus, Navigator, Executor
+from menu.action.replaymenuaction import ActionRecord, ReplayMenuAction
+from menu.menusystem import MenuSystem
+from menu.display.headless import HeadlessDisplay
+from menu.shellpool import ShellPool
+from .generators import GENERATORS, BENCH_EXECUTOR_ID, BENCH_METHOD_NAME, BENCH_SCRIPT_EXECUTOR_ID, BENCH_SCRIPT_NAME, executor_nodes, write_json
+from .harness import random_walk
+from .metrics import BenchmarkResult, time_operation, peak_memory, retained_memory, save_baseline, load_baseline, compare_to_baseline
+
+OUTPUT_TEXT = "benchmark output line\n"*200
+BENCH_SCRIPT = "#!/bin/sh\necho benchmark\n"
+
+
+def bench_method(**kwargs):
+    return None
+
+
+class BenchmarkContext(object):
+    '''
+    Generated menu and executor files for one benchmark run.
+    '''
+    def __init__(self, directory: str, graph: str, numNodes: int, seed: int):
+        self.menuNodesFilename = os.path.join(directory, "menunodes.json")
+        self.executorsFilename = os.path.join(directory, "executors.json")
+        generator = GENERATORS[graph]
+        menunodes = generator(numNodes, seed=seed) if graph == 'dag' else generator(numNodes)
+        write_json(menunodes, self.menuNodesFilename)
+        write_json(executor_nodes(), self.executorsFilename)
+        scriptFilename = os.path.join(directory, BENCH_SCRIPT_NAME)
+        with open(scriptFilename, "w") as script_file:
+            script_file.write(BENCH_SCRIPT)
+        os.chmod(scriptFilename, 0o755)
+        self.scriptsLocation = Path(directory)
+        self.menus = Menus(self.menuNodesFilename)
+        self.seed = seed
+
+    def create_executor(self, shellPool: ShellPool = None) -> Executor:
+        executor = Executor(self.executorsFilename, self.scriptsLocation, shellPool=shellPool)
+        executor.register_method(bench_method)
+        return executor
+
+
+def bench_menus_load(context: BenchmarkContext, repeat: int) -> Callable:
+    return lambda: time_operation(lambda: Menus(context.menuNodesFilename), repeat)
+
+
+def bench_scroll_down(context: BenchmarkContext, repeat: int) -> Callable:
+    def run():
+        navigator = Navigator(context.menus)
+        numOptions = len(context.menus.get_root_menu_node().selection_options)
+        def operation():
+            if navigator.cursor_position == numOptions-1:
+                navigator.home()
+            navigator.scroll_down()
+        return time_operation(operation, repeat)
+    return run
+
+
+def bench_navigate(context: BenchmarkContext, repeat: int) -> Callable:
+    def run():
+        navigator = Navigator(context.menus)
+        def operation():
+            navigator.navigate_to_selected_option()
+            navigator.home()
+        return time_operation(operation, repeat)
+    return run
+
+
+def bench_page_down(context: BenchmarkContext, repeat: int) -> Callable:
+    '''
+    Pages through the root menu and renders the window, wrapping to the top at the end.
+    '''
+    def run():
+        navigator = Navigator(context.menus)
+        display = HeadlessDisplay(maxFrames=0)
+        numOptions = len(context.menus.get_root_menu_node().selection_options)
+        def operation():
+            if navigator.cursor_position == numOptions-1:
+                navigator.top()
+            else:
+                navigator.page_down(display.num_rows)
+            display.display_menu(navigator.current_menu_node, navigator.cursor_position)
+        return time_operation(operation, repeat)
+    return run
+
+
+def bench_jump_to(context: BenchmarkContext, repeat: int) -> Callable:
+    '''
+    Jumps to random menu nodes. The index is built on a fresh Menus by the first jumps, as in a running service.
+    '''
+    def run():
+        menus = Menus.from_menu_nodes(context.menus.menu_nodes, context.menus.get_root_menu_node().id)
+        navigator = Navigator(menus)
+        rng = random.Random(context.seed)
+        menuNodeIds = list(menus.menu_nodes.keys())
+        return time_operation(lambda: navigator.jump_to(rng.choice(menuNodeIds)), repeat)
+    return run
+
+
+def bench_search(context: BenchmarkContext, repeat: int) -> Callable:
+    def run():
+        navigator = Navigator(context.menus)
+        navigator.search("")
+        rng = random.Random(context.seed)
+        prefixes = [selectionOption.display_name[:rng.randint(1, 10)] for selectionOption in navigator.search("", limit=1000)]
+        return time_operation(lambda: navigator.search(rng.choice(prefixes)), repeat)
+    return run
+
+
+def bench_render_selection(context: BenchmarkContext, repeat: int) -> Callable:
+    def run():
+        display = HeadlessDisplay(maxFrames=0)
+        selectionOptions = context.menus.get_root_menu_node().selection_options
+        numOptions = len(selectionOptions)
+        cursor = [0]
+        def operation():
+            cursorPos = cursor[0] % numOptions
+            windowTop = max(cursorPos-display.num_rows+1, 0)
+            display.prepare_selection_menu_display_buffer(selectionOptions, windowTop, windowTop+display.num_rows-1, cursorPos)
+            cursor[0] += 1
+        return time_operation(operation, repeat)
+    return run
+
+
+def bench_render_output(context: BenchmarkContext, repeat: int) -> Callable:
+    def run():
+        display = HeadlessDisplay(maxFrames=0)
+        return time_operation(lambda: display.prepare_output_display_buffer(OUTPUT_TEXT, display.num_rows, display.num_columns), repeat)
+    return run
+
+
+def bench_execute(context: BenchmarkContext, repeat: int) -> Callable:
+    def run():
+        executor = context.create_executor()
+        return time_operation(lambda: executor.execute(BENCH_EXECUTOR_ID), repeat)
+    return run
+
+
+def bench_execute_script(context: BenchmarkContext, repeat: int) -> Callable:
+    '''
+    A short shell script started with subprocess.check_output() for every execution.
+    '''
+    def run():
+        executor = context.create_executor()
+        return time_operation(lambda: executor.execute(BENCH_SCRIPT_EXECUTOR_ID), repeat)
+    return run
+
+
+def bench_execute_shell_pool(context: BenchmarkContext, repeat: int) -> Callable:
+    '''
+    The same script run on a pre-spawned shell of a ShellPool.
+    '''
+    def run():
+        executor = context.create_executor(ShellPool(size=1))
+        executor._shellPool.start()
+        try:
+            return time_operation(lambda: executor.execute(BENCH_SCRIPT_EXECUTOR_ID), repeat)
+        finally:
+            executor.shutdown()
+    return run
+
+
+def bench_keypress(context: BenchmarkContext, repeat: int) -> Callable:
+    '''
+    End to end: scripted actions through a MenuSystem event loop to the display, one keypress at a time.
+    '''
+    records = [ActionRecord(0.0, action) for action in random_walk(context.menus, repeat, context.seed)]
+    def run():
+        actionQueue = Queue()
+        menuAction = ReplayMenuAction(actionQueue, records, realTime=False)
+        menuSystem = MenuSystem(context.menus, context.create_executor(), Navigator(context.menus), HeadlessDisplay(maxFrames=0), actionQueue, menuAction)
+        menuSystem.run()
+        return menuAction.latencies
+    return run
+
+
+def bench_action(context: BenchmarkContext, repeat: int) -> Callable:
+    '''
+    Like keypress but the actions are handed to the MenuSystem directly on this thread, each followed by a frame
+    on a headless display, so the result is the cost of one action without any thread handoffs.
+    '''
+    actions = random_walk(context.menus, repeat, context.seed)
+    def run():
+        display = HeadlessDisplay(maxFrames=0)
+        menuSystem = MenuSystem(context.menus, context.create_executor(), Navigator(context.menus), display, Queue(), None)
+        actionIterator = iter(actions)
+        def operation():
+            menuSystem.process_actions([next(actionIterator)])
+            menuSystem.display()
+        return time_operation(operation, len(actions))
+    return run
+
+
+BENCHMARKS = [
+    ('menus_load', bench_menus_load, 0.01),
+    ('scroll_down', bench_scroll_down, 1),
+    ('navigate', bench_navigate, 1),
+    ('page_down', bench_page_down, 1),
+    ('jump_to', bench_jump_to, 1),
+    ('search', bench_search, 1),
+    ('render_selection', bench_render_selection, 1),
+    ('render_output', bench_render_output, 1),
+    ('execute', bench_execute, 1),
+    ('execute_script', bench_execute_script, 0.01),
+    ('execute_shell_pool', bench_execute_shell_pool, 0.01),
+    ('action', bench_action, 1),
+    ('keypress', bench_keypress, 0.1),
+]
+
+
+def run_benchmarks(context: BenchmarkContext, repeat: int, names: List[str] = None, measureMemory: bool = True) -> List[BenchmarkResult]:
+    '''
+    Runs the named benchmarks (all by default). repeat is scaled down for the slow benchmarks.
+    '''
+    results = []
+    for name, benchmark, scale in BENCHMARKS:
+        if names and name not in names:
+            continue
+        count = max(int(repeat*scale), 1)
+        samples = benchmark(context, count)()
+        peak = peak_memory(benchmark(context, max(count//10, 1))) if measureMemory else None
+        results.append(BenchmarkResult(name, samples, peak))
+    return results
+
+
+def menus_bytes_per_node(context: BenchmarkContext) -> float:
+    '''
+    Bytes of python memory held by a loaded Menus per menu node.
+    '''
+    return retained_memory(lambda: Menus(context.menuNodesFilename))/len(context.menus.menu_nodes)
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    lines = ["%-18s %8s %12s %10s %10s %10s %12s" % ("benchmark", "ops", "ops/s", "p50 ms", "p95 ms", "p99 ms", "peak KiB")]
+    for result in results:
+        values = result.as_dict()
+        peak = "%.1f" % (values['peakMemory']/1024) if values['peakMemory'] is not None else "-"
+        lines.append("%-18s %8d %12.1f %10.4f %10.4f %10.4f %12s" % (values['name'], values['operations'], values['opsPerSecond'],
+                     values['p50']*1000, values['p95']*1000, values['p99']*1000, peak))
+    return "\n".join(lines)
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the menu system hot paths")
+    parser.add_argument('--graph', choices=sorted(GENERATORS.keys()), default='dag', help="shape of the generated menu graph")
+    parser.add_argument('--nodes', type=int, default=10000, help="number of generated menu nodes")
+    parser.add_argument('--repeat', type=int, default=10000, help="operations per benchmark")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', action='append', help="run only the named benchmark, can be repeated")
+    parser.add_argument('--no-memory', action='store_true', help="skip peak memory measurements")
+    parser.add_argument('--baseline', help="compare against a baseline file")
+    parser.add_argument('--save-baseline', help="write the results to a baseline file")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="allowed regression as a fraction of the baseline")
+    parsedArgs = parser.parse_args(args)
+
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as directory:
+        context = BenchmarkContext(directory, parsedArgs.graph, parsedArgs.nodes, parsedArgs.seed)
+        results = run_benchmarks(context, parsedArgs.repeat, parsedArgs.only, not parsedArgs.no_memory)
+        bytesPerNode = menus_bytes_per_node(context) if not parsedArgs.no_memory else None
+
+    print(format_results(results))
+    if bytesPerNode is not None:
+        print("menus memory: %.1f bytes per menu node" % bytesPerNode)
+
+    if parsedArgs.save_baseline:
+        save_baseline(results, parsedArgs.save_baseline)
+
+    if parsedArgs.baseline:
+        regressions = compare_to_baseline(results, load_baseline(parsedArgs.baseline), parsedArgs.tolerance)
+        for regression in regressions:
+            print("REGRESSION "+regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
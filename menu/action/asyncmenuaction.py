@@ -0,0 +1,101 @@
+import asyncio, logging, sys
+from abc import ABC, abstractmethod
+
+from .menuaction import MenuAction
+from .keyboardmenuaction import KeyboardMenuAction
+
+class AsyncMenuAction(ABC):
+    '''
+    asyncio version of MenuAction. Instead of putting actions on a queue, an AsyncMenuAction is an async iterator
+    of MenuAction.Action values. Iteration ends when the MenuAction is stopped.
+    '''
+
+    def __aiter__(self):
+        return self
+
+    @abstractmethod
+    async def __anext__(self) -> MenuAction.Action:
+        pass
+
+    @abstractmethod
+    async def start(self):
+        pass
+
+    @abstractmethod
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    def map_input_to_action(self, value) -> MenuAction.Action:
+        pass
+
+
+class AsyncQueueMenuAction(AsyncMenuAction):
+    '''
+    An AsyncMenuAction fed through put(), which is safe to call from any thread. It can be passed as the action
+    queue of a threaded input source, e.g. the GPIO callbacks of RPiButtonBoardMenuAction, to bring its actions
+    into the event loop.
+    '''
+
+    _STOPPED = object()
+
+    def __init__(self):
+        self._queue = asyncio.Queue()
+        self._loop = None
+
+    async def __anext__(self) -> MenuAction.Action:
+        action = await self._queue.get()
+        if action is self._STOPPED:
+            self._queue.put_nowait(self._STOPPED) # keep signalling any other waiter
+            raise StopAsyncIteration
+        return action
+
+    def put(self, action: MenuAction.Action):
+        if self._loop is None:
+            logging.warning("Action received before the menu action was started: "+str(action))
+            return
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, action)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        self._queue.put_nowait(self._STOPPED)
+
+    def map_input_to_action(self, value) -> MenuAction.Action:
+        return value
+
+
+class AsyncKeyboardMenuAction(AsyncQueueMenuAction):
+    '''
+    asyncio version of KeyboardMenuAction. Lines read from stdin are mapped to actions using the same keys as
+    KeyboardMenuAction. stdin is watched by the event loop, no input thread is needed.
+    '''
+
+    map_input_to_action = KeyboardMenuAction.map_input_to_action
+
+    def __init__(self, inputStream = None):
+        super().__init__()
+        self._inputStream = inputStream if inputStream is not None else sys.stdin
+
+    def _read_input(self):
+        line = self._inputStream.readline()
+        if not line:
+            # end of input
+            self._queue.put_nowait(MenuAction.Action.QUIT)
+            self._loop.remove_reader(self._inputStream.fileno())
+            return
+        charVal = line.strip()
+        logging.info("Got character input: %s", charVal)
+        self._queue.put_nowait(self.map_input_to_action(charVal))
+
+    async def start(self):
+        logging.info("Async Keyboard Menu Action starting")
+        await super().start()
+        self._loop.add_reader(self._inputStream.fileno(), self._read_input)
+
+    async def stop(self):
+        logging.info("Async Keyboard Menu Action stopping")
+        if self._loop is not None:
+            self._loop.remove_reader(self._inputStream.fileno())
+        await super().stop()
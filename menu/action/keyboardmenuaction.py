@@ -1,14 +1,19 @@
 import threading, logging
 from queue import Queue
+from typing import Callable
 from .menuaction import MenuAction
 
 class KeyboardMenuAction(MenuAction):
     '''
     A MenuAction class that accepts character input from a standard keyboard key press. A single character is
     mapped to a MenuAction before being passed to the MenuSystem.
+
+    Input starting with '/' is a search: the rest of the line is passed to searchCallback, e.g. to jump to the
+    first menu node whose name starts with it.
     '''
-    def __init__(self, actionQueue: Queue):
+    def __init__(self, actionQueue: Queue, searchCallback: Callable = None):
         self._actionQueue = actionQueue
+        self._searchCallback = searchCallback
         self._exitEvent = threading.Event()
 
     # a=home
@@ -24,7 +29,11 @@ class KeyboardMenuAction(MenuAction):
 
         while not self._exitEvent.is_set():
             charVal = self.get_input()
-            logging.info("Got character input: "+str(charVal))
+            logging.info("Got character input: %s", charVal)
+            if self._searchCallback is not None and charVal.startswith('/'):
+                self._searchCallback(charVal[1:])
+                self._actionQueue.join() #Wait for the menu to update display
+                continue
             action = self.map_input_to_action(charVal)
             self._actionQueue.put(action)
             if action == MenuAction.Action.QUIT:
@@ -49,6 +58,14 @@ class KeyboardMenuAction(MenuAction):
                 return MenuAction.Action.UP
             case 'm':
                 return MenuAction.Action.DOWN
+            case 'u':
+                return MenuAction.Action.LEFT
+            case 'n':
+                return MenuAction.Action.RIGHT
+            case 't':
+                return MenuAction.Action.TOP
+            case 'b':
+                return MenuAction.Action.BOTTOM
             case 'l' | 's':
                 return MenuAction.Action.SELECT
             case 'a':
@@ -6,12 +6,14 @@ class MenuAction(ABC):
     class Action(Enum):
         UP = auto()
         DOWN = auto()
-        LEFT = auto()
-        RIGHT = auto()
+        LEFT = auto() # page up
+        RIGHT = auto() # page down
         SELECT = auto()
         HOME = auto()
         QUIT = auto()
         NONE = auto()
+        TOP = auto() # first option
+        BOTTOM = auto() # last option
 
     @abstractmethod
     def get_actions(self):
@@ -0,0 +1,213 @@
+'''
+Recording and replaying of the actions of a menu session, e.g. to reproduce a complaint like "scrolling lags
+after 20 presses" from the field on a machine without buttons or a keyboard.
+
+A RecordingQueue is passed to a MenuAction and a MenuSystem as their action queue, so it records the actions of
+any MenuAction. Each action is written to an action log along with the time it arrived and its latency, the
+time from arriving on the queue until the MenuSystem has processed it and updated the display. A
+ReplayMenuAction puts the actions of a log back on a queue, with their original timing or as fast as the
+MenuSystem takes them.
+
+Action log layout (little endian):
+
+    header      magic, version, wall clock time the session started as a double
+    records     per action: microseconds since the previous action, action value, latency in microseconds
+                (0xFFFFFFFF if unknown), 9 bytes each
+
+NONE actions only wake up the MenuSystem and aren't recorded.
+'''
+
+import logging, struct, threading, time
+from collections import deque
+from queue import Queue
+from typing import List
+
+from .menuaction import MenuAction
+from menu.instrumentation import Instrumentation, InstrumentedQueue, NULL_INSTRUMENTATION
+
+
+ACTION_LOG_MAGIC = b'MNAL'
+ACTION_LOG_VERSION = 1
+
+_HEADER = struct.Struct('<4sHd')
+_RECORD = struct.Struct('<IBI')
+
+_UNKNOWN = 0xFFFFFFFF
+_MAX_MICROSECONDS = 0xFFFFFFFE
+
+
+def _microseconds(seconds: float) -> int:
+    return min(max(int(round(seconds*1000000)), 0), _MAX_MICROSECONDS)
+
+
+class ActionRecord(object):
+    '''
+    An action of a recorded session. timestamp is in seconds from the start of the session, latency in
+    seconds or None if it wasn't measured.
+    '''
+    __slots__ = ('_timestamp', '_action', '_latency')
+
+    def __init__(self, timestamp: float, action: MenuAction.Action, latency: float = None):
+        self._timestamp = timestamp
+        self._action = action
+        self._latency = latency
+
+    @property
+    def timestamp(self) -> float:
+        return self._timestamp
+
+    @property
+    def action(self) -> MenuAction.Action:
+        return self._action
+
+    @property
+    def latency(self) -> float:
+        return self._latency
+
+
+class ActionLogWriter(object):
+    '''
+    Appends records to an action log as they happen, so the log of a session that ends in a crash is kept.
+    '''
+    def __init__(self, filename: str, startTime: float = None):
+        self._file = open(filename, "wb")
+        self._file.write(_HEADER.pack(ACTION_LOG_MAGIC, ACTION_LOG_VERSION, time.time() if startTime is None else startTime))
+        self._file.flush()
+        self._lastTimestamp = 0.0
+
+    def write(self, record: ActionRecord):
+        latency = _UNKNOWN if record.latency is None else _microseconds(record.latency)
+        self._file.write(_RECORD.pack(_microseconds(record.timestamp-self._lastTimestamp), record.action.value, latency))
+        self._file.flush()
+        self._lastTimestamp = record.timestamp
+
+    def close(self):
+        self._file.close()
+
+
+def write_action_log(records: List[ActionRecord], filename: str, startTime: float = None):
+    writer = ActionLogWriter(filename, startTime)
+    try:
+        for record in records:
+            writer.write(record)
+    finally:
+        writer.close()
+
+
+def read_action_log(filename: str) -> List[ActionRecord]:
+    with open(filename, "rb") as log_file:
+        data = log_file.read()
+
+    if len(data) < _HEADER.size:
+        logging.error("Not an action log: "+filename)
+        raise Exception("Not an action log")
+    magic, version, _ = _HEADER.unpack_from(data)
+    if magic != ACTION_LOG_MAGIC or version != ACTION_LOG_VERSION:
+        logging.error("Unsupported action log: "+filename)
+        raise Exception("Unsupported action log")
+
+    records = []
+    timestamp = 0
+    # a record cut short by a crash is dropped
+    end = _HEADER.size + (len(data)-_HEADER.size)//_RECORD.size*_RECORD.size
+    for delta, actionValue, latency in _RECORD.iter_unpack(data[_HEADER.size:end]):
+        timestamp += delta
+        records.append(ActionRecord(timestamp/1000000, MenuAction.Action(actionValue), None if latency == _UNKNOWN else latency/1000000))
+    return records
+
+
+class RecordingQueue(InstrumentedQueue):
+    '''
+    An InstrumentedQueue that also writes every action put on it to an action log, so recording a session
+    keeps the queue metrics. An action is written once the MenuSystem marks it done, i.e. after the frame
+    showing it, so its latency is known.
+    '''
+    def __init__(self, filename: str, instrumentation: Instrumentation = NULL_INSTRUMENTATION, maxsize: int = 0):
+        super().__init__(instrumentation, maxsize)
+        self._writer = ActionLogWriter(filename)
+        self._start = time.perf_counter()
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self._pending = deque() # (enqueue time, action) of every item not yet done, in queue order
+
+    def _put(self, item):
+        super()._put(item)
+        self._pending.append((self._enqueueTimes[-1], item))
+
+    def task_done(self):
+        # items are marked done in the order they were taken off the queue
+        with self.mutex:
+            if self._pending:
+                enqueueTime, action = self._pending.popleft()
+                if isinstance(action, MenuAction.Action) and action != MenuAction.Action.NONE and self._writer is not None:
+                    self._writer.write(ActionRecord(enqueueTime-self._start, action, time.perf_counter()-enqueueTime))
+        super().task_done()
+
+    def close(self):
+        with self.mutex:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+class ReplayMenuAction(MenuAction):
+    '''
+    Replays recorded or scripted actions into a MenuSystem. With realTime set every action is put on the queue
+    at its original time after the first one, divided by speed, without waiting for the MenuSystem, like a user
+    pressing buttons. Otherwise each action waits for the MenuSystem to process it and update the display before
+    the next one is sent, like KeyboardMenuAction, and the time taken is added to latencies. maxDelay shortens
+    long idle periods of a recording replayed in real time to at most that many seconds. A QUIT is sent after
+    the last action unless the actions end with one.
+    '''
+    def __init__(self, actionQueue: Queue, records: List[ActionRecord], realTime: bool = True, speed: float = 1.0, maxDelay: float = None):
+        self._actionQueue = actionQueue
+        self._records = records
+        self._realTime = realTime
+        self._speed = speed
+        self._maxDelay = maxDelay
+        self._actionThread = None
+        self._exitEvent = threading.Event()
+        self.latencies = [] # seconds per action, when not replaying in real time
+
+    def get_actions(self):
+        due = time.perf_counter()
+        previousTimestamp = self._records[0].timestamp if self._records else 0.0
+        action = None
+        for record in self._records:
+            if self._realTime:
+                gap = record.timestamp-previousTimestamp
+                previousTimestamp = record.timestamp
+                if self._maxDelay is not None:
+                    gap = min(gap, self._maxDelay)
+                # scheduled from the previous due time so the time taken to put an action doesn't add up
+                due += gap/self._speed
+                delay = due-time.perf_counter()
+                if delay > 0 and self._exitEvent.wait(delay):
+                    break
+            if self._exitEvent.is_set():
+                break
+            action = record.action
+            if self._realTime:
+                self._actionQueue.put(action)
+            else:
+                actionStart = time.perf_counter()
+                self._actionQueue.put(action)
+                self._actionQueue.join()
+                self.latencies.append(time.perf_counter()-actionStart)
+        if action != MenuAction.Action.QUIT:
+            self._actionQueue.put(MenuAction.Action.QUIT)
+
+    def start(self):
+        logging.info("Replay Menu Action starting")
+        self._actionThread = threading.Thread(target=self.get_actions)
+        self._actionThread.start()
+
+    def stop(self):
+        logging.info("Replay Menu Action stopping")
+        self._exitEvent.set()
+        if self._actionThread is not None and self._actionThread is not threading.current_thread():
+            self._actionThread.join()
+
+    def map_input_to_action(self, value) -> MenuAction.Action:
+        return value if isinstance(value, MenuAction.Action) else MenuAction.Action.NONE
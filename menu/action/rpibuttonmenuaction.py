@@ -52,7 +52,7 @@ class RPiButtonBoardMenuAction(MenuAction):
 
 
     def button_press(self, channel):
-        logging.info("Button pressed: "+str(channel))
+        logging.info("Button pressed: %s", channel)
         action = self.map_input_to_action(channel)
         self._actionQueue.put(action)
 
@@ -73,6 +73,8 @@ class RPiButtonBoardMenuAction(MenuAction):
                 return MenuAction.Action.UP
             case self._downPin:
                 return MenuAction.Action.DOWN
+            case self._leftPin:
+                return MenuAction.Action.LEFT
             case self._s2Pin | self._rightPin:
                 return MenuAction.Action.SELECT
             case self._s1Pin:
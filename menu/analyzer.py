@@ -0,0 +1,371 @@
+'''
+Static analysis of a menu graph.
+
+Menus raises on the first invalid selection option or execution node it finds while loading. The analyzer
+instead builds the adjacency of the graph once and reports every problem it finds in one pass:
+
+    errors      selection options or options providers leading to menu nodes that don't exist, execution
+                menu nodes without an executor node id or with one not found in executors.json, a missing
+                or empty root menu node and missing special menu nodes (CONFIRMATION, YES, NO, OUTPUT)
+    warnings    menu nodes that can't be reached from the root, selection menu nodes from which nothing
+                can be executed, and selection cycles with no way out other than going home
+
+After an edit of the menu nodes file, update() takes just the changed menu nodes. Selection options and
+executor ids are only checked again for the changed menu nodes and the ones pointing at them, and the
+reachability checks are only repeated when the edit changed the edges of the graph.
+
+From the top-level directory:
+
+    python -m menu.analyzer menuservice/menunodes.json --executors menuservice/executors.json
+'''
+
+import json, sys
+import argparse
+from collections import deque
+from collections.abc import Mapping
+from enum import Enum, unique
+from typing import Collection, Dict, List, Set, Tuple
+
+from menu.menus import MenuNode, MenuNodeSpecialId, MenuNodeType, ExecutorNode
+from menu.shards import option_target_ids
+
+
+@unique
+class Severity(Enum):
+    ERROR = 'error'
+    WARNING = 'warning'
+
+@unique
+class ProblemCode(Enum):
+    DUPLICATE_MENU_NODE = 'duplicate-menu-node'
+    MISSING_ROOT = 'missing-root'
+    ROOT_WITHOUT_OPTIONS = 'root-without-options'
+    MISSING_SPECIAL_NODE = 'missing-special-node'
+    INVALID_SELECTION_OPTION = 'invalid-selection-option'
+    INVALID_OPTIONS_TARGET = 'invalid-options-target'
+    MISSING_EXECUTOR_ID = 'missing-executor-id'
+    UNKNOWN_EXECUTOR = 'unknown-executor'
+    UNREACHABLE = 'unreachable'
+    DEAD_END = 'dead-end'
+    CYCLE_WITHOUT_EXIT = 'cycle-without-exit'
+    DUPLICATE_EXECUTOR = 'duplicate-executor'
+    MISSING_SCRIPT = 'missing-script'
+    INVALID_FILE = 'invalid-file'
+
+WARNINGS = {ProblemCode.UNREACHABLE, ProblemCode.DEAD_END, ProblemCode.CYCLE_WITHOUT_EXIT}
+
+SPECIAL_NODE_IDS = [MenuNodeSpecialId.CONFIRMATION.value, MenuNodeSpecialId.YES.value, MenuNodeSpecialId.NO.value, MenuNodeSpecialId.OUTPUT.value]
+
+
+class Problem(object):
+    '''
+        A problem found in a menu. menu_node_id is the menu node it is about, or the executor node for the
+        executor problems found by the menu compiler.
+    '''
+    def __init__(self, code: ProblemCode, menuNodeId: str, message: str):
+        self._code = code
+        self._menuNodeId = menuNodeId
+        self._message = message
+
+    @property
+    def code(self) -> ProblemCode:
+        return self._code
+
+    @property
+    def severity(self) -> Severity:
+        return Severity.WARNING if self._code in WARNINGS else Severity.ERROR
+
+    @property
+    def menu_node_id(self) -> str:
+        return self._menuNodeId
+
+    @property
+    def message(self) -> str:
+        return self._message
+
+    def __str__(self) -> str:
+        return "%s %s [%s] %s" % (self.severity.value, self._code.value, self._menuNodeId, self._message)
+
+
+def _structure(menunode: MenuNode) -> Tuple:
+    # what the reachability checks depend on
+    return (menunode.type, menunode.is_root, tuple(option_target_ids(menunode)))
+
+def _contents(menunode: MenuNode) -> Tuple:
+    if menunode.is_dynamic:
+        options = tuple(sorted(menunode.selection_options.as_dict().items()))
+    else:
+        options = tuple((selectionOption.id, selectionOption.display_name) for selectionOption in menunode.selection_options or ()) \
+            if menunode.selection_options is not None else None
+    return (menunode.type, options, menunode.executor_id, menunode.is_confirm, menunode.is_root)
+
+
+def diff_menu_nodes(previous: Mapping, current: Mapping) -> Dict[str, MenuNode]:
+    '''
+    Returns the menu nodes that were added or changed between two versions of a menu, with None for the
+    ones that were removed. The result can be passed to MenuAnalyzer.update().
+    '''
+    changed = {}
+    for menuNodeId, menunode in current.items():
+        previousNode = previous.get(menuNodeId)
+        if previousNode is None or _contents(previousNode) != _contents(menunode):
+            changed[menuNodeId] = menunode
+    for menuNodeId in previous:
+        if menuNodeId not in current:
+            changed[menuNodeId] = None
+    return changed
+
+
+class MenuAnalyzer(object):
+    '''
+        Finds the problems of a menu graph given as a mapping of menu node ids to menu nodes. Executor ids are
+        only checked when the ids of the executor nodes are given.
+    '''
+
+    def __init__(self, menunodes: Mapping, executorIds: Collection[str] = None, rootNodeId: str = MenuNodeSpecialId.ROOT.value):
+        self._rootNodeId = rootNodeId
+        self._executorIds = set(executorIds) if executorIds is not None else None
+
+        self._menunodes: Dict[str, MenuNode] = {}
+        self._edges: Dict[str, Tuple[str, ...]] = {}
+        self._predecessors: Dict[str, Set[str]] = {} # target id -> ids of the menu nodes leading to it, also for missing targets
+        for menuNodeId, menunode in menunodes.items():
+            self._add(menuNodeId, menunode)
+
+        self._nodeProblems: Dict[str, List[Problem]] = {menuNodeId: self._check_node(menunode) for menuNodeId, menunode in self._menunodes.items()}
+        self._graphProblems = self._check_graph()
+
+    @property
+    def menu_nodes(self) -> Mapping:
+        return self._menunodes
+
+    @property
+    def problems(self) -> List[Problem]:
+        '''
+        All problems found, errors first.
+        '''
+        problems = [problem for nodeProblems in self._nodeProblems.values() for problem in nodeProblems] + self._graphProblems
+        return sorted(problems, key=lambda problem: problem.severity != Severity.ERROR)
+
+    @property
+    def errors(self) -> List[Problem]:
+        return [problem for problem in self.problems if problem.severity == Severity.ERROR]
+
+    def _add(self, menuNodeId: str, menunode: MenuNode):
+        self._menunodes[menuNodeId] = menunode
+        self._edges[menuNodeId] = tuple(option_target_ids(menunode))
+        for targetId in self._edges[menuNodeId]:
+            self._predecessors.setdefault(targetId, set()).add(menuNodeId)
+
+    def _remove(self, menuNodeId: str):
+        del self._menunodes[menuNodeId]
+        for targetId in self._edges.pop(menuNodeId):
+            predecessors = self._predecessors[targetId]
+            predecessors.discard(menuNodeId)
+            if not predecessors:
+                del self._predecessors[targetId]
+
+    def update(self, changed: Mapping, executorIds: Collection[str] = None) -> List[Problem]:
+        '''
+        Applies changed menu nodes, None for a removed one, and optionally a new set of executor ids, then
+        returns all problems. See diff_menu_nodes().
+        '''
+        recheck = set()
+        structureChanged = False
+
+        for menuNodeId, menunode in changed.items():
+            previousNode = self._menunodes.get(menuNodeId)
+            if previousNode is None or menunode is None or _structure(previousNode) != _structure(menunode):
+                structureChanged = True
+            if previousNode is not None:
+                self._remove(menuNodeId)
+            if menunode is not None:
+                self._add(menuNodeId, menunode)
+            else:
+                self._nodeProblems.pop(menuNodeId, None)
+            recheck.add(menuNodeId)
+            # options pointing at an added or removed menu node become valid or invalid
+            if previousNode is None or menunode is None:
+                recheck.update(self._predecessors.get(menuNodeId, ()))
+
+        if executorIds is not None:
+            self._executorIds = set(executorIds)
+            recheck.update(menuNodeId for menuNodeId, menunode in self._menunodes.items()
+                           if menunode.type == MenuNodeType.EXECUTION or menunode.is_dynamic)
+
+        for menuNodeId in recheck:
+            menunode = self._menunodes.get(menuNodeId)
+            if menunode is not None:
+                self._nodeProblems[menuNodeId] = self._check_node(menunode)
+
+        if structureChanged:
+            self._graphProblems = self._check_graph()
+        return self.problems
+
+    def _check_executor_id(self, menunode: MenuNode, executorNodeId: str) -> List[Problem]:
+        if self._executorIds is None or executorNodeId in self._executorIds:
+            return []
+        return [Problem(ProblemCode.UNKNOWN_EXECUTOR, menunode.id, "Executor node not found: "+executorNodeId)]
+
+    def _check_node(self, menunode: MenuNode) -> List[Problem]:
+        problems = []
+        if menunode.is_dynamic:
+            targetId = menunode.selection_options.target_id
+            if targetId not in self._menunodes:
+                problems.append(Problem(ProblemCode.INVALID_OPTIONS_TARGET, menunode.id, "Options provider must have valid target menu node id "+targetId))
+            problems.extend(self._check_executor_id(menunode, menunode.selection_options.executor_id))
+        else:
+            for targetId in self._edges[menunode.id]:
+                if targetId not in self._menunodes:
+                    problems.append(Problem(ProblemCode.INVALID_SELECTION_OPTION, menunode.id, "Selection Option must have valid menu node id "+targetId))
+
+        if menunode.type == MenuNodeType.EXECUTION:
+            if menunode.executor_id is None:
+                problems.append(Problem(ProblemCode.MISSING_EXECUTOR_ID, menunode.id, "Execution type menu nodes must have an executor node id"))
+            else:
+                problems.extend(self._check_executor_id(menunode, menunode.executor_id))
+        return problems
+
+    def _check_graph(self) -> List[Problem]:
+        problems = []
+
+        rootNode = self._menunodes.get(self._rootNodeId)
+        if rootNode is None or not rootNode.is_root:
+            problems.append(Problem(ProblemCode.MISSING_ROOT, self._rootNodeId, "No root menu node"))
+        elif rootNode.selection_options is None or rootNode.is_dynamic or len(rootNode.selection_options) == 0:
+            problems.append(Problem(ProblemCode.ROOT_WITHOUT_OPTIONS, self._rootNodeId, "Root menu node must have selection options"))
+
+        for specialId in SPECIAL_NODE_IDS:
+            if specialId not in self._menunodes:
+                problems.append(Problem(ProblemCode.MISSING_SPECIAL_NODE, specialId, "Special menu node is missing: "+specialId))
+
+        # the menu system navigates to the special menu nodes itself, so they count as reachable
+        reachable = self._reachable_from([self._rootNodeId]+SPECIAL_NODE_IDS)
+        for menuNodeId in self._menunodes:
+            if menuNodeId not in reachable:
+                problems.append(Problem(ProblemCode.UNREACHABLE, menuNodeId, "Menu node can't be reached from the root"))
+
+        # selection menu nodes from which no execution menu node can be reached
+        executable = self._reaching([menuNodeId for menuNodeId, menunode in self._menunodes.items() if menunode.type == MenuNodeType.EXECUTION])
+        deadNodeIds = [menuNodeId for menuNodeId, menunode in self._menunodes.items()
+                       if menunode.type == MenuNodeType.SELECTION and menuNodeId in reachable and menuNodeId not in executable]
+        for component in self._strongly_connected(deadNodeIds):
+            if len(component) > 1 or component[0] in self._edges[component[0]]:
+                problems.append(Problem(ProblemCode.CYCLE_WITHOUT_EXIT, component[0], "Selection cycle without an exit: "+", ".join(component)))
+            else:
+                problems.append(Problem(ProblemCode.DEAD_END, component[0], "Nothing can be executed from this menu node"))
+        return problems
+
+    def _reachable_from(self, startIds: List[str]) -> Set[str]:
+        seen = {menuNodeId for menuNodeId in startIds if menuNodeId in self._menunodes}
+        queue = deque(seen)
+        while queue:
+            for targetId in self._edges[queue.popleft()]:
+                if targetId not in seen and targetId in self._menunodes:
+                    seen.add(targetId)
+                    queue.append(targetId)
+        return seen
+
+    def _reaching(self, targetIds: List[str]) -> Set[str]:
+        seen = set(targetIds)
+        queue = deque(seen)
+        while queue:
+            for menuNodeId in self._predecessors.get(queue.popleft(), ()):
+                if menuNodeId not in seen:
+                    seen.add(menuNodeId)
+                    queue.append(menuNodeId)
+        return seen
+
+    def _strongly_connected(self, menuNodeIds: List[str]) -> List[List[str]]:
+        '''
+        Tarjan's algorithm over the subgraph of the given menu nodes, without recursion so deep menus don't
+        hit the recursion limit. Components are returned in no particular order, each sorted.
+        '''
+        nodeSet = set(menuNodeIds)
+        index: Dict[str, int] = {}
+        lowLink: Dict[str, int] = {}
+        stack: List[str] = []
+        onStack: Set[str] = set()
+        components = []
+
+        for startId in menuNodeIds:
+            if startId in index:
+                continue
+            work = [(startId, 0)]
+            while work:
+                menuNodeId, edgeIndex = work.pop()
+                if edgeIndex == 0:
+                    index[menuNodeId] = lowLink[menuNodeId] = len(index)
+                    stack.append(menuNodeId)
+                    onStack.add(menuNodeId)
+                edges = self._edges[menuNodeId]
+                while edgeIndex < len(edges):
+                    targetId = edges[edgeIndex]
+                    edgeIndex += 1
+                    if targetId not in nodeSet:
+                        continue
+                    if targetId not in index:
+                        work.append((menuNodeId, edgeIndex))
+                        work.append((targetId, 0))
+                        break
+                    if targetId in onStack:
+                        lowLink[menuNodeId] = min(lowLink[menuNodeId], index[targetId])
+                else:
+                    if lowLink[menuNodeId] == index[menuNodeId]:
+                        component = []
+                        while True:
+                            memberId = stack.pop()
+                            onStack.discard(memberId)
+                            component.append(memberId)
+                            if memberId == menuNodeId:
+                                break
+                        components.append(sorted(component))
+                    if work:
+                        parentId = work[-1][0]
+                        lowLink[parentId] = min(lowLink[parentId], lowLink[menuNodeId])
+        return components
+
+
+def duplicate_problems(ids: List[str], code: ProblemCode, message: str) -> List[Problem]:
+    problems = []
+    seen = set()
+    for nodeId in ids:
+        if nodeId in seen:
+            problems.append(Problem(code, nodeId, message))
+        seen.add(nodeId)
+    return problems
+
+
+def analyze_files(menu_nodes_filename: str, executors_filename: str = None) -> List[Problem]:
+    '''
+    Returns the problems of a menu nodes json file, and of its executor ids when an executors file is given.
+    '''
+    with open(menu_nodes_filename, "r") as menunodes_file:
+        menunodes = json.loads(menunodes_file.read(), object_hook = MenuNode.as_menu_node)
+
+    executorIds = None
+    if executors_filename is not None:
+        with open(executors_filename, "r") as executornodes_file:
+            executorIds = [executorNode.id for executorNode in json.loads(executornodes_file.read(), object_hook = ExecutorNode.as_executor_node)]
+
+    problems = duplicate_problems([menunode.id for menunode in menunodes], ProblemCode.DUPLICATE_MENU_NODE, "Menu node id found more than once")
+    problems.extend(MenuAnalyzer({menunode.id: menunode for menunode in menunodes}, executorIds).problems)
+    return sorted(problems, key=lambda problem: problem.severity != Severity.ERROR)
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report the problems of a menu nodes json file")
+    parser.add_argument('menunodes', help="menu nodes json file")
+    parser.add_argument('--executors', help="executors json file to check executor node ids against")
+    parsedArgs = parser.parse_args(args)
+
+    problems = analyze_files(parsedArgs.menunodes, parsedArgs.executors)
+    for problem in problems:
+        print(problem)
+    numErrors = sum(1 for problem in problems if problem.severity == Severity.ERROR)
+    print("%s errors, %s warnings" % (numErrors, len(problems)-numErrors))
+    return 1 if numErrors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
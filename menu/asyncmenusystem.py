@@ -0,0 +1,185 @@
+import asyncio, logging, time
+from typing import Callable, List
+
+from .display.asyncdisplay import AsyncDisplay
+from .action.asyncmenuaction import AsyncMenuAction
+from .action.menuaction import MenuAction
+from .menusystem import MenuSystem
+from .menus import Menus, MenuNode, Navigator, MenuNodeType, Executor, MenuDestination
+from .instrumentation import Instrumentation, NULL_INSTRUMENTATION
+
+class AsyncMenuSystem(MenuSystem):
+    '''
+
+    asyncio version of MenuSystem. Input, display updates, script execution and timers all run as tasks on one
+    event loop:
+
+        AsyncMenuAction -> Navigation/Execution -> AsyncDisplay
+
+    Navigation and action batching are shared with MenuSystem. Executions always run asynchronously through
+    Executor.execute_async(); the display shows "Running..." until they finish and HOME cancels them.
+
+    stop() can be called from any thread and ends run() promptly: the action source and any running execution
+    are stopped and awaited before run() returns.
+
+    '''
+    def __init__(self,
+                 menus: Menus,\
+                 executor: Executor,\
+                 navigator: Navigator,\
+                 display: AsyncDisplay,\
+                 menuAction: AsyncMenuAction,
+                 maxFrameRate: float = None,
+                 instrumentation: Instrumentation = NULL_INSTRUMENTATION,
+                 prefetch: bool = False,
+                 prefetchDelay: float = MenuSystem.PREFETCH_DELAY):
+
+        # MenuSystem registers this class's handle_confirmation_yes, which awaits the saved execution
+        super().__init__(menus, executor, navigator, display, None, menuAction, asyncExecution=True, maxFrameRate=maxFrameRate,
+                         instrumentation=instrumentation, prefetch=prefetch, prefetchDelay=prefetchDelay)
+
+        self._loop = None
+        self._actionQueue = asyncio.Queue()
+
+    @staticmethod
+    async def handle_confirmation_yes(**kwargs) -> Executor.ExecutionResult:
+        try:
+            executorNodeId = kwargs['savedExecutorNodeId']
+            executor = kwargs['executor']
+            return await executor.execute_async(executorNodeId, **kwargs)
+        except KeyError as ex:
+            logging.error("Missing required kwargs in handle_confirmation_yes()")
+            raise Exception("missing required kwargs value: "+ex.args[0])
+
+    def call_in_loop(self, callback: Callable):
+        '''
+        Schedules a callable to run on the event loop. Safe to call from any thread.
+        '''
+        if self._loop is None:
+            logging.warning("call_in_loop() before the menu system is running")
+            return
+        self._loop.call_soon_threadsafe(self._schedule_callback, callback)
+
+    def _schedule_callback(self, callback: Callable):
+        self._callbacks.append(callback)
+        self._actionQueue.put_nowait(MenuAction.Action.NONE) # wake up the event loop
+
+    async def display(self):
+
+        current_node = self._navigator.current_menu_node
+
+        match current_node.type:
+
+            case MenuNodeType.SELECTION:
+                cursor_position = self._navigator.cursor_position
+                await self._display.display_menu(current_node, cursor_position)
+
+            case MenuNodeType.OUTPUT:
+                output=self._executionResult.output
+                await self._display.display_output(current_node, output)
+
+    def handle_execution_node(self, executionNode: MenuNode):
+
+        self._executionResult = None
+
+        if executionNode.is_confirm:
+
+            # Save the execution node id so we can come back to it if the user selects "yes" within the confirmation menu
+            self._savedExecutorNodeId = executionNode.executor_id
+            self._navigator.navigate_to_confirmation_menu()
+
+        else:
+
+            execution = self._executor.execute_async(executionNode.executor_id, savedExecutorNodeId=self._savedExecutorNodeId, executor=self._executor,
+                                                     selectedValue=self._navigator.selected_value)
+            task = self._loop.create_task(execution)
+            self._savedExecutorNodeId = None
+            self._pendingExecution = task
+            task.add_done_callback(lambda t: self._schedule_callback(lambda: self.handle_execution_complete(t)))
+
+            self._executionResult = Executor.ExecutionResult(self.RUNNING_OUTPUT, None, MenuDestination.POST_EXECUTE_OUTPUT)
+            self._navigator.navigate_to_post_execute_output()
+
+    def handle_execution_complete(self, task: asyncio.Task):
+
+        # Ignore results of executions that were cancelled or superseded
+        if task is not self._pendingExecution:
+            return
+
+        self._pendingExecution = None
+        try:
+            self._executionResult = task.result()
+        except Exception as e:
+            logging.error("Error executing executor node: "+str(e))
+            self._executionResult = Executor.ExecutionResult("Error executing", 1, MenuDestination.POST_EXECUTE_OUTPUT)
+        self.handle_execution_result(self._executionResult)
+
+    async def get_actions(self, timeout: float = None) -> List[MenuAction.Action]:
+        '''
+        Waits for the next action and returns it along with every other action already waiting in the queue.
+        Returns an empty list if a timeout is given and no action arrives in time.
+        '''
+        try:
+            actions = [await asyncio.wait_for(self._actionQueue.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+
+        while actions[-1] != MenuAction.Action.QUIT and not self._actionQueue.empty():
+            actions.append(self._actionQueue.get_nowait())
+
+        return actions
+
+    async def _pump_actions(self):
+        async for action in self._menuAction:
+            await self._actionQueue.put(action)
+        # the action source ended, nothing more can happen
+        await self._actionQueue.put(MenuAction.Action.QUIT)
+
+    async def run(self):
+
+        self._loop = asyncio.get_running_loop()
+        self._action = MenuAction.Action.NONE
+        await self.display()
+
+        await self._menuAction.start()
+        pumpTask = self._loop.create_task(self._pump_actions())
+
+        try:
+            while (self._action != MenuAction.Action.QUIT):
+
+                actions = await self.get_actions(timeout=self.prefetch_wait())
+                if self._instrumentation.enabled:
+                    self._instrumentation.gauge('menu_action_queue_depth', self._actionQueue.qsize())
+                redraw = self.process_actions(actions)
+
+                # Fold actions arriving before the next frame is due into this frame
+                while redraw and self._frameInterval is not None and self._action != MenuAction.Action.QUIT:
+                    remaining = self._lastDisplayTime + self._frameInterval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.process_actions(await self.get_actions(timeout=remaining))
+
+                displayStart = time.perf_counter() if self._instrumentation.enabled else None
+                if redraw:
+                    await self.display()
+                    self._lastDisplayTime = time.monotonic()
+                if displayStart is not None:
+                    self.record_frame(displayStart, redraw)
+
+                if self._prefetch and self._action != MenuAction.Action.QUIT:
+                    self.update_prefetch()
+        finally:
+            self.cancel_prefetch()
+            pendingExecution = self._pendingExecution
+            self.cancel_pending_execution()
+            await self._menuAction.stop()
+            pumpTask.cancel()
+            await asyncio.gather(pumpTask, return_exceptions=True)
+            if pendingExecution is not None:
+                await asyncio.gather(pendingExecution, return_exceptions=True)
+
+    def stop(self):
+        logging.info("AsyncMenuSystem::stop")
+        self._action = MenuAction.Action.QUIT
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._actionQueue.put_nowait, MenuAction.Action.QUIT)
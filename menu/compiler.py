@@ -0,0 +1,219 @@
+'''
+Offline compiler turning authored menu sources into deploy-ready files.
+
+A source file has the format of menunodes.json or executors.json, a list of nodes, or is an object with
+"templates" and "nodes" lists. Two kinds of entries can stand in the place of a node:
+
+    {"include": "network.json"}
+        the nodes of another source file, relative to the including file. Templates defined by an
+        included file can be used after the include.
+
+    {"template": "SERVICE", "prefix": "NGINX_", "params": {"name": "nginx"}}
+        a copy of the nodes of a template, for subtrees repeated with small differences. Every ${name}
+        in the template is replaced by its parameter, the prefix is added to the ids of the nodes the
+        template defines and to the selection options and options providers pointing at them.
+
+The expanded nodes are validated with the menu analyzer, with executor ids resolved against the
+executors and, when a scripts directory is given, script executors against the scripts in it, and then
+with the same rules Menus and Executor apply when loading. Nothing is written if there are errors.
+
+The output directory gets minified menunodes.json and executors.json and a menunodes.snapshot with the
+precomputed MenuIndex, ready for load_menus(). When a display width is given, the selection option rows
+are also rendered into the snapshot for displays of that width and character encoding. Menus with
+generated options can't be snapshotted and are deployed as json only.
+
+    menusystem-compile menus/menunodes.json menus/executors.json build --scripts menuservice/scripts --columns 20
+'''
+
+import json, logging, os, re, sys
+import argparse
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from menu.menus import Menus, MenuNode, ExecutorNode, ExecutorNodeType, Executor
+from menu.analyzer import MenuAnalyzer, Problem, ProblemCode, Severity, duplicate_problems
+from menu.display.bounded import option_row_text
+from menu.snapshot import write_snapshot, source_digest
+
+
+MENU_NODES_FILENAME = 'menunodes.json'
+EXECUTORS_FILENAME = 'executors.json'
+SNAPSHOT_FILENAME = 'menunodes.snapshot'
+
+_PARAMETER = re.compile(r'\$\{(\w+)\}')
+
+
+def expand_source(filename: str, templates: Dict[str, List] = None, including: Tuple = ()) -> List[Dict]:
+    '''
+    Reads a source file and returns its nodes with includes and templates expanded. templates collects the
+    templates defined so far, shared with the files it includes.
+    '''
+    path = os.path.abspath(filename)
+    if path in including:
+        logging.error("Include cycle: "+filename)
+        raise Exception("Include cycle "+filename)
+    if templates is None:
+        templates = {}
+
+    with open(filename, "r") as source_file:
+        source = json.load(source_file)
+    entries = source
+    if isinstance(source, dict):
+        for name, nodes in source.get('templates', {}).items():
+            if name in templates:
+                logging.error("Template defined more than once: "+name)
+                raise Exception("Template defined more than once "+name)
+            templates[name] = nodes
+        entries = source.get('nodes', [])
+
+    return _expand_entries(entries, os.path.dirname(filename), templates, including+(path,))
+
+
+def _expand_entries(entries: List, directory: str, templates: Dict[str, List], including: Tuple) -> List[Dict]:
+    nodes = []
+    for entry in entries:
+        if 'include' in entry:
+            nodes.extend(expand_source(os.path.join(directory, entry['include']), templates, including))
+        elif 'template' in entry:
+            nodes.extend(_instantiate(entry, directory, templates, including))
+        else:
+            nodes.append(entry)
+    return nodes
+
+
+def _instantiate(entry: Dict, directory: str, templates: Dict[str, List], including: Tuple) -> List[Dict]:
+    name = entry['template']
+    if name not in templates:
+        logging.error("Unknown template: "+name)
+        raise Exception("Unknown template "+name)
+    if ('template', name) in including:
+        logging.error("Template used within itself: "+name)
+        raise Exception("Template used within itself "+name)
+
+    body = _substitute(templates[name], entry.get('params', {}), name)
+    nodes = _expand_entries(body, directory, templates, including+(('template', name),))
+
+    prefix = entry.get('prefix', '')
+    localIds = {node['_id_'] for node in nodes}
+    return [_prefix_ids(node, prefix, localIds) for node in nodes]
+
+
+def _substitute(value, params: Dict[str, str], templateName: str):
+    if isinstance(value, str):
+        def parameter(match):
+            if match.group(1) not in params:
+                logging.error("Missing parameter %s of template %s", match.group(1), templateName)
+                raise Exception("Missing parameter "+match.group(1)+" of template "+templateName)
+            return str(params[match.group(1)])
+        return _PARAMETER.sub(parameter, value)
+    if isinstance(value, list):
+        return [_substitute(item, params, templateName) for item in value]
+    if isinstance(value, dict):
+        return {key: _substitute(item, params, templateName) for key, item in value.items()}
+    return value
+
+
+def _prefix_ids(node: Dict, prefix: str, localIds: set) -> Dict:
+    node = dict(node)
+    node['_id_'] = prefix+node['_id_']
+    if 'selectionOptions' in node:
+        node['selectionOptions'] = [dict(selectionOption, menuNodeId=prefix+selectionOption['menuNodeId'])
+                                    if selectionOption['menuNodeId'] in localIds else selectionOption
+                                    for selectionOption in node['selectionOptions']]
+    if 'optionsProvider' in node and node['optionsProvider'].get('targetMenuNodeId') in localIds:
+        node['optionsProvider'] = dict(node['optionsProvider'], targetMenuNodeId=prefix+node['optionsProvider']['targetMenuNodeId'])
+    return node
+
+
+def _write_json(nodes: List[Dict], filename: str):
+    with open(filename, "w") as json_file:
+        json.dump(nodes, json_file, separators=(',', ':'))
+
+
+def compile_menus(menuNodesSource: str, executorsSource: str, outputDirectory: str, scriptsDirectory: str = None,
+                  numColumns: int = None, characterEncoding: str = 'ascii') -> List[Problem]:
+    '''
+    Expands and validates the sources and writes the deployable files to outputDirectory. Returns every
+    problem found, errors first; the files are only written when there are no errors.
+    '''
+    try:
+        menuNodeEntries = expand_source(menuNodesSource)
+        executorEntries = expand_source(executorsSource)
+        menunodes = json.loads(json.dumps(menuNodeEntries), object_hook=MenuNode.as_menu_node)
+        executorNodes = json.loads(json.dumps(executorEntries), object_hook=ExecutorNode.as_executor_node)
+    except Exception as e:
+        return [Problem(ProblemCode.INVALID_FILE, menuNodesSource, str(e))]
+
+    problems = duplicate_problems([menunode.id for menunode in menunodes], ProblemCode.DUPLICATE_MENU_NODE, "Menu node id found more than once")
+    problems.extend(duplicate_problems([executorNode.id for executorNode in executorNodes], ProblemCode.DUPLICATE_EXECUTOR, "Executor node id found more than once"))
+    problems.extend(MenuAnalyzer({menunode.id: menunode for menunode in menunodes}, [executorNode.id for executorNode in executorNodes]).problems)
+
+    if scriptsDirectory is not None:
+        for executorNode in executorNodes:
+            if executorNode.executor_type in (ExecutorNodeType.SCRIPT, ExecutorNodeType.PYSCRIPT) \
+                    and not os.path.isfile(os.path.join(scriptsDirectory, executorNode.name)):
+                problems.append(Problem(ProblemCode.MISSING_SCRIPT, executorNode.id, "Script not found: "+executorNode.name))
+
+    if numColumns is not None:
+        for menunode in menunodes:
+            if menunode.is_dynamic:
+                continue
+            for optionNum, selectionOption in enumerate(menunode.selection_options or ()):
+                try:
+                    option_row_text(optionNum, selectionOption.display_name, numColumns).encode(characterEncoding)
+                except UnicodeEncodeError:
+                    problems.append(Problem(ProblemCode.INVALID_FILE, menunode.id, "Display name can't be encoded in "+characterEncoding+": "+selectionOption.display_name))
+
+    problems.sort(key=lambda problem: problem.severity != Severity.ERROR)
+    if any(problem.severity == Severity.ERROR for problem in problems):
+        return problems
+
+    os.makedirs(outputDirectory, exist_ok=True)
+    menuNodesFilename = os.path.join(outputDirectory, MENU_NODES_FILENAME)
+    executorsFilename = os.path.join(outputDirectory, EXECUTORS_FILENAME)
+    snapshotFilename = os.path.join(outputDirectory, SNAPSHOT_FILENAME)
+
+    # the files are checked by the same code that loads them on the device before they replace the old ones
+    _write_json(menuNodeEntries, menuNodesFilename+".tmp")
+    _write_json(executorEntries, executorsFilename+".tmp")
+    try:
+        menus = Menus(menuNodesFilename+".tmp")
+        Executor(executorsFilename+".tmp", Path(scriptsDirectory or '.'))
+    except Exception as e:
+        os.remove(menuNodesFilename+".tmp")
+        os.remove(executorsFilename+".tmp")
+        return [Problem(ProblemCode.INVALID_FILE, menuNodesSource, str(e))] + problems
+    os.replace(menuNodesFilename+".tmp", menuNodesFilename)
+    os.replace(executorsFilename+".tmp", executorsFilename)
+
+    if any(menunode.is_dynamic for menunode in menunodes):
+        logging.warning("Menus with generated options can't be compiled into a snapshot, deploying json only")
+        if os.path.exists(snapshotFilename):
+            os.remove(snapshotFilename)
+    else:
+        write_snapshot(menus, source_digest(menuNodesFilename), snapshotFilename, numColumns, characterEncoding)
+
+    logging.info("Compiled %s menu nodes and %s executor nodes to %s", len(menunodes), len(executorNodes), outputDirectory)
+    return problems
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Validate menu sources and write deployable menu files")
+    parser.add_argument('menunodes', help="menu nodes source file")
+    parser.add_argument('executors', help="executors source file")
+    parser.add_argument('output', help="directory to write menunodes.json, executors.json and menunodes.snapshot to")
+    parser.add_argument('--scripts', help="scripts directory to check script executors against")
+    parser.add_argument('--columns', type=int, help="display width to render selection option rows for")
+    parser.add_argument('--encoding', default='ascii', help="display character encoding of the rendered rows")
+    parsedArgs = parser.parse_args(args)
+
+    problems = compile_menus(parsedArgs.menunodes, parsedArgs.executors, parsedArgs.output, parsedArgs.scripts, parsedArgs.columns, parsedArgs.encoding)
+    for problem in problems:
+        print(problem)
+    numErrors = sum(1 for problem in problems if problem.severity == Severity.ERROR)
+    print("%s errors, %s warnings" % (numErrors, len(problems)-numErrors))
+    return 1 if numErrors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import asyncio
+from abc import ABC, abstractmethod
+
+from menu.menus import MenuNode
+from menu.display.display import Display
+
+class AsyncDisplay(ABC):
+    '''
+    asyncio version of Display with awaitable output methods.
+    '''
+
+    @property
+    def num_rows(self) -> int:
+        return None
+
+    @property
+    def num_columns(self) -> int:
+        return None
+
+    @property
+    def page_size(self) -> int:
+        return self.num_rows
+
+    @abstractmethod
+    async def display_menu(self, menunode: MenuNode, cursorPos: int):
+        pass
+
+    @abstractmethod
+    async def display_output(self, menunode: MenuNode, output: str):
+        pass
+
+    @abstractmethod
+    async def clear(self):
+        pass
+
+    @abstractmethod
+    async def cleanup(self):
+        pass
+
+    def invalidate_render_cache(self):
+        pass
+
+
+class AsyncDisplayAdapter(AsyncDisplay):
+    '''
+    Makes any Display usable as an AsyncDisplay. Fast displays are called directly on the event loop. Displays that
+    block on their device, like the I2C lcd, can be offloaded to a worker thread so the loop keeps running.
+    '''
+
+    def __init__(self, display: Display, offload: bool = False):
+        self._display = display
+        self._offload = offload
+
+    async def _call(self, method, *args):
+        if self._offload:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    @property
+    def num_rows(self) -> int:
+        return self._display.num_rows
+
+    @property
+    def num_columns(self) -> int:
+        return self._display.num_columns
+
+    @property
+    def page_size(self) -> int:
+        return self._display.page_size
+
+    async def display_menu(self, menunode: MenuNode, cursorPos: int):
+        await self._call(self._display.display_menu, menunode, cursorPos)
+
+    async def display_output(self, menunode: MenuNode, output: str):
+        await self._call(self._display.display_output, menunode, output)
+
+    async def clear(self):
+        await self._call(self._display.clear)
+
+    async def cleanup(self):
+        await self._call(self._display.cleanup)
+
+    def invalidate_render_cache(self):
+        self._display.invalidate_render_cache()
@@ -1,10 +1,30 @@
 from typing import List
+from collections import OrderedDict
 import os, platform, logging
 
 from menu.menus import SelectionOption
 from menu.display.display import Display
+from menu.display.listwindow import ListWindow
 from menu.menus import MenuNode
 
+def option_row_text(optionNum: int, displayName: str, numColumns: int) -> str:
+    '''
+    The row of a selection option after the one character cursor marker, clipped and padded to the display width.
+    '''
+    return (str(optionNum+1)+": "+displayName)[0:numColumns-1].ljust(numColumns-1)
+
+class RenderedSelectionOptions(list):
+    '''
+        Selection options along with their rows, as returned by option_row_text() and encoded, for one display
+        width and character encoding. Menu nodes decoded from a snapshot compiled for a display geometry carry
+        these so bounded displays of that geometry copy the rows instead of rendering them.
+    '''
+    def __init__(self, selectionOptions: List[SelectionOption], rows: List[bytes], numColumns: int, characterEncoding: str):
+        super().__init__(selectionOptions)
+        self.rows = rows
+        self.num_columns = numColumns
+        self.character_encoding = characterEncoding
+
 # Not meant for instantiation
 class BoundedCharacterDisplay(Display):
     '''
@@ -15,8 +35,14 @@ class BoundedCharacterDisplay(Display):
 
         Bounded displays can exist in a terminal or lcd format or any display where the formatting of the character
         output size is restricted.
+
+        Rendered selection menu rows are kept in a small LRU cache keyed by menu node id, window and cursor position.
+        The row count, column count and encoding are fixed for a display so they don't need to be part of the key.
+        The cache must be invalidated when the menu nodes change.
     '''
 
+    RENDER_CACHE_SIZE = 64
+
     def __init__(self, numRows: int, numColumns: int, characterEncoding: str):
         self._numRows = numRows
         if (numRows == 0):
@@ -27,18 +53,22 @@ class BoundedCharacterDisplay(Display):
             logging.error("Number of columns must be greater than zero")
             raise Exception("Number of columns must be greater than zero")
         self._characterEncoding = characterEncoding
+        self._renderCache = OrderedDict()
+        self._listWindow = ListWindow(numRows)
         self.set_window(0)
 
-    def set_window(self, cursor: int):
-        if cursor == 0:
-            self._windowTop = 0
-            self._windowBottom = self._numRows-1
-        elif cursor < self._windowTop:
-            self._windowTop -= 1
-            self._windowBottom -= 1
-        elif cursor > self._windowBottom:
-            self._windowTop += 1
-            self._windowBottom += 1
+    @property
+    def num_rows(self) -> int:
+        return self._numRows
+
+    @property
+    def num_columns(self) -> int:
+        return self._numColumns
+
+    def set_window(self, cursor: int, numOptions: int = None):
+        self._listWindow.move(cursor, numOptions)
+        self._windowTop = self._listWindow.top
+        self._windowBottom = self._listWindow.bottom
 
     def prepare_selection_menu_display_buffer(self, selectionOptions: List[SelectionOption], windowTop: int, windowBottom: int, cursorPos: int) -> List[bytearray]:
         '''
@@ -46,29 +76,55 @@ class BoundedCharacterDisplay(Display):
         displayed on the menu. Selection Option display values for each row will be cropped according to the number of
         columns set for the Bounded display.
         '''
-        windowOptions = [(position, selectionOption) for position, selectionOption in enumerate(selectionOptions)]
-
         rowByteArrays = []
+        rendered = isinstance(selectionOptions, RenderedSelectionOptions) and selectionOptions.num_columns == self._numColumns \
+            and selectionOptions.character_encoding == self._characterEncoding
 
-        for selOption in windowOptions[windowTop:windowBottom+1]:
-            selectionNum = selOption[0]
-            option = selOption[1]
+        for selectionNum in range(windowTop, min(windowBottom+1, len(selectionOptions))):
             prepend = ' '
             if selectionNum==cursorPos:
                 prepend = '>'
-            displayString = prepend+str(selectionNum+1)+": "+option.display_name
-            clippedDisplayString = displayString[0:self._numColumns]
-            paddedAndClippedDisplayString = clippedDisplayString.ljust(self._numColumns)
-            rowByteArrays.append(bytearray(paddedAndClippedDisplayString, self._characterEncoding))
+            if rendered:
+                rowByteArrays.append(bytearray(prepend, self._characterEncoding)+selectionOptions.rows[selectionNum])
+            else:
+                displayString = prepend+option_row_text(selectionNum, selectionOptions[selectionNum].display_name, self._numColumns)
+                rowByteArrays.append(bytearray(displayString, self._characterEncoding))
+
+        return rowByteArrays
 
+    def prepare_menu_node_display_buffer(self, menunode: MenuNode, windowTop: int, windowBottom: int, cursorPos: int) -> List[bytearray]:
+        '''
+        Cached version of prepare_selection_menu_display_buffer for the selection options of a menu node.
+        The returned rows are shared with the cache and must not be modified. Generated options change over
+        time so they are rendered without the cache.
+        '''
+        if menunode.is_dynamic:
+            return self.prepare_selection_menu_display_buffer(menunode.selection_options, windowTop, windowBottom, cursorPos)
+
+        cacheKey = (menunode.id, windowTop, cursorPos)
+        rowByteArrays = self._renderCache.get(cacheKey)
+        if rowByteArrays is not None:
+            self._renderCache.move_to_end(cacheKey)
+            return rowByteArrays
+
+        rowByteArrays = self.prepare_selection_menu_display_buffer(menunode.selection_options, windowTop, windowBottom, cursorPos)
+        self._renderCache[cacheKey] = rowByteArrays
+        if len(self._renderCache) > self.RENDER_CACHE_SIZE:
+            self._renderCache.popitem(last=False)
         return rowByteArrays
 
+    def invalidate_render_cache(self):
+        self._renderCache.clear()
+
     def prepare_output_display_buffer(self, output: bytearray, numRows, numColumns) -> List[bytearray]:
         '''
         Accepts an arbitrary length string to be output to the display. The output string is converted to a list
         of byte arrays to be displayed. The original string will be cropped to the total number of characters
         available in the display (rows*characters/row).
         '''
+        if isinstance(output, str):
+            output = bytearray(output, self._characterEncoding, errors='replace')
+
         rowByteArrays = []
         splitNum = numColumns
         rows = [output[i:i+splitNum] for i in range(0, len(output), splitNum)]
@@ -93,9 +149,9 @@ class BoundedCharacterTerminalDisplay(BoundedCharacterDisplay):
             logging.error("Must have selection options to display menu")
             raise Exception("Must have selection options to display")
 
-        self.set_window(cursorPos)
+        self.set_window(cursorPos, len(selectionOptions))
 
-        displayBuffer = self.prepare_selection_menu_display_buffer(selectionOptions, self._windowTop, self._windowBottom, cursorPos)
+        displayBuffer = self.prepare_menu_node_display_buffer(menunode, self._windowTop, self._windowBottom, cursorPos)
         for row in displayBuffer:
             self._output_data(row.decode(self._characterEncoding))
 
@@ -4,6 +4,20 @@ from menu.menus import MenuNode
 
 class Display(ABC):
 
+    # Displays that restrict output to a number of rows and columns override these. None means unbounded.
+    @property
+    def num_rows(self) -> int:
+        return None
+
+    @property
+    def num_columns(self) -> int:
+        return None
+
+    # Options shown at once in a selection menu, used to page through long menus. None if they're all shown.
+    @property
+    def page_size(self) -> int:
+        return self.num_rows
+
     @abstractmethod
     def display_menu(self, menunode: MenuNode):
         pass
@@ -18,4 +32,8 @@ class Display(ABC):
 
     @abstractmethod
     def cleanup(self):
-        pass
\ No newline at end of file
+        pass
+
+    # Called when the menu nodes change so displays caching rendered menus can drop them
+    def invalidate_render_cache(self):
+        pass
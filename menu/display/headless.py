@@ -0,0 +1,125 @@
+import logging, time
+from collections import deque
+from typing import List
+
+from menu.menus import MenuNode
+from menu.display.bounded import BoundedCharacterDisplay
+from menu.instrumentation import Instrumentation, NULL_INSTRUMENTATION
+
+class HeadlessDisplay(BoundedCharacterDisplay):
+    '''
+        A BoundedCharacterDisplay that renders into an in-memory character framebuffer instead of a device, for
+        load tests and golden tests of menus on machines without a terminal or lcd.
+
+        Every display call renders rows the same way the terminal and lcd displays do and copies them into the
+        framebuffer, padded to the full width. The last maxFrames frames are kept with their timestamps; with
+        maxFrames set to 0 no history is kept and only the framebuffer is updated.
+
+        Time spent rendering rows and time spent writing them to the framebuffer are added up separately, and also
+        reported as the display_render_seconds and display_output_seconds histograms when instrumentation is enabled,
+        so render cost can be told apart from output cost.
+    '''
+
+    class Frame(object):
+        def __init__(self, timestamp: float, rows: List[str]):
+            self._timestamp = timestamp
+            self._rows = rows
+
+        @property
+        def timestamp(self) -> float:
+            return self._timestamp
+
+        @property
+        def rows(self) -> List[str]:
+            return self._rows
+
+        @property
+        def text(self) -> str:
+            return "\n".join(self._rows)
+
+    def __init__(self, rows: int = 4, columns: int = 20, characterEncoding: str = 'ascii', maxFrames: int = 1000,
+                 instrumentation: Instrumentation = NULL_INSTRUMENTATION):
+        super().__init__(rows, columns, characterEncoding)
+        self._instrumentation = instrumentation
+        self._frames = deque(maxlen=maxFrames)
+        self._recordFrames = maxFrames != 0
+        self._framebuffer = [' '*columns]*rows
+        self._numFrames = 0
+        self._renderSeconds = 0.0
+        self._outputSeconds = 0.0
+
+    @property
+    def framebuffer(self) -> List[str]:
+        return list(self._framebuffer)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self._framebuffer)
+
+    @property
+    def frames(self) -> List[Frame]:
+        '''
+        The recorded frames, oldest first.
+        '''
+        return list(self._frames)
+
+    @property
+    def num_frames(self) -> int:
+        '''
+        Frames written since the display was created or the stats were reset, recorded or not.
+        '''
+        return self._numFrames
+
+    @property
+    def render_seconds(self) -> float:
+        return self._renderSeconds
+
+    @property
+    def output_seconds(self) -> float:
+        return self._outputSeconds
+
+    def reset_stats(self):
+        self._frames.clear()
+        self._numFrames = 0
+        self._renderSeconds = 0.0
+        self._outputSeconds = 0.0
+
+    def display_menu(self, menunode: MenuNode, cursorPos: int):
+        start = time.perf_counter()
+        selectionOptions = menunode.selection_options
+        if not selectionOptions:
+            logging.error("Must have selection options to display")
+            raise Exception("Must have selection options to display")
+
+        self.set_window(cursorPos, len(selectionOptions))
+        displayBuffer = self.prepare_menu_node_display_buffer(menunode, self._windowTop, self._windowBottom, cursorPos)
+        self._write_frame(displayBuffer, start)
+
+    def display_output(self, menunode: MenuNode, output: bytearray):
+        start = time.perf_counter()
+        displayBuffer = self.prepare_output_display_buffer(output, self._numRows, self._numColumns) if output else []
+        self._write_frame(displayBuffer, start)
+
+    def _write_frame(self, displayBuffer: List, renderStart: float):
+        outputStart = time.perf_counter()
+
+        # Every row of the framebuffer gets a value so rows not covered by the display buffer are blanked
+        frame = [row.decode(self._characterEncoding, errors='replace').ljust(self._numColumns) for row in displayBuffer[:self._numRows]]
+        frame.extend([' '*self._numColumns]*(self._numRows-len(frame)))
+        self._framebuffer = frame
+        if self._recordFrames:
+            self._frames.append(HeadlessDisplay.Frame(time.monotonic(), frame))
+        self._numFrames += 1
+
+        end = time.perf_counter()
+        self._renderSeconds += outputStart-renderStart
+        self._outputSeconds += end-outputStart
+        if self._instrumentation.enabled:
+            self._instrumentation.observe('display_render_seconds', outputStart-renderStart)
+            self._instrumentation.observe('display_output_seconds', end-outputStart)
+
+    def clear(self):
+        self._write_frame([], time.perf_counter())
+
+    def cleanup(self):
+        self.clear()
@@ -0,0 +1,48 @@
+class ListWindow(object):
+    '''
+        The rows of a selection list that fit on a display, shared by all displays so long lists are scrolled
+        and paged the same way everywhere. Only the window is ever rendered, so the cost of a redraw depends on
+        the number of visible rows and not on the length of the list.
+
+        Moving the cursor by one row scrolls the window by at most one row. When the cursor jumps further, e.g.
+        a page up or down, the window moves with it so the cursor stays on the same row of the display, as
+        far as the ends of the list allow.
+    '''
+    def __init__(self, numRows: int):
+        self._numRows = numRows
+        self._top = 0
+        self._cursor = 0
+
+    @property
+    def top(self) -> int:
+        return self._top
+
+    @property
+    def bottom(self) -> int:
+        return self._top+self._numRows-1
+
+    def move(self, cursor: int, numOptions: int = None):
+        '''
+        Moves the window so the cursor is visible. numOptions, if known, keeps a jump to the end of the list from
+        leaving empty rows at the bottom of the display.
+        '''
+        if cursor is None or cursor == 0:
+            self._top = 0
+        elif cursor < self._top or cursor > self.bottom:
+            if abs(cursor-self._cursor) > 1:
+                self._top += cursor-self._cursor
+                if numOptions is not None:
+                    self._top = min(self._top, numOptions-self._numRows)
+                self._top = max(self._top, 0)
+            # scrolled by one row or the jump still leaves the cursor outside the window
+            if cursor < self._top:
+                self._top = cursor
+            elif cursor > self.bottom:
+                self._top = cursor-self._numRows+1
+        self._cursor = cursor if cursor is not None else 0
+
+    def visible(self, numOptions: int) -> range:
+        '''
+        Indexes of the options shown in the window.
+        '''
+        return range(self._top, min(self._top+self._numRows, numOptions))
@@ -1,19 +1,53 @@
-import time, logging
+import time, logging, threading
 from typing import List
 
 from menu.menus import MenuNode
 from menu.display.bounded import BoundedCharacterDisplay
-from qwiic_serlcd import QwiicSerlcd
+from menu.instrumentation import Instrumentation, NULL_INSTRUMENTATION
+from qwiic_serlcd import QwiicSerlcd, SPECIAL_COMMAND, LCD_SETDDRAMADDR
 
 #    sudo pip install sparkfun-qwiic-i2c
 #    sudo pip install sparkfun-qwiic-serlcd
 
 class Sparkfun4x20LCDDisplay(BoundedCharacterDisplay):
+    '''
+        A BoundedCharacterDisplay for the SparkFun SerLCD over I2C.
 
-    def __init__(self, rows: int, columns: int, characterEncoding: str):
+        The display keeps a shadow copy of the rows last written to the lcd and only sends the characters that
+        changed. Scrolling a menu usually only moves the '>' cursor marker, so two characters are sent instead of
+        a clear screen and four full rows, which is also when the I2C connection tends to drop out.
+
+        The changes of a frame are sent as one byte stream of set cursor commands and characters, cut into I2C
+        block writes of at most MAX_BLOCK_SIZE bytes, rather than one transaction per character as
+        QwiicSerlcd.print() does.
+
+        With writerThread set, frames are handed to a background thread through a single slot mailbox: a frame
+        not yet written when the next one arrives is dropped, since only the latest frame matters. The writer
+        thread also reconnects to the lcd after an I2C error, backing off up to MAX_RECONNECT_DELAY, so display
+        calls return without waiting on the bus. Call flush() to wait for the last frame to reach the lcd.
+    '''
+
+    MAX_BLOCK_SIZE = 32 # bytes in one I2C block write, the SMBus limit
+    BLOCK_DELAY = 0.01 # seconds the lcd is given to process a block
+    ROW_OFFSETS = [0x00, 0x40, 0x14, 0x54] # display memory address of the start of each row
+    RECONNECT_DELAY = 0.2 # seconds before the first reconnect after an I2C error
+    MAX_RECONNECT_DELAY = 5.0
+
+    def __init__(self, rows: int, columns: int, characterEncoding: str, instrumentation: Instrumentation = NULL_INSTRUMENTATION,
+                 writerThread: bool = False):
         super().__init__(rows, columns, characterEncoding)
 
+        self._instrumentation = instrumentation
+
         self._numRetries = 3
+        self._shadowRows = None # contents of the lcd, unknown until the first full frame is written
+
+        self._condition = threading.Condition()
+        self._pendingFrame = None # mailbox of the writer thread
+        self._failedFrame = None # frame to write again once the lcd is reconnected
+        self._writing = False
+        self._stopped = threading.Event()
+        self._writer = None
 
         for n in range(self._numRetries):
             try:
@@ -25,13 +59,17 @@ class Sparkfun4x20LCDDisplay(BoundedCharacterDisplay):
                 self._lcd.leftToRight()
                 self._lcd.noCursor()            # I think this just removes the blinking cursor
 
-                return
+                break
             except Exception as e:
                 logging.error("Error initializing lcd: "+str(e))
                 time.sleep(0.2)
+        else:
+            logging.error("Unable to initialize LCD")
+            raise Exception("Unable to initialize LCD")
 
-        logging.error("Unable to initialize LCD")
-        raise Exception("Unable to initialize LCD")
+        if writerThread:
+            self._writer = threading.Thread(target=self._run_writer, name="lcd-writer", daemon=True)
+            self._writer.start()
 
     def _init_lcd(self):
         self._lcd = QwiicSerlcd()
@@ -41,57 +79,220 @@ class Sparkfun4x20LCDDisplay(BoundedCharacterDisplay):
 
     def display_menu(self, menunode: MenuNode, cursorPos: int):
 
-        self.clear()
-
         selectionOptions = menunode.selection_options
 
         if not selectionOptions:
             logging.error("Must have selection options to display")
             raise Exception("Must have selection options to display")
 
-        self.set_window(cursorPos)
+        self.set_window(cursorPos, len(selectionOptions))
 
-        displayBuffer = self.prepare_selection_menu_display_buffer(selectionOptions, self._windowTop, self._windowBottom, cursorPos)
+        displayBuffer = self.prepare_menu_node_display_buffer(menunode, self._windowTop, self._windowBottom, cursorPos)
         self._send_data_to_lcd(displayBuffer)
 
     def display_output(self, menunode: MenuNode, output: bytearray):
 
-        self.clear()
-
         if not output:
+            self.clear()
             return
 
         displayBuffer = self.prepare_output_display_buffer(output, self._numRows, self._numColumns)
         self._send_data_to_lcd(displayBuffer)
 
+    def _prepare_frame(self, displayBuffer: List) -> List[str]:
+        # Every row of the lcd gets a value so rows not covered by the display buffer are blanked
+        # script output may not be in the character encoding of the lcd
+        frame = [row.decode(self._characterEncoding, errors='replace').ljust(self._numColumns) for row in displayBuffer[:self._numRows]]
+        frame.extend([' '*self._numColumns]*(self._numRows-len(frame)))
+        return frame
+
+    @staticmethod
+    def _changed_runs(shadowRow: str, row: str) -> List:
+        '''
+        Returns (column, text) pairs for the runs of characters in row that differ from shadowRow.
+        The whole row is returned when the current contents of the lcd row are unknown.
+        '''
+        if shadowRow is None:
+            return [(0, row)]
+
+        runs = []
+        runStart = None
+        for column in range(len(row)):
+            if row[column] != shadowRow[column]:
+                if runStart is None:
+                    runStart = column
+            elif runStart is not None:
+                runs.append((runStart, row[runStart:column]))
+                runStart = None
+        if runStart is not None:
+            runs.append((runStart, row[runStart:]))
+        return runs
+
+    def _frame_blocks(self, frame: List[str]) -> List[bytes]:
+        '''
+        Returns the I2C blocks that bring the lcd from the shadow rows to frame. A set cursor command is never
+        split across two blocks.
+        '''
+        blocks = []
+        block = bytearray()
+        for rowNum, row in enumerate(frame):
+            # rewriting up to two unchanged characters costs no more than a set cursor command
+            runs = []
+            for column, text in self._changed_runs(self._shadowRows[rowNum], row):
+                if runs and column-(runs[-1][0]+len(runs[-1][1])) <= 2:
+                    runStart = runs.pop()[0]
+                    runs.append((runStart, row[runStart:column+len(text)]))
+                else:
+                    runs.append((column, text))
+
+            for column, text in runs:
+                if len(block) > self.MAX_BLOCK_SIZE-2:
+                    blocks.append(bytes(block))
+                    block = bytearray()
+                block += bytes((SPECIAL_COMMAND, LCD_SETDDRAMADDR | (column+self.ROW_OFFSETS[rowNum])))
+
+                data = text.encode(self._characterEncoding, errors='replace')
+                while data:
+                    if len(block) == self.MAX_BLOCK_SIZE:
+                        blocks.append(bytes(block))
+                        block = bytearray()
+                    size = self.MAX_BLOCK_SIZE-len(block)
+                    block += data[:size]
+                    data = data[size:]
+        if block:
+            blocks.append(bytes(block))
+        return blocks
+
+    def _write_frame(self, frame: List[str]):
+        if self._shadowRows is None:
+            self._shadowRows = [None]*self._numRows
+
+        for block in self._frame_blocks(frame):
+            self._write_block(block)
+            time.sleep(self.BLOCK_DELAY)
+
+        self._shadowRows = list(frame)
+
+    def _write_block(self, block: bytes):
+        '''
+        Writes a block of set cursor commands and characters in one I2C transaction. QwiicSerlcd only prints text
+        a character at a time, so the block goes to its I2C driver, or through the QwiicSerlcd commands if the
+        driver isn't available.
+        '''
+        i2c = getattr(self._lcd, '_i2c', None)
+        if i2c is not None and hasattr(i2c, 'writeBlock'):
+            if i2c.writeBlock(self._lcd.address, block[0], list(block[1:])) is False:
+                raise OSError("I2C block write failed")
+            return
+
+        position = 0
+        while position < len(block):
+            if block[position] == SPECIAL_COMMAND:
+                self._lcd.specialCommand(block[position+1])
+                position += 2
+            else:
+                end = block.find(bytes((SPECIAL_COMMAND,)), position)
+                end = len(block) if end < 0 else end
+                self._lcd.print(block[position:end].decode('latin-1'))
+                position = end
+
+    def _reconnect(self):
+        self._init_lcd()
+        self._instrumentation.count('lcd_reinit_total')
+        self._lcd.clearScreen()         # clear the screen - this moves the cursor to the home position as well
+        self._shadowRows = [' '*self._numColumns]*self._numRows
+
     def _send_data_to_lcd(self, displayBuffer: List):
 
+        frame = self._prepare_frame(displayBuffer)
+
+        if self._writer is not None:
+            self._post_frame(frame)
+            return
+
         # This is to mitigate i2c connection issues with the lcd device
         # Every 4-6 button presses and menu updates, the rpi would lose
         # connectivity with the lcd. If we get a connection exception
         # restart the lcd and resend the menu commands
         for n in range(self._numRetries):
             try:
-                for rowNum, row in enumerate(displayBuffer):
-
-                    rowData = row.decode(self._characterEncoding)
-
-                    self._lcd.setCursor(0, rowNum)
-                    self._lcd.print(rowData)
-
+                self._write_frame(frame)
                 return
 
             except:
+                self._instrumentation.count('lcd_write_retries_total')
                 time.sleep(0.2)
-                self._init_lcd()
-                self.clear()
+                self._reconnect()
 
         logging.error("Unable to send data to LCD")
 
+    def _post_frame(self, frame: List[str]):
+        with self._condition:
+            if self._pendingFrame is not None:
+                self._instrumentation.count('lcd_frames_dropped_total')
+            self._pendingFrame = frame
+            self._condition.notify_all()
+
+    def _run_writer(self):
+        reconnectDelay = self.RECONNECT_DELAY
+        while True:
+            with self._condition:
+                while self._pendingFrame is None and self._failedFrame is None and not self._stopped.is_set():
+                    self._condition.wait()
+                # a newer frame replaces one that failed to be written
+                frame = self._pendingFrame if self._pendingFrame is not None else self._failedFrame
+                if frame is None:
+                    return
+                reconnect = self._failedFrame is not None
+                self._pendingFrame = None
+                self._failedFrame = None
+                self._writing = True
+
+            try:
+                if reconnect:
+                    self._reconnect()
+                self._write_frame(frame)
+                failed = False
+                reconnectDelay = self.RECONNECT_DELAY
+            except Exception as e:
+                logging.error("Error writing to lcd: "+str(e))
+                self._instrumentation.count('lcd_write_retries_total')
+                failed = True
+
+            with self._condition:
+                if failed:
+                    self._failedFrame = frame
+                self._writing = False
+                self._condition.notify_all()
+
+            if failed:
+                if self._stopped.wait(reconnectDelay):
+                    return
+                reconnectDelay = min(reconnectDelay*2, self.MAX_RECONNECT_DELAY)
+
+    def flush(self, timeout: float = None) -> bool:
+        '''
+        Waits until the writer thread has written the last frame handed to it, including any reconnects this
+        takes. Returns False on timeout.
+        '''
+        if self._writer is None:
+            return True
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pendingFrame is None and self._failedFrame is None and not self._writing, timeout)
+
     def clear(self):
+        if self._writer is not None:
+            self._post_frame([' '*self._numColumns]*self._numRows)
+            return
         self._lcd.clearScreen()         # clear the screen - this moves the cursor to the home position as well
+        self._shadowRows = [' '*self._numColumns]*self._numRows
 
     def cleanup(self):
         # TODO: maybe we can write a "goodbye!" to the lcd or something else besides clearing it?
         self.clear()
-
+        if self._writer is not None:
+            self.flush(timeout=1.0)
+            self._stopped.set()
+            with self._condition:
+                self._condition.notify_all()
+            self._writer.join(timeout=1.0)
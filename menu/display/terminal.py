@@ -1,9 +1,23 @@
 import platform, os, logging
 
 from menu.display.display import Display
+from menu.display.listwindow import ListWindow
 from menu.menus import MenuNode
 
 class TerminalDisplay(Display):
+    '''
+        Prints menus to the terminal. Only one page of pageSize options of a selection menu is printed, the page
+        holding the cursor, so long menus don't scroll the terminal. A pageSize of None prints every option.
+    '''
+    PAGE_SIZE = 20
+
+    def __init__(self, pageSize: int = PAGE_SIZE):
+        self._pageSize = pageSize
+        self._listWindow = ListWindow(pageSize) if pageSize else None
+
+    @property
+    def page_size(self) -> int:
+        return self._pageSize
 
     # for unit test mocking purposes
     def _output_data(self, output: str):
@@ -15,7 +29,14 @@ class TerminalDisplay(Display):
             logging.error("Must have selection options to display")
             raise Exception("Must have selection options to display")
 
-        for pos, selectionOption in enumerate(selectionOptions):
+        if self._listWindow is None:
+            visible = range(len(selectionOptions))
+        else:
+            self._listWindow.move(cursorPos, len(selectionOptions))
+            visible = self._listWindow.visible(len(selectionOptions))
+
+        for pos in visible:
+            selectionOption = selectionOptions[pos]
             if pos==cursorPos:
                 self._output_data("> "+str(pos)+": "+selectionOption.display_name)
             else:
@@ -0,0 +1,236 @@
+'''
+Timing and counter instrumentation for the menu system.
+
+Components take an optional Instrumentation. The default, NULL_INSTRUMENTATION, records nothing: its methods
+return immediately and callers check the enabled attribute before taking timestamps, so a disabled build only
+pays for an attribute lookup on the hot paths.
+
+MetricsInstrumentation keeps counters, gauges and latency histograms in memory. They can be read in-process
+with snapshot() or written to a file in Prometheus text or JSON format, either on demand or periodically.
+
+Metric names used by the menu system:
+
+    menu_actions_total                  counter     actions taken off the action queue
+    menu_action_queue_depth             gauge       actions waiting when a batch is taken off the queue
+    menu_action_queue_wait_seconds      histogram   enqueue (button press/key read) to dequeue, needs an InstrumentedQueue
+    menu_action_latency_seconds         histogram   enqueue to the end of the display write, needs an InstrumentedQueue
+    menu_navigation_seconds             histogram   handling of one action by the navigator
+    menu_execution_seconds              histogram   synchronous executions run on the event loop
+    menu_display_seconds                histogram   one display write
+    display_render_seconds              histogram   rendering the rows of one frame, see HeadlessDisplay
+    display_output_seconds              histogram   writing one rendered frame, see HeadlessDisplay
+    executor_script_seconds             histogram   script run time
+    executor_method_seconds             histogram   registered method run time
+    executor_failures_total             counter     scripts or methods that failed
+    executor_timeouts_total             counter     executions that timed out
+    executor_cache_hits_total           counter     executions answered from the result cache
+    executor_cache_misses_total         counter     cacheable executions that had to run
+    executor_prefetch_started_total     counter     speculative executions started
+    executor_prefetch_hits_total        counter     requested executions answered by a prefetch
+    executor_prefetch_cancelled_total   counter     prefetches cancelled before they finished
+    executor_prefetch_rejected_total    counter     prefetches not started because the budget was used up
+    menu_shard_loads_total              counter     menu shards loaded from disk, see ShardedMenuNodes
+    menu_shard_evictions_total          counter     menu shards dropped to stay under the menu node cap
+    menu_shard_loaded_nodes             gauge       menu nodes held by loaded shards
+    lcd_write_retries_total             counter     lcd writes that had to be retried
+    lcd_reinit_total                    counter     lcd reinitializations after an I2C error
+    lcd_frames_dropped_total            counter     frames replaced by a newer one before the lcd writer thread wrote them
+'''
+
+import bisect, json, logging, os, threading, time
+from collections import deque
+from queue import Queue
+from typing import Dict, List
+
+
+class Instrumentation(object):
+    '''
+    Instrumentation that records nothing. Base class of real implementations.
+    '''
+    enabled = False
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+    def gauge(self, name: str, value: float):
+        pass
+
+    def observe(self, name: str, seconds: float):
+        pass
+
+
+NULL_INSTRUMENTATION = Instrumentation()
+
+
+class Histogram(object):
+    '''
+    A histogram with fixed bucket upper bounds in seconds, as used by Prometheus.
+    '''
+    DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets: List[float] = DEFAULT_BUCKETS):
+        self._buckets = tuple(buckets)
+        self._counts = [0]*(len(self._buckets)+1) # last one is +Inf
+        self._count = 0
+        self._sum = 0.0
+
+    def observe(self, value: float):
+        self._counts[bisect.bisect_left(self._buckets, value)] += 1
+        self._count += 1
+        self._sum += value
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def quantile(self, q: float) -> float:
+        '''
+        Upper bound of the bucket containing the q quantile, None for an empty histogram.
+        '''
+        if self._count == 0:
+            return None
+        rank = q*self._count
+        cumulative = 0
+        for index, count in enumerate(self._counts):
+            cumulative += count
+            if cumulative >= rank and count > 0:
+                return self._buckets[index] if index < len(self._buckets) else float('inf')
+        return float('inf')
+
+    def as_dict(self) -> Dict:
+        cumulative = 0
+        buckets = {}
+        for index, count in enumerate(self._counts):
+            cumulative += count
+            buckets[str(self._buckets[index]) if index < len(self._buckets) else '+Inf'] = cumulative
+        return {'count': self._count, 'sum': self._sum, 'buckets': buckets,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99)}
+
+
+class MetricsInstrumentation(Instrumentation):
+    '''
+    Keeps counters, gauges and histograms in memory. Safe to use from several threads.
+    '''
+    enabled = True
+
+    def __init__(self, buckets: List[float] = Histogram.DEFAULT_BUCKETS):
+        self._buckets = buckets
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, float] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+        self._dumpThread = None
+        self._dumpEvent = threading.Event()
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self._buckets)
+            histogram.observe(seconds)
+
+    def counter_value(self, name: str) -> int:
+        return self._counters.get(name, 0)
+
+    def histogram(self, name: str) -> Histogram:
+        return self._histograms.get(name)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'histograms': {name: histogram.as_dict() for name, histogram in self._histograms.items()},
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=4)
+
+    def to_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append("# TYPE %s counter" % name)
+            lines.append("%s %d" % (name, value))
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines.append("# TYPE %s gauge" % name)
+            lines.append("%s %s" % (name, repr(float(value))))
+        for name, histogram in sorted(snapshot['histograms'].items()):
+            lines.append("# TYPE %s histogram" % name)
+            for bound, count in histogram['buckets'].items():
+                lines.append('%s_bucket{le="%s"} %d' % (name, bound, count))
+            lines.append("%s_sum %s" % (name, repr(histogram['sum'])))
+            lines.append("%s_count %d" % (name, histogram['count']))
+        return "\n".join(lines)+"\n"
+
+    def dump(self, filename: str):
+        '''
+        Writes all metrics to a file, in JSON if the file name ends with .json and Prometheus text otherwise.
+        The file is replaced atomically so a scraper never reads a partial dump.
+        '''
+        content = self.to_json() if filename.endswith(".json") else self.to_prometheus()
+        tmpFilename = filename + ".tmp"
+        with open(tmpFilename, "w") as dump_file:
+            dump_file.write(content)
+        os.replace(tmpFilename, filename)
+
+    def start_dump(self, filename: str, interval: float = 10.0):
+        '''
+        Dumps the metrics to a file every interval seconds on a background thread until stop_dump() is called.
+        '''
+        self._dumpEvent.clear()
+        self._dumpThread = threading.Thread(target=self._dump_periodically, args=(filename, interval), daemon=True)
+        self._dumpThread.start()
+
+    def stop_dump(self):
+        if self._dumpThread is not None:
+            self._dumpEvent.set()
+            self._dumpThread.join()
+            self._dumpThread = None
+
+    def _dump_periodically(self, filename: str, interval: float):
+        while not self._dumpEvent.wait(interval):
+            try:
+                self.dump(filename)
+            except OSError as e:
+                logging.warning("Unable to write metrics dump: %s", e)
+        try:
+            self.dump(filename)
+        except OSError as e:
+            logging.warning("Unable to write metrics dump: %s", e)
+
+
+class InstrumentedQueue(Queue):
+    '''
+    An action queue that timestamps every item when it is put on the queue, e.g. from a GPIO callback or a
+    keyboard read, so the time spent waiting in the queue and the full latency of an action can be measured.
+    '''
+    def __init__(self, instrumentation: Instrumentation, maxsize: int = 0):
+        super().__init__(maxsize)
+        self._instrumentation = instrumentation
+        self.last_enqueue_time = None # enqueue time of the item most recently taken off the queue
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self._enqueueTimes = deque()
+
+    def _put(self, item):
+        self._enqueueTimes.append(time.perf_counter())
+        super()._put(item)
+
+    def _get(self):
+        self.last_enqueue_time = self._enqueueTimes.popleft()
+        self._instrumentation.observe('menu_action_queue_wait_seconds', time.perf_counter()-self.last_enqueue_time)
+        return super()._get()
@@ -1,15 +1,38 @@
-import json, logging
-from typing import List, Callable, Dict
+import asyncio, base64, bisect, inspect, json, logging, os, signal, sys, threading, time
+from typing import List, Callable, Dict, Mapping, Tuple
+from collections import deque, OrderedDict
+from collections.abc import Sequence
 from enum import Enum, unique
 import subprocess
-from subprocess import CalledProcessError
+from subprocess import CalledProcessError, TimeoutExpired
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
+from .instrumentation import Instrumentation, NULL_INSTRUMENTATION
+from .pyworker import PyScriptWorker
+from .shellpool import ShellPool
+
 def check_for_duplicates(dlist):
     if len(dlist) != len(set(dlist)):
         logging.error("Duplicates found")
         raise Exception("Duplicates found")
 
+def intern_id(value: str) -> str:
+    return sys.intern(value) if value is not None else None
+
+def kill_process(process):
+    '''
+    Kills a script process started in its own session along with any children it started, so nothing keeps
+    its output pipe open after it is gone.
+    '''
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
 @unique
 class MenuNodeSpecialId(Enum):
     ROOT = 'ROOT'
@@ -29,6 +52,7 @@ class MenuDestination(Enum):
 class ExecutorNodeType(Enum):
     METHOD = 'method'
     SCRIPT = 'script'
+    PYSCRIPT = 'pyscript' # python script run by a PyScriptWorker
 
 @unique
 class MenuNodeType(Enum):
@@ -37,8 +61,10 @@ class MenuNodeType(Enum):
     OUTPUT = 'output'
 
 class SelectionOption(object):
+    __slots__ = ('_menuNodeId', '_displayName')
+
     def __init__(self, id: str, displayName: str):
-        self._menuNodeId = id
+        self._menuNodeId = intern_id(id) # shares the string with the target menu node
         self._displayName = displayName
 
     @property
@@ -49,17 +75,195 @@ class SelectionOption(object):
     def display_name(self) -> str:
         return self._displayName
 
+    @property
+    def value(self) -> str:
+        return None
+
     @staticmethod
     def as_selection_option(dct: Dict):
         return SelectionOption(id=dct['menuNodeId'],displayName=dct['displayName'])
 
 
+class GeneratedSelectionOption(SelectionOption):
+    '''
+        A selection option produced by an options provider. value is what the provider returned for it, e.g. the
+        name of a wifi network, and is passed to registered methods as the selectedValue keyword argument.
+    '''
+    __slots__ = ('_value',)
+
+    def __init__(self, id: str, displayName: str, value: str):
+        super().__init__(id, displayName)
+        self._value = value
+
+    @property
+    def value(self) -> str:
+        return self._value
+
+
+class DynamicSelectionOptions(Sequence):
+    '''
+        Selection options of a menu node generated at runtime by an options provider, an executor node that lists
+        them, e.g. the wifi networks in range. Every generated option leads to the same target menu node.
+
+        Options are fetched a page at a time when they are first read, so a display only materializes the pages
+        of the rows it shows plus one option of look ahead. A registered method provider is called with offset
+        and limit keyword arguments and returns a list of values or [value, display name] pairs; a list shorter
+        than limit ends the options. A script provider prints one value per line.
+
+        Fetched options are kept for ttl seconds and reused when the menu node is entered again. Without a ttl
+        they are only kept while the menu node is shown. A provider that fails or returns nothing shows a single
+        option that leads home.
+
+        The instance loaded with the menus only describes the options. Each Navigator pages through a copy of its
+        own, so sessions sharing the menus don't replace each other's options.
+    '''
+    PAGE_SIZE = 50
+    NO_OPTIONS = "No options"
+    ERROR_OPTIONS = "Unable to list options"
+
+    def __init__(self, executorNodeId: str, targetMenuNodeId: str, ttl: float = None, pageSize: int = PAGE_SIZE):
+        if not executorNodeId or not targetMenuNodeId:
+            logging.error("Options provider must have an executor node id and a target menu node id")
+            raise Exception("Options provider must have an executor node id and a target menu node id")
+        self._executorNodeId = intern_id(executorNodeId)
+        self._targetMenuNodeId = intern_id(targetMenuNodeId)
+        self._ttl = ttl
+        self._pageSize = pageSize
+        self._provider = None
+        self._options: List[SelectionOption] = []
+        self._complete = False
+        self._loadedAt = None # monotonic time the first page was fetched, None if nothing is fetched
+
+    @property
+    def executor_id(self) -> str:
+        return self._executorNodeId
+
+    @property
+    def target_id(self) -> str:
+        return self._targetMenuNodeId
+
+    @property
+    def is_complete(self) -> bool:
+        return self._complete
+
+    def copy(self):
+        '''
+        Returns options with the same provider settings and nothing fetched yet.
+        '''
+        return DynamicSelectionOptions(self._executorNodeId, self._targetMenuNodeId, self._ttl, self._pageSize)
+
+    def refresh(self, provider: Callable):
+        '''
+        Called when the menu node is entered. Binds the options provider, a callable taking an executor node id,
+        offset and limit such as Executor.get_options, and drops the fetched options if they have expired.
+        '''
+        self._provider = provider
+        if self._loadedAt is not None and (self._ttl is None or time.monotonic()-self._loadedAt >= self._ttl):
+            self.invalidate()
+        elif self._loadedAt is None and self._complete:
+            self.invalidate() # the first page failed, the provider is tried again
+
+    def invalidate(self):
+        self._options = []
+        self._complete = False
+        self._loadedAt = None
+
+    def load_more(self) -> int:
+        '''
+        Fetches the next page of options unless all of them are fetched. Returns the number of options fetched.
+        '''
+        if not self._complete:
+            self._fetch_page()
+        return len(self._options)
+
+    def _fetch_page(self):
+        offset = len(self._options)
+        try:
+            if self._provider is None:
+                logging.error("No options provider set for executor node: "+self._executorNodeId)
+                raise Exception("No options provider set")
+            page = self._provider(self._executorNodeId, offset, self._pageSize)
+        except Exception as e:
+            logging.error("Error listing options: "+str(e))
+            if offset == 0:
+                self._options = [SelectionOption(id=MenuNodeSpecialId.ROOT.value, displayName=self.ERROR_OPTIONS)]
+            self._complete = True
+            return # not timestamped so refresh() tries the provider again when the menu node is entered
+
+        for item in page:
+            value, displayName = (item, item) if isinstance(item, str) else item
+            self._options.append(GeneratedSelectionOption(id=self._targetMenuNodeId, displayName=displayName, value=value))
+        self._complete = len(page) < self._pageSize
+        if offset == 0:
+            self._loadedAt = time.monotonic()
+            if not self._options:
+                self._options.append(SelectionOption(id=MenuNodeSpecialId.ROOT.value, displayName=self.NO_OPTIONS))
+
+    def __len__(self) -> int:
+        if self._loadedAt is None and not self._complete:
+            self._fetch_page()
+        return len(self._options)
+
+    def __getitem__(self, index: int) -> SelectionOption:
+        if index < 0:
+            return self._options[len(self)+index]
+        # one option of look ahead so the navigator can tell whether it can scroll on
+        while index+1 >= len(self) and not self._complete:
+            self._fetch_page()
+        return self._options[index]
+
+    def as_dict(self) -> Dict:
+        dct = {'executorNodeId': self._executorNodeId, 'targetMenuNodeId': self._targetMenuNodeId, 'pageSize': self._pageSize}
+        if self._ttl is not None:
+            dct['ttl'] = self._ttl
+        return dct
+
+    @staticmethod
+    def as_dynamic_selection_options(dct: Dict):
+        return DynamicSelectionOptions(executorNodeId=dct.get('executorNodeId'), targetMenuNodeId=dct.get('targetMenuNodeId'),
+                                       ttl=dct['ttl'] if 'ttl' in dct else None,
+                                       pageSize=dct['pageSize'] if 'pageSize' in dct else DynamicSelectionOptions.PAGE_SIZE)
+
+
+class CachePolicy(object):
+    '''
+        How long the successful result of a script executor node may be served from the Executor's ResultCache
+        instead of running the script again. maxBytes optionally keeps results with larger outputs out of the cache.
+    '''
+    __slots__ = ('_ttl', '_maxBytes')
+
+    def __init__(self, ttl: float, maxBytes: int = None):
+        if ttl is None or ttl <= 0:
+            logging.error("Cache policy ttl must be greater than zero")
+            raise Exception("Cache policy ttl must be greater than zero")
+        self._ttl = ttl
+        self._maxBytes = maxBytes
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    @property
+    def max_bytes(self) -> int:
+        return self._maxBytes
+
+    @staticmethod
+    def as_cache_policy(dct: Dict):
+        return CachePolicy(ttl=dct['ttl'], maxBytes=dct['maxBytes'] if 'maxBytes' in dct else None)
+
+
 class ExecutorNode(object):
-    def __init__(self, id: str, executorNodeType: ExecutorNodeType, name: str, destination: MenuDestination):
-        self._executorNodeId = id
+    __slots__ = ('_executorNodeId', '_executorType', '_name', '_destinationOverride', '_timeout', '_cachePolicy', '_sideEffectFree')
+
+    def __init__(self, id: str, executorNodeType: ExecutorNodeType, name: str, destination: MenuDestination, timeout: float = None,
+                 cachePolicy: CachePolicy = None, sideEffectFree: bool = False):
+        self._executorNodeId = intern_id(id)
         self._executorType = executorNodeType
         self._name = name
         self._destinationOverride = destination # default is to always go home after executing a node
+        self._timeout = timeout # seconds, no timeout if not set
+        self._cachePolicy = cachePolicy # results are never cached if not set
+        self._sideEffectFree = sideEffectFree # safe to run speculatively, see Executor.prefetch()
 
     @property
     def id(self) -> str:
@@ -77,19 +281,44 @@ class ExecutorNode(object):
     def destination(self) -> MenuDestination:
         return self._destinationOverride
 
+    @property
+    def timeout(self) -> float:
+        return self._timeout
+
+    @property
+    def cache_policy(self) -> CachePolicy:
+        return self._cachePolicy
+
+    @property
+    def is_side_effect_free(self) -> bool:
+        return self._sideEffectFree
+
     @staticmethod
     def as_executor_node(dct: Dict):
+        # nested objects, e.g. a cache policy, are passed to the object hook first
+        if '_id_' not in dct:
+            return dct
         executorNodeType = ExecutorNodeType(dct['type'])
         destination = MenuDestination(dct['destinationOverride']) if 'destinationOverride' in dct else None
-        return ExecutorNode(id=dct['_id_'],executorNodeType=executorNodeType,name=dct['name'],destination=destination)
+        timeout = dct['timeout'] if 'timeout' in dct else None
+        cachePolicy = CachePolicy.as_cache_policy(dct['cache']) if 'cache' in dct else None
+        sideEffectFree = dct['sideEffectFree'] if 'sideEffectFree' in dct else False
+        return ExecutorNode(id=dct['_id_'],executorNodeType=executorNodeType,name=dct['name'],destination=destination,timeout=timeout,cachePolicy=cachePolicy,
+                            sideEffectFree=sideEffectFree)
 
 
 class MenuNode(object):
+    '''
+        Menu nodes and selection options use __slots__ and interned ids: a large menu holds many of them and
+        every selection option repeats the id of its target menu node.
+    '''
+    __slots__ = ('_menuNodeId', '_menuNodeType', '_selectionOptions', '_executorNodeId', '_isRoot', '_isConfirm')
+
     def __init__(self, id: str, menuNodeType: MenuNodeType, selectionOptions: List[SelectionOption], confirm: bool, executorNodeId: str, isRoot: bool):
-        self._menuNodeId = id
+        self._menuNodeId = intern_id(id)
         self._menuNodeType = menuNodeType
         self._selectionOptions = selectionOptions
-        self._executorNodeId = executorNodeId
+        self._executorNodeId = intern_id(executorNodeId)
         self._isRoot = isRoot
         self._isConfirm = confirm
 
@@ -117,10 +346,19 @@ class MenuNode(object):
     def is_confirm(self) -> bool:
         return self._isConfirm
 
+    @property
+    def is_dynamic(self) -> bool:
+        return isinstance(self._selectionOptions, DynamicSelectionOptions)
+
     @staticmethod
     def as_menu_node(dct: Dict):
         if '_id_' in dct:
             selOptions = [SelectionOption.as_selection_option(selOption) for selOption in dct['selectionOptions']] if 'selectionOptions' in dct else None
+            if 'optionsProvider' in dct:
+                if selOptions is not None:
+                    logging.error("Menu node can't have both selection options and an options provider: "+dct['_id_'])
+                    raise Exception("Menu node can't have both selection options and an options provider")
+                selOptions = DynamicSelectionOptions.as_dynamic_selection_options(dct['optionsProvider'])
             eId = dct['executorNodeId'] if 'executorNodeId' in dct else None
             confirm = dct['confirm'] if 'confirm' in dct else None
             isRoot = True if dct['_id_'] == 'ROOT' else False
@@ -129,6 +367,106 @@ class MenuNode(object):
         return dct
 
 
+class MenuIndex(object):
+    '''
+        Search index over a Menus graph: a display name prefix search over all selection options and the
+        shortest path from the root menu node to every reachable menu node.
+
+        The index is filled by a breadth first walk from the root. Menus loaded from json build the complete
+        index while loading, so on a reload it is built on the reloader's thread and lookups on the event loop
+        never walk the graph. Menus created from menu nodes without index data, e.g. sharded menus, fill it
+        lazily: the walk only advances as far as a lookup needs and the first search completes it. Display names
+        are kept in a sorted list so a prefix search is a binary search.
+
+        A complete index can also be given, e.g. one stored in a compiled snapshot, see export(). Nothing is
+        walked then.
+    '''
+    def __init__(self, menus, parents: Mapping[str, Tuple[str, int]] = None, names: Sequence = None):
+        self._menus = menus
+        if parents is not None:
+            self._parents = parents
+            self._walkQueue = deque()
+            self._names = names
+            self._sorted = True
+            return
+        rootNodeId = menus.get_root_menu_node().id
+        self._parents: Dict[str, Tuple[str, int]] = {rootNodeId: None} # menu node id -> (parent id, option index)
+        self._walkQueue = deque([rootNodeId])
+        self._names = [] # (casefolded display name, display name, menu node id)
+        self._seenNames = set()
+        self._sorted = True
+
+    def _visit_next(self) -> bool:
+        if not self._walkQueue:
+            return False
+        menuNodeId = self._walkQueue.popleft()
+        menunode = self._menus.get_menu_node(menuNodeId)
+        selectionOptions = menunode.selection_options
+        # generated options aren't indexed, listing them would run their provider
+        if not menunode.is_dynamic and selectionOptions:
+            for optionIndex, selectionOption in enumerate(selectionOptions):
+                entry = (selectionOption.display_name.casefold(), selectionOption.display_name, selectionOption.id)
+                if entry not in self._seenNames:
+                    self._seenNames.add(entry)
+                    self._names.append(entry)
+                    self._sorted = False
+                if selectionOption.id not in self._parents:
+                    self._parents[selectionOption.id] = (menuNodeId, optionIndex)
+                    self._walkQueue.append(selectionOption.id)
+        return True
+
+    def complete(self):
+        '''
+        Walks the rest of the graph and sorts the display names.
+        '''
+        while self._visit_next():
+            pass
+        if not self._sorted:
+            self._names.sort()
+            self._sorted = True
+
+    def path_to(self, menuNodeId: str) -> List[Tuple[str, int]]:
+        '''
+        Returns the shortest path from the root to a menu node as (menu node id, option index) pairs, one for
+        each selection made along the way. Returns None if the menu node can't be reached from the root.
+        '''
+        while menuNodeId not in self._parents and self._visit_next():
+            pass
+        if menuNodeId not in self._parents:
+            return None
+        path = []
+        step = self._parents[menuNodeId]
+        while step is not None:
+            path.append(step)
+            step = self._parents[step[0]]
+        path.reverse()
+        return path
+
+    def search(self, prefix: str, limit: int = 10) -> List[SelectionOption]:
+        '''
+        Returns up to limit selection options whose display names start with prefix, ignoring case, in
+        display name order.
+        '''
+        self.complete()
+
+        key = prefix.casefold()
+        results = []
+        for position in range(bisect.bisect_left(self._names, (key,)), len(self._names)):
+            name, displayName, menuNodeId = self._names[position]
+            if not name.startswith(key) or len(results) >= limit:
+                break
+            results.append(SelectionOption(id=menuNodeId, displayName=displayName))
+        return results
+
+    def export(self) -> Tuple[Mapping[str, Tuple[str, int]], Sequence]:
+        '''
+        Completes the walk and returns the parents of all reachable menu nodes and the sorted display names, the
+        arguments to create the same index without walking the graph.
+        '''
+        self.complete()
+        return self._parents, self._names
+
+
 class Menus(object):
     def __init__(self, menu_nodes_filename: str):
 
@@ -153,17 +491,59 @@ class Menus(object):
                 self._rootNodeId = menunode.id
 
         # root node must always have selection options
-        rootNodeSelectionOptions = self.get_root_menu_node().selection_options
-        if rootNodeSelectionOptions is None or len(rootNodeSelectionOptions)==0:
+        rootNode = self.get_root_menu_node()
+        if rootNode.selection_options is None or rootNode.is_dynamic or len(rootNode.selection_options)==0:
             logging.error("Root menu node must have selection options")
             raise Exception("Root menu node must have selection options")
 
+        # built while loading so searches and jumps never walk the graph on the event loop, see MenuIndex
+        self._indexData = None
+        self._index = MenuIndex(self)
+        self._index.complete()
+        self._optionsProvider = None
+
+    @classmethod
+    def from_menu_nodes(cls, menunodes: Mapping[str, MenuNode], rootNodeId: str, indexData: Tuple = None):
+        '''
+        Creates Menus from a mapping of menu node ids to menu nodes that has already been validated, e.g. one
+        loaded from a compiled snapshot. No validation is performed. indexData, if given, are the arguments of
+        a complete MenuIndex, see MenuIndex.export().
+        '''
+        menus = cls.__new__(cls)
+        menus._menunodes = menunodes
+        menus._rootNodeId = rootNodeId
+        menus._index = None
+        menus._indexData = indexData
+        menus._optionsProvider = None
+        return menus
+
+    @property
+    def menu_nodes(self) -> Mapping[str, MenuNode]:
+        return self._menunodes
+
     def get_menu_node(self, menuNodeId: str) -> MenuNode:
         return self._menunodes[menuNodeId]
 
     def get_root_menu_node(self) -> MenuNode:
         return self._menunodes[self._rootNodeId]
 
+    @property
+    def options_provider(self) -> Callable:
+        return self._optionsProvider
+
+    def set_options_provider(self, provider: Callable):
+        '''
+        Sets the callable that lists the generated options of dynamic menu nodes, normally Executor.get_options.
+        MenuSystem sets it to its executor's.
+        '''
+        self._optionsProvider = provider
+
+    @property
+    def index(self) -> MenuIndex:
+        if self._index is None:
+            self._index = MenuIndex(self, *self._indexData) if self._indexData is not None else MenuIndex(self)
+        return self._index
+
     def load_menu_nodes(self, menu_nodes_filename: str) -> List[MenuNode]:
         with open(menu_nodes_filename, "r") as menunodes_file:
             menunode_data = menunodes_file.read()
@@ -171,7 +551,12 @@ class Menus(object):
 
     def validate_selection_options(self, menunodes: List[MenuNode]):
         for menunode in menunodes:
-            if menunode.selection_options is not None:
+            if menunode.is_dynamic:
+                targetId = menunode.selection_options.target_id
+                if targetId not in self._menunodes.keys():
+                    logging.error("Options provider must have valid target menu node id: "+targetId)
+                    raise Exception("Options provider must have valid target menu node id "+targetId)
+            elif menunode.selection_options is not None:
                 for selectionOption in menunode.selection_options:
                     if selectionOption.id not in self._menunodes.keys():
                         logging.error("Selection Option must have valid menu node id: "+selectionOption.id)
@@ -192,7 +577,9 @@ class Navigator(object):
         self._lastSelectOptionMenuNode = self._rootMenuNode
         self._currentMenuNode = self._rootMenuNode
         self._cursorPosition = None
+        self._selectedValue = None
         self._menus = menus
+        self._dynamicMenuNodes: Dict[str, MenuNode] = {} # this navigator's copies of the menu nodes with generated options
 
         self.home()
 
@@ -204,16 +591,35 @@ class Navigator(object):
     def cursor_position(self) -> int:
         return self._cursorPosition
 
+    @property
+    def selected_value(self) -> str:
+        '''
+        Value of the generated selection option that was selected last, None if it was a static one.
+        '''
+        return self._selectedValue
+
     def home(self):
         self._currentMenuNode=self._rootMenuNode
         self.set_cursor()
 
     def set_cursor(self):
         self._cursorPosition=None
+        if self._currentMenuNode.is_dynamic:
+            self._currentMenuNode = self._dynamic_menu_node(self._currentMenuNode)
+            self._currentMenuNode.selection_options.refresh(self._menus.options_provider)
         self._selectionOptions = self._currentMenuNode.selection_options
         if self._selectionOptions is not None and len(self._selectionOptions)>0:
             self._cursorPosition=0
 
+    def _dynamic_menu_node(self, menunode: MenuNode) -> MenuNode:
+        # generated options are paged per navigator, the menu node of the shared menus only describes them
+        dynamicMenuNode = self._dynamicMenuNodes.get(menunode.id)
+        if dynamicMenuNode is None:
+            dynamicMenuNode = MenuNode(id=menunode.id, menuNodeType=menunode.type, selectionOptions=menunode.selection_options.copy(),
+                                       confirm=menunode.is_confirm, executorNodeId=menunode.executor_id, isRoot=menunode.is_root)
+            self._dynamicMenuNodes[menunode.id] = dynamicMenuNode
+        return dynamicMenuNode
+
     def scroll_up(self):
         if self._cursorPosition is not None and self._cursorPosition>0:
             self._cursorPosition-=1
@@ -221,13 +627,59 @@ class Navigator(object):
     def scroll_down(self):
         if self._selectionOptions is not None:
             numOptions = len(self._selectionOptions)
+            if self._cursorPosition == numOptions-1 and self._currentMenuNode.is_dynamic:
+                numOptions = self._selectionOptions.load_more()
             if self._cursorPosition is not None and self._cursorPosition<(numOptions-1):
                 self._cursorPosition+=1
 
+    def scroll(self, delta: int):
+        '''
+        Moves the cursor delta options down, or up if delta is negative, stopping at the first and last option.
+        '''
+        if self._cursorPosition is not None:
+            self.move_cursor(self._cursorPosition+delta)
+
+    def page_up(self, pageSize: int):
+        if self._cursorPosition is not None:
+            self._cursorPosition = max(self._cursorPosition-pageSize, 0)
+
+    def page_down(self, pageSize: int):
+        if self._cursorPosition is not None:
+            self.move_cursor(self._cursorPosition+pageSize)
+
+    def top(self):
+        if self._cursorPosition is not None:
+            self._cursorPosition = 0
+
+    def bottom(self):
+        '''
+        Moves the cursor to the last option. All generated options are fetched first.
+        '''
+        if self._cursorPosition is not None:
+            if self._currentMenuNode.is_dynamic:
+                while not self._selectionOptions.is_complete:
+                    self._selectionOptions.load_more()
+            self._cursorPosition = len(self._selectionOptions)-1
+
+    def move_cursor(self, position: int):
+        '''
+        Moves the cursor to an option, or to the last option if there are fewer. Generated options are fetched
+        up to the position.
+        '''
+        if self._cursorPosition is None:
+            return
+        numOptions = len(self._selectionOptions)
+        if self._currentMenuNode.is_dynamic:
+            while numOptions <= position and not self._selectionOptions.is_complete:
+                numOptions = self._selectionOptions.load_more()
+        self._cursorPosition = max(min(position, numOptions-1), 0)
+
     def navigate_to_selected_option(self):
+        selectionOption = self._selectionOptions[self._cursorPosition]
         if self._currentMenuNode.id != MenuNodeSpecialId.CONFIRMATION.value:
             self._lastSelectOptionMenuNode = self._currentMenuNode
-        targetMenuId = self._selectionOptions[self._cursorPosition].id
+            self._selectedValue = selectionOption.value
+        targetMenuId = selectionOption.id
         self._currentMenuNode=self._menus.get_menu_node(targetMenuId)
         self.set_cursor()
 
@@ -244,6 +696,255 @@ class Navigator(object):
         self._cursorPosition = None
         self._selectionOptions = None
 
+    def jump_to(self, menuNodeId: str) -> bool:
+        '''
+        Navigates straight to a menu node as if it had been selected from its parent along the shortest path
+        from the root. A selection menu is opened; for an execution node the cursor is put on its option in the
+        parent menu so it still has to be selected (and confirmed if required). Returns False if the menu node
+        can't be reached from the root.
+        '''
+        path = self._menus.index.path_to(menuNodeId)
+        if path is None:
+            return False
+        targetMenuNode = self._menus.get_menu_node(menuNodeId)
+
+        if targetMenuNode.type == MenuNodeType.SELECTION:
+            if path:
+                self._lastSelectOptionMenuNode = self._menus.get_menu_node(path[-1][0])
+            self._currentMenuNode = targetMenuNode
+            self.set_cursor()
+        else:
+            parentMenuNodeId, optionIndex = path[-1]
+            self._currentMenuNode = self._menus.get_menu_node(parentMenuNodeId)
+            self.set_cursor()
+            self._cursorPosition = optionIndex
+        return True
+
+    def search(self, prefix: str, limit: int = 10) -> List[SelectionOption]:
+        return self._menus.index.search(prefix, limit)
+
+    def remap(self, menus: Menus):
+        '''
+        Switches navigation to a reloaded Menus, keeping the current menu node and cursor position if the node
+        still exists. Navigation goes home otherwise.
+        '''
+        currentMenuNodeId = self._currentMenuNode.id
+        lastSelectOptionMenuNodeId = self._lastSelectOptionMenuNode.id
+        cursorPosition = self._cursorPosition
+
+        self._menus = menus
+        self._dynamicMenuNodes = {}
+        self._rootMenuNode = menus.get_root_menu_node()
+        self._lastSelectOptionMenuNode = menus.menu_nodes.get(lastSelectOptionMenuNodeId, self._rootMenuNode)
+
+        currentMenuNode = menus.menu_nodes.get(currentMenuNodeId)
+        if currentMenuNode is None:
+            logging.info("Menu node no longer exists after reload, going home: %s", currentMenuNodeId)
+            self.home()
+        elif currentMenuNode.type == MenuNodeType.OUTPUT:
+            self._currentMenuNode = currentMenuNode
+        else:
+            self._currentMenuNode = currentMenuNode
+            self.set_cursor()
+            if self._cursorPosition is not None and cursorPosition is not None:
+                self._cursorPosition = min(cursorPosition, len(self._selectionOptions)-1)
+
+class StreamingOutput(object):
+    '''
+        Collects the output of a running script as display rows, keeping only the last maxRows of them so memory
+        stays bounded no matter how much the script prints. With numColumns set, long lines are wrapped and every
+        row is padded to the full width so the joined output splits back into the same rows on a bounded display.
+    '''
+    def __init__(self, maxRows: int, numColumns: int = None):
+        self._maxRows = maxRows
+        self._numColumns = numColumns
+        self._rows = deque(maxlen=maxRows)
+        self._partialRow = bytearray()
+        self._lock = threading.Lock()
+
+    def write(self, data: bytes):
+        with self._lock:
+            lines = data.split(b'\n')
+            for line in lines[:-1]:
+                self._partialRow += line
+                self._add_row(bytes(self._partialRow), complete=True)
+                self._partialRow = bytearray()
+            self._partialRow += lines[-1]
+            self._add_row(None, complete=False)
+
+    def _add_row(self, row: bytes, complete: bool):
+        if self._numColumns is None:
+            if complete:
+                self._rows.append(row)
+            return
+        if complete:
+            while len(row) > self._numColumns:
+                self._rows.append(row[:self._numColumns])
+                row = row[self._numColumns:]
+            self._rows.append(row.ljust(self._numColumns))
+        else:
+            # wrap completed chunks of an unfinished line as they arrive
+            while len(self._partialRow) > self._numColumns:
+                self._rows.append(bytes(self._partialRow[:self._numColumns]))
+                del self._partialRow[:self._numColumns]
+
+    @property
+    def output(self) -> bytes:
+        with self._lock:
+            rows = list(self._rows)
+            if self._partialRow:
+                rows.append(bytes(self._partialRow))
+            rows = rows[-self._maxRows:]
+            if self._numColumns is None:
+                return b'\n'.join(rows)
+            return b''.join(rows)
+
+
+class ResultCache(object):
+    '''
+        A size-bounded LRU store of execution results, keyed by executor node id. Each entry expires after the
+        ttl of its executor node's CachePolicy. The least recently used entries are evicted once more than
+        maxEntries results, or more than maxBytes of output, are stored.
+
+        With a filename the cache is loaded from and saved to that file so results survive a restart. Expiry
+        times are wall clock times for that reason. A put doesn't rewrite the file itself, it schedules a save
+        saveDelay seconds later so a burst of puts is written once; close() writes any pending results.
+    '''
+    def __init__(self, maxEntries: int = 64, maxBytes: int = 1024*1024, filename: str = None, saveDelay: float = 5.0):
+        self._maxEntries = maxEntries
+        self._maxBytes = maxBytes
+        self._filename = filename
+        self._saveDelay = saveDelay
+        self._entries = OrderedDict() # key -> (ExecutionResult, expiry time, size in bytes)
+        self._numBytes = 0
+        self._lock = threading.Lock()
+        self._saveLock = threading.Lock() # one save writes the file at a time
+        self._saveTimer = None
+        self._dirty = False # results were put since the last save
+
+        if filename is not None and os.path.exists(filename):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def num_bytes(self) -> int:
+        return self._numBytes
+
+    def get(self, key: str):
+        '''
+        Returns the cached ExecutionResult for a key or None if there is none or it has expired.
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            executionResult, expires, size = entry
+            if expires <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return executionResult
+
+    def put(self, key: str, executionResult, ttl: float, maxBytes: int = None) -> bool:
+        '''
+        Stores a result for ttl seconds. Returns False if the result is too large to be cached.
+        '''
+        size = len(executionResult.output) if executionResult.output is not None else 0
+        if (maxBytes is not None and size > maxBytes) or size > self._maxBytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (executionResult, time.time()+ttl, size)
+            self._numBytes += size
+            while len(self._entries) > self._maxEntries or self._numBytes > self._maxBytes:
+                self._remove(next(iter(self._entries)))
+            self._dirty = True
+            if self._filename is not None and self._saveTimer is None:
+                self._saveTimer = threading.Timer(self._saveDelay, self.save)
+                self._saveTimer.daemon = True
+                self._saveTimer.start()
+        return True
+
+    def invalidate(self, key: str = None):
+        '''
+        Removes the result for a key, or every result if no key is given.
+        '''
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._numBytes = 0
+            elif key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._numBytes -= size
+
+    def save(self):
+        with self._saveLock:
+            self._save()
+
+    def close(self):
+        '''
+        Cancels a scheduled save and writes the results put since the last save, if any.
+        '''
+        if self._filename is None:
+            return
+        with self._saveLock:
+            if self._dirty:
+                self._save()
+
+    def _save(self):
+        with self._lock:
+            if self._saveTimer is not None:
+                self._saveTimer.cancel()
+                self._saveTimer = None
+            self._dirty = False
+            entries = []
+            for key, (executionResult, expires, _) in self._entries.items():
+                output = executionResult.output
+                isBytes = isinstance(output, (bytes, bytearray))
+                entries.append({
+                    'key': key,
+                    'output': base64.b64encode(output).decode('ascii') if isBytes else output,
+                    'bytes': isBytes,
+                    'returnCode': executionResult.return_code,
+                    'destination': executionResult.destination.value if executionResult.destination is not None else None,
+                    'expires': expires,
+                })
+        try:
+            tmpFilename = self._filename + ".tmp"
+            with open(tmpFilename, "w") as cache_file:
+                json.dump(entries, cache_file)
+            os.replace(tmpFilename, self._filename)
+        except OSError as e:
+            logging.warning("Unable to save result cache: %s", e)
+
+    def load(self):
+        try:
+            with open(self._filename, "r") as cache_file:
+                entries = json.load(cache_file)
+        except (OSError, ValueError) as e:
+            logging.warning("Unable to load result cache: %s", e)
+            return
+
+        now = time.time()
+        with self._lock:
+            for entry in entries:
+                if entry['expires'] <= now:
+                    continue
+                output = base64.b64decode(entry['output']) if entry['bytes'] else entry['output']
+                destination = MenuDestination(entry['destination']) if entry['destination'] is not None else None
+                size = len(output) if output is not None else 0
+                self._entries[entry['key']] = (Executor.ExecutionResult(output, entry['returnCode'], destination), entry['expires'], size)
+                self._numBytes += size
+            while len(self._entries) > self._maxEntries or self._numBytes > self._maxBytes:
+                self._remove(next(iter(self._entries)))
+
+
 class Executor(object):
 
     class ExecutionResult(object):
@@ -264,15 +965,139 @@ class Executor(object):
         def destination(self) -> MenuDestination:
             return self._postExecuteMenuDestination
 
-    def __init__(self, executors_filename: str, scriptsLocation: Path):
+    class ExecutionHandle(object):
+        '''
+            A handle to an execution submitted to the Executor's worker pool.
+
+            The handle resolves exactly once with an ExecutionResult, either from the worker, from the executor
+            node's timeout or from a cancellation, whichever comes first. A script process still running when the
+            handle resolves early is killed.
+        '''
+        def __init__(self, executorNode: ExecutorNode, streamingOutput: StreamingOutput = None, progressCallback: Callable = None,
+                     instrumentation: Instrumentation = NULL_INSTRUMENTATION):
+            self._executorNode = executorNode
+            self._instrumentation = instrumentation
+            self._streamingOutput = streamingOutput
+            self._progressCallback = progressCallback
+            self._future = Future()
+            self._lock = threading.Lock()
+            self._process = None
+            self._timer = None
+            self._resolvedAt = None # monotonic time the handle resolved
+
+        @property
+        def executor_node(self) -> ExecutorNode:
+            return self._executorNode
+
+        @property
+        def streaming_output(self) -> StreamingOutput:
+            return self._streamingOutput
+
+        def done(self) -> bool:
+            return self._future.done()
+
+        def result(self, timeout: float = None):
+            return self._future.result(timeout)
+
+        def add_done_callback(self, callback: Callable):
+            self._future.add_done_callback(lambda future: callback(self))
+
+        def cancel(self) -> bool:
+            logging.info("Cancelling execution of executor node: %s", self._executorNode.id)
+            return self._resolve(Executor.ExecutionResult("Execution cancelled", 1, MenuDestination.HOME))
+
+        def _start_timer(self, timeout: float):
+            self._timer = threading.Timer(timeout, self._time_out)
+            self._timer.daemon = True
+            self._timer.start()
+
+        def _time_out(self):
+            logging.error("Execution of executor node timed out: "+self._executorNode.id)
+            self._instrumentation.count('executor_timeouts_total')
+            self._resolve(Executor.ExecutionResult("Execution timed out", 1, MenuDestination.POST_EXECUTE_OUTPUT))
+
+        def _set_process(self, process: subprocess.Popen):
+            with self._lock:
+                self._process = process
+                if not self._future.done():
+                    return
+            kill_process(process)
+
+        def _release_process(self):
+            # the process outlives the execution, e.g. a worker that runs the next script, and must not be killed
+            with self._lock:
+                self._process = None
+
+        def _resolve(self, executionResult) -> bool:
+            with self._lock:
+                if self._future.done():
+                    return False
+                process = self._process
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._resolvedAt = time.monotonic()
+                self._future.set_result(executionResult)
+            if process is not None and process.poll() is None:
+                kill_process(process)
+            return True
+
+    PROGRESS_INTERVAL = 0.1 # minimum seconds between progress callbacks of a streaming execution
+    PREFETCH_MAX_AGE = 10.0 # seconds a finished prefetch may wait to be used before it is considered stale
+
+    def __init__(self, executors_filename: str, scriptsLocation: Path, maxWorkers: int = 1, instrumentation: Instrumentation = NULL_INSTRUMENTATION,
+                 resultCache: ResultCache = None, maxPrefetches: int = 1, pyWorker: PyScriptWorker = None, shellPool: ShellPool = None):
         self._methods = {} # mapping of method names to methods
-        self._executors_list = self.load_executors(executors_filename)
+        self._instrumentation = instrumentation
+        self._resultCache = resultCache # results of script executor nodes with a cache policy, see ResultCache
         self._scriptsLocation = scriptsLocation
+        self._maxWorkers = maxWorkers
+        self._pool = None # created on first submit
+        # A method can't be killed when it times out and keeps its worker busy, so methods have workers of their own
+        # and a hung method only delays later methods, not scripts
+        self._methodPool = None # created on first submitted method
+        self._pyWorker = pyWorker # created on first pyscript execution if not given
+        self._shellPool = shellPool # runs script executor nodes on pre-spawned shells if given
+        self._scriptPaths: Dict[str, str] = {} # resolved script paths by script name
+
+        # Speculative executions have their own workers so they never delay a requested execution
+        self._maxPrefetches = maxPrefetches
+        self._prefetchPool = None # created on first prefetch
+        self._prefetches: Dict[str, Executor.ExecutionHandle] = {}
+        self._prefetchLock = threading.Lock()
+
+        self._optionLines: Dict[str, List[str]] = {} # output lines of script options providers, see get_options()
+
+        self._executors = self.load_executor_nodes(executors_filename)
+
+    def load_executor_nodes(self, executors_filename: str) -> Dict[str, ExecutorNode]:
+        '''
+        Loads and validates an executors file, returning a mapping of executor node ids to executor nodes.
+        Does not modify the executor so it can be used to prepare a reload on another thread.
+        '''
+        executors_list = self.load_executors(executors_filename)
 
         # validate no duplicate executor ids
-        check_for_duplicates([executor._executorNodeId for executor in self._executors_list])
+        check_for_duplicates([executor._executorNodeId for executor in executors_list])
+
+        return {executor.id : executor for executor in executors_list}
 
-        self._executors = {executor.id : executor for executor in self._executors_list}
+    @property
+    def executor_nodes(self) -> Mapping[str, ExecutorNode]:
+        return self._executors
+
+    def swap_executor_nodes(self, executorNodes: Dict[str, ExecutorNode]):
+        # A single reference assignment, executions already started keep the executor node they were given
+        previousExecutors = self._executors
+        self._executors = executorNodes
+        self._scriptPaths = {}
+        self.cancel_prefetch()
+
+        # Cached results of executor nodes that were removed or now run something else are no longer valid
+        if self._resultCache is not None:
+            for executorNodeId, previousNode in previousExecutors.items():
+                executorNode = executorNodes.get(executorNodeId)
+                if executorNode is None or executorNode.name != previousNode.name or executorNode.cache_policy is None:
+                    self._resultCache.invalidate(executorNodeId)
 
     def load_executors(self, executors_filename: str) -> List[ExecutorNode]:
         with open(executors_filename, "r") as executornodes_file:
@@ -281,36 +1106,440 @@ class Executor(object):
 
     def register_method(self, method: Callable):
         methodName = method.__name__
-        logging.info("Registered method name: "+str(methodName))
+        logging.info("Registered method name: %s", methodName)
         self._methods[methodName] = method
 
+    def get_options(self, executorNodeId: str, offset: int, limit: int) -> List:
+        '''
+        Runs an options provider executor node for a page of generated selection options, see
+        DynamicSelectionOptions. A registered method is called with offset and limit keyword arguments. A script
+        runs when the first page is requested and later pages are taken from its output, one option per line.
+        '''
+        executorNode = self._executors[executorNodeId]
+        if executorNode.executor_type == ExecutorNodeType.METHOD:
+            methodName = executorNode.name
+            if methodName not in self._methods:
+                logging.error("Method name not registered in executor: "+methodName)
+                raise Exception("Method name not registered in executor!")
+            return list(self._methods[methodName](offset=offset, limit=limit))
+
+        lines = self._optionLines.get(executorNodeId)
+        if offset == 0 or lines is None:
+            executionResult = self.execute(executorNodeId)
+            if executionResult.return_code != 0:
+                logging.error("Options provider failed: "+executorNodeId)
+                raise Exception("Options provider failed")
+            output = executionResult.output
+            if isinstance(output, (bytes, bytearray)):
+                output = output.decode('utf-8', errors='replace')
+            lines = [line for line in output.splitlines() if line.strip()]
+            self._optionLines[executorNodeId] = lines
+        return lines[offset:offset+limit]
+
     def execute(self, executorNodeId: str, **kwargs) -> ExecutionResult:
 
         executorNode = self._executors[executorNodeId]
 
+        executionResult = self._get_cached_result(executorNode)
+        if executionResult is not None:
+            return executionResult
+
+        prefetch = self._take_prefetch(executorNode)
+        if prefetch is not None:
+            return prefetch.result()
+
+        start = time.perf_counter() if self._instrumentation.enabled else None
+
         if executorNode.executor_type == ExecutorNodeType.SCRIPT:
-            return self._execute_script(executorNode, **kwargs)
+            executionResult = self._execute_script(executorNode, **kwargs)
+        elif executorNode.executor_type == ExecutorNodeType.PYSCRIPT:
+            executionResult = self._execute_pyscript(executorNode)
         elif executorNode.executor_type == ExecutorNodeType.METHOD:
-            return self._execute_method(executorNode, **kwargs)
+            executionResult = self._execute_method(executorNode, **kwargs)
         else:
             logging.error("Unsupported execution type "+str(executorNode.executor_type))
             raise Exception("Unsupported execution type")
 
+        if start is not None:
+            self._record_execution(executorNode, start, executionResult)
+        self._cache_result(executorNode, executionResult)
+        return executionResult
+
+    async def execute_async(self, executorNodeId: str, **kwargs) -> ExecutionResult:
+        '''
+        asyncio version of execute(). Scripts run as asyncio subprocesses, or on the shell pool if there is one,
+        registered methods are called directly and awaited if they return an awaitable. The executor node's
+        timeout applies to both. Cancelling the awaiting task kills a running script.
+        '''
+        executorNode = self._executors[executorNodeId]
+
+        executionResult = self._get_cached_result(executorNode)
+        if executionResult is not None:
+            return executionResult
+
+        prefetch = self._take_prefetch(executorNode)
+        if prefetch is not None:
+            return await asyncio.wrap_future(prefetch._future)
+
+        if executorNode.executor_type == ExecutorNodeType.SCRIPT:
+            execution = self._execute_script_async(executorNode)
+        elif executorNode.executor_type == ExecutorNodeType.PYSCRIPT:
+            execution = self._execute_pyscript_async(executorNode)
+        elif executorNode.executor_type == ExecutorNodeType.METHOD:
+            execution = self._execute_method_async(executorNode, **kwargs)
+        else:
+            logging.error("Unsupported execution type "+str(executorNode.executor_type))
+            raise Exception("Unsupported execution type")
+
+        start = time.perf_counter() if self._instrumentation.enabled else None
+        try:
+            executionResult = await asyncio.wait_for(execution, executorNode.timeout)
+        except asyncio.TimeoutError:
+            logging.error("Execution of executor node timed out: "+executorNode.id)
+            self._instrumentation.count('executor_timeouts_total')
+            executionResult = Executor.ExecutionResult("Execution timed out", 1, MenuDestination.POST_EXECUTE_OUTPUT)
+
+        if start is not None:
+            self._record_execution(executorNode, start, executionResult)
+        self._cache_result(executorNode, executionResult)
+        return executionResult
+
+    def submit(self, executorNodeId: str, streamingOutput: StreamingOutput = None, progressCallback: Callable = None, **kwargs) -> ExecutionHandle:
+        '''
+        Non-blocking version of execute(). The execution runs on the executor's worker pool and the returned
+        ExecutionHandle resolves with its ExecutionResult.
+
+        With a streamingOutput, script output is read incrementally into it instead of being buffered, the
+        progressCallback is called with the handle as output arrives and the final result only holds the rows
+        kept by the streamingOutput. A cached result resolves the handle before it is returned and the handle of
+        a prefetch of the same executor node is returned as is, without streaming output.
+
+        Methods run on workers of their own. A timeout only releases the caller of a method, which keeps running
+        and occupies its worker until it returns, so later methods may wait for it while scripts don't.
+        '''
+        executorNode = self._executors[executorNodeId]
+        handle = Executor.ExecutionHandle(executorNode, streamingOutput, progressCallback, self._instrumentation)
+
+        executionResult = self._get_cached_result(executorNode)
+        if executionResult is not None:
+            handle._resolve(executionResult)
+            return handle
+
+        prefetch = self._take_prefetch(executorNode)
+        if prefetch is not None:
+            return prefetch
+
+        if executorNode.timeout is not None:
+            handle._start_timer(executorNode.timeout)
+        if executorNode.executor_type == ExecutorNodeType.METHOD:
+            if self._methodPool is None:
+                self._methodPool = ThreadPoolExecutor(max_workers=self._maxWorkers, thread_name_prefix="method")
+            self._methodPool.submit(self._run_handle, handle, **kwargs)
+        else:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._maxWorkers, thread_name_prefix="executor")
+            self._pool.submit(self._run_handle, handle, **kwargs)
+        return handle
+
+    def prefetch(self, executorNodeId: str) -> bool:
+        '''
+        Speculatively starts a side-effect-free script or pyscript executor node on a background worker so its
+        result is ready when it is requested. The next execute(), execute_async() or submit() of the executor
+        node uses the prefetch instead of starting the script again. At most maxPrefetches run at the same
+        time. Returns True if a prefetch is running or finished for the executor node.
+        '''
+        executorNode = self._executors.get(executorNodeId)
+        if executorNode is None or not executorNode.is_side_effect_free or executorNode.executor_type == ExecutorNodeType.METHOD:
+            return False
+        if self._is_cacheable(executorNode) and self._resultCache.get(executorNode.id) is not None:
+            return False # already answered instantly
+
+        with self._prefetchLock:
+            if executorNodeId in self._prefetches:
+                return True
+            running = sum(1 for handle in self._prefetches.values() if not handle.done())
+            if running >= self._maxPrefetches:
+                self._instrumentation.count('executor_prefetch_rejected_total')
+                return False
+            handle = Executor.ExecutionHandle(executorNode, instrumentation=self._instrumentation)
+            self._prefetches[executorNodeId] = handle
+            if self._prefetchPool is None:
+                self._prefetchPool = ThreadPoolExecutor(max_workers=self._maxPrefetches, thread_name_prefix="prefetch")
+
+        logging.info("Prefetching executor node: %s", executorNodeId)
+        self._instrumentation.count('executor_prefetch_started_total')
+        if executorNode.timeout is not None:
+            handle._start_timer(executorNode.timeout)
+        self._prefetchPool.submit(self._run_handle, handle)
+        return True
+
+    def cancel_prefetch(self, executorNodeId: str = None):
+        '''
+        Cancels the prefetch of an executor node, or every prefetch if no executor node id is given. A running
+        script is killed.
+        '''
+        with self._prefetchLock:
+            if executorNodeId is None:
+                handles = list(self._prefetches.values())
+                self._prefetches.clear()
+            else:
+                handle = self._prefetches.pop(executorNodeId, None)
+                handles = [handle] if handle is not None else []
+        for handle in handles:
+            if handle.cancel():
+                self._instrumentation.count('executor_prefetch_cancelled_total')
+
+    def _take_prefetch(self, executorNode: ExecutorNode) -> ExecutionHandle:
+        if not self._prefetches:
+            return None
+        with self._prefetchLock:
+            handle = self._prefetches.pop(executorNode.id, None)
+        if handle is None:
+            return None
+        if handle.done() and time.monotonic()-handle._resolvedAt > self.PREFETCH_MAX_AGE:
+            return None # stale, run it again
+        self._instrumentation.count('executor_prefetch_hits_total')
+        return handle
+
+    def shutdown(self):
+        self.cancel_prefetch()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._methodPool is not None:
+            self._methodPool.shutdown(wait=False, cancel_futures=True)
+            self._methodPool = None
+        if self._prefetchPool is not None:
+            self._prefetchPool.shutdown(wait=False, cancel_futures=True)
+            self._prefetchPool = None
+        if self._pyWorker is not None:
+            self._pyWorker.stop()
+        if self._shellPool is not None:
+            self._shellPool.stop()
+        if self._resultCache is not None:
+            self._resultCache.close()
+
+    def _run_handle(self, handle: ExecutionHandle, **kwargs):
+        if handle.done():
+            return # cancelled before it started
+
+        executorNode = handle.executor_node
+        try:
+            if executorNode.executor_type != ExecutorNodeType.METHOD:
+                start = time.perf_counter() if self._instrumentation.enabled else None
+                if executorNode.executor_type == ExecutorNodeType.PYSCRIPT:
+                    executionResult = self._execute_pyscript(executorNode, handle._set_process)
+                    handle._release_process()
+                elif self._shellPool is not None and handle.streaming_output is None:
+                    executionResult = self._execute_pooled_script(executorNode, handle._set_process)
+                    handle._release_process()
+                else:
+                    executionResult = self._execute_script_process(handle, **kwargs)
+                if start is not None:
+                    self._record_execution(executorNode, start, executionResult)
+                # streamed output only holds the rows kept for the display
+                if handle.streaming_output is None:
+                    self._cache_result(executorNode, executionResult)
+            else:
+                executionResult = self.execute(executorNode.id, **kwargs)
+        except Exception as e:
+            logging.error("Error executing executor node "+executorNode.id+": "+str(e))
+            executionResult = Executor.ExecutionResult("Error executing "+executorNode.name, 1, MenuDestination.POST_EXECUTE_OUTPUT)
+        handle._resolve(executionResult)
+
+    def warm_cache(self) -> threading.Thread:
+        '''
+        Runs every script executor node with a cache policy and no cached result on a background thread, e.g. at
+        startup, so the first request for it is answered from the cache. Returns the started thread.
+        '''
+        thread = threading.Thread(target=self._warm_cache, daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_cache(self):
+        for executorNode in list(self._executors.values()):
+            if self._is_cacheable(executorNode) and self._resultCache.get(executorNode.id) is None:
+                logging.info("Warming result cache: %s", executorNode.id)
+                try:
+                    self.execute(executorNode.id)
+                except Exception as e:
+                    logging.warning("Unable to warm result cache for %s: %s", executorNode.id, e)
+
+    def _is_cacheable(self, executorNode: ExecutorNode) -> bool:
+        # Scripts take no arguments so a result only depends on the executor node. Methods are never cached.
+        return self._resultCache is not None and executorNode.cache_policy is not None and executorNode.executor_type != ExecutorNodeType.METHOD
+
+    def _get_cached_result(self, executorNode: ExecutorNode) -> ExecutionResult:
+        if not self._is_cacheable(executorNode):
+            return None
+        executionResult = self._resultCache.get(executorNode.id)
+        if executionResult is not None:
+            logging.info("Using cached result: %s", executorNode.id)
+            self._instrumentation.count('executor_cache_hits_total')
+        else:
+            self._instrumentation.count('executor_cache_misses_total')
+        return executionResult
+
+    def _cache_result(self, executorNode: ExecutorNode, executionResult: ExecutionResult):
+        # Only successful results are cached so a failing script is retried on the next request
+        if self._is_cacheable(executorNode) and executionResult is not None and executionResult.return_code == 0:
+            cachePolicy = executorNode.cache_policy
+            self._resultCache.put(executorNode.id, executionResult, cachePolicy.ttl, cachePolicy.max_bytes)
+
+    def _record_execution(self, executorNode: ExecutorNode, start: float, executionResult: ExecutionResult):
+        if executorNode.executor_type != ExecutorNodeType.METHOD:
+            self._instrumentation.observe('executor_script_seconds', time.perf_counter()-start)
+        else:
+            self._instrumentation.observe('executor_method_seconds', time.perf_counter()-start)
+        if executionResult is not None and executionResult.return_code:
+            self._instrumentation.count('executor_failures_total')
+
+    def _get_destination(self, executorNode: ExecutorNode) -> MenuDestination:
+        return executorNode.destination if executorNode.destination is not None else MenuDestination.HOME
+
+    def _get_script_path(self, executorNode: ExecutorNode) -> str:
+        scriptPath = self._scriptPaths.get(executorNode.name)
+        if scriptPath is None:
+            scriptPath = str((self._scriptsLocation / executorNode.name).resolve())
+            self._scriptPaths[executorNode.name] = scriptPath
+        return scriptPath
+
     def _execute_script(self, executorNode: ExecutorNode, **kwargs) -> ExecutionResult:
-        postExecuteMenuDestination = executorNode.destination if executorNode.destination is not None else MenuDestination.HOME
-        scriptName = executorNode.name
-        scriptToExecute = str((self._scriptsLocation / scriptName).resolve())
-        logging.info("Executing script: "+scriptToExecute)
+        if self._shellPool is not None:
+            return self._execute_pooled_script(executorNode)
+        return self._execute_on_runner(executorNode, self._run_script)
+
+    @staticmethod
+    def _run_script(scriptPath: str, timeout: float, onStart: Callable = None) -> Tuple[bytes, int]:
+        if onStart is None:
+            try:
+                return subprocess.check_output([scriptPath], timeout=timeout), 0
+            except CalledProcessError as e:
+                return e.output, e.returncode
+
+        # started in its own session and handed to onStart, e.g. so a handle can kill it on cancel or timeout
+        process = subprocess.Popen([scriptPath], stdout=subprocess.PIPE, start_new_session=True)
+        onStart(process)
         try:
-            output = subprocess.check_output([scriptToExecute])
-            logging.info("Output from script: "+str(output))
-            return Executor.ExecutionResult(output, 0, postExecuteMenuDestination)
-        except (CalledProcessError, OSError) as e:
+            output, _ = process.communicate(timeout=timeout)
+        except TimeoutExpired:
+            kill_process(process)
+            process.communicate()
+            raise
+        return output, process.returncode
+
+    def _execute_on_runner(self, executorNode: ExecutorNode, run: Callable, onStart: Callable = None) -> ExecutionResult:
+        '''
+        Runs a script executor node with run(scriptPath, timeout, onStart), which returns the script's output
+        and exit code, and turns the outcome into an ExecutionResult. Shared by scripts started directly, on
+        the shell pool and on the python script worker so they fail the same way.
+        '''
+        postExecuteMenuDestination = self._get_destination(executorNode)
+        scriptToExecute = self._get_script_path(executorNode)
+        logging.info("Executing script: %s", scriptToExecute)
+        try:
+            output, returnCode = run(scriptToExecute, executorNode.timeout, onStart)
+        except TimeoutExpired as e:
+            logging.error("Error executing script: "+str(e))
+            self._instrumentation.count('executor_timeouts_total')
+            return Executor.ExecutionResult("Error executing script", 1, MenuDestination.POST_EXECUTE_OUTPUT)
+        except Exception as e:
+            logging.error("Error executing script: "+str(e))
+            return Executor.ExecutionResult("Error executing script", 1, MenuDestination.POST_EXECUTE_OUTPUT)
+        if returnCode != 0:
+            logging.error("Error executing script, return code: "+str(returnCode))
+            return Executor.ExecutionResult("Error executing script", 1, MenuDestination.POST_EXECUTE_OUTPUT)
+        logging.info("Output from script: %s", output)
+        return Executor.ExecutionResult(output, 0, postExecuteMenuDestination)
+
+    def _execute_script_process(self, handle: ExecutionHandle, **kwargs) -> ExecutionResult:
+        # Same as _execute_script but the process is attached to the handle so it can be killed on cancel or timeout
+        executorNode = handle.executor_node
+        if handle.streaming_output is None:
+            return self._execute_on_runner(executorNode, self._run_script, handle._set_process)
+
+        postExecuteMenuDestination = self._get_destination(executorNode)
+        scriptToExecute = self._get_script_path(executorNode)
+        logging.info("Executing script: %s", scriptToExecute)
+        try:
+            process = subprocess.Popen([scriptToExecute], stdout=subprocess.PIPE, start_new_session=True)
+        except OSError as e:
             logging.error("Error executing script: "+str(e))
             return Executor.ExecutionResult("Error executing script", 1, MenuDestination.POST_EXECUTE_OUTPUT)
 
-    def _execute_method(self, executorNode: ExecutorNode, **kwargs) -> ExecutionResult:
-        postExecuteMenuDestination = executorNode.destination if executorNode.destination is not None else MenuDestination.HOME
+        handle._set_process(process)
+        output = self._stream_script_output(handle, process)
+        if process.returncode != 0:
+            logging.error("Error executing script, return code: "+str(process.returncode))
+            return Executor.ExecutionResult("Error executing script", 1, MenuDestination.POST_EXECUTE_OUTPUT)
+        logging.info("Output from script: %s", output)
+        return Executor.ExecutionResult(output, 0, postExecuteMenuDestination)
+
+    def _stream_script_output(self, handle: ExecutionHandle, process: subprocess.Popen) -> bytes:
+        streamingOutput = handle.streaming_output
+        lastProgress = 0
+        while True:
+            data = process.stdout.read1(4096)
+            if not data:
+                break
+            streamingOutput.write(data)
+            now = time.monotonic()
+            if handle._progressCallback is not None and now - lastProgress >= self.PROGRESS_INTERVAL:
+                lastProgress = now
+                handle._progressCallback(handle)
+        process.wait()
+        return streamingOutput.output
+
+    async def _execute_script_async(self, executorNode: ExecutorNode) -> ExecutionResult:
+        if self._shellPool is not None:
+            return await self._execute_on_thread(self._execute_pooled_script, executorNode)
+        postExecuteMenuDestination = self._get_destination(executorNode)
+        scriptToExecute = self._get_script_path(executorNode)
+        logging.info("Executing script: %s", scriptToExecute)
+        try:
+            process = await asyncio.create_subprocess_exec(scriptToExecute, stdout=asyncio.subprocess.PIPE, start_new_session=True)
+        except OSError as e:
+            logging.error("Error executing script: "+str(e))
+            return Executor.ExecutionResult("Error executing script", 1, MenuDestination.POST_EXECUTE_OUTPUT)
+
+        try:
+            output, _ = await process.communicate()
+        except asyncio.CancelledError:
+            # cancelled or timed out, don't leave the script running
+            if process.returncode is None:
+                kill_process(process)
+                await process.wait()
+            raise
+
+        if process.returncode != 0:
+            logging.error("Error executing script, return code: "+str(process.returncode))
+            return Executor.ExecutionResult("Error executing script", 1, MenuDestination.POST_EXECUTE_OUTPUT)
+        logging.info("Output from script: %s", output)
+        return Executor.ExecutionResult(output, 0, postExecuteMenuDestination)
+
+    def _execute_pyscript(self, executorNode: ExecutorNode, onStart: Callable = None) -> ExecutionResult:
+        if self._pyWorker is None:
+            self._pyWorker = PyScriptWorker()
+        return self._execute_on_runner(executorNode, self._pyWorker.run, onStart)
+
+    def _execute_pooled_script(self, executorNode: ExecutorNode, onStart: Callable = None) -> ExecutionResult:
+        return self._execute_on_runner(executorNode, self._shellPool.run, onStart)
+
+    async def _execute_pyscript_async(self, executorNode: ExecutorNode) -> ExecutionResult:
+        return await self._execute_on_thread(self._execute_pyscript, executorNode)
+
+    async def _execute_on_thread(self, execute: Callable, executorNode: ExecutorNode) -> ExecutionResult:
+        # Workers block so they run on a thread. Cancelling kills the worker, which is restarted on the next run.
+        processes = []
+        try:
+            return await asyncio.to_thread(execute, executorNode, processes.append)
+        except asyncio.CancelledError:
+            for process in processes:
+                kill_process(process)
+            raise
+
+    async def _execute_method_async(self, executorNode: ExecutorNode, **kwargs) -> ExecutionResult:
+        postExecuteMenuDestination = self._get_destination(executorNode)
         methodName = executorNode.name
         if methodName not in self._methods:
             logging.error("Method name not registered in executor: "+methodName)
@@ -318,9 +1547,23 @@ class Executor(object):
         method = self._methods[methodName]
         try:
             executionResult = method(**kwargs)
+            if inspect.isawaitable(executionResult):
+                executionResult = await executionResult
             return Executor.ExecutionResult("Executed method "+methodName, 0, postExecuteMenuDestination) if executionResult is None else executionResult
         except Exception as e:
             logging.error("Error executing method: "+str(e))
             return Executor.ExecutionResult("Error executing method "+methodName, 1, MenuDestination.POST_EXECUTE_OUTPUT)
 
-
+    def _execute_method(self, executorNode: ExecutorNode, **kwargs) -> ExecutionResult:
+        postExecuteMenuDestination = self._get_destination(executorNode)
+        methodName = executorNode.name
+        if methodName not in self._methods:
+            logging.error("Method name not registered in executor: "+methodName)
+            raise Exception("Method name not registered in executor!")
+        method = self._methods[methodName]
+        try:
+            executionResult = method(**kwargs)
+            return Executor.ExecutionResult("Executed method "+methodName, 0, postExecuteMenuDestination) if executionResult is None else executionResult
+        except Exception as e:
+            logging.error("Error executing method: "+str(e))
+            return Executor.ExecutionResult("Error executing method "+methodName, 1, MenuDestination.POST_EXECUTE_OUTPUT)
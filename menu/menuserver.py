@@ -0,0 +1,101 @@
+import asyncio, logging
+from typing import Callable, Dict, List
+
+from .asyncmenusystem import AsyncMenuSystem
+from .action.asyncmenuaction import AsyncMenuAction
+from .display.asyncdisplay import AsyncDisplay
+from .menus import Menus, Navigator, Executor, ExecutorNode
+from .instrumentation import Instrumentation, NULL_INSTRUMENTATION
+
+class MenuServer(object):
+    '''
+
+    Drives many displays from one process. The Menus graph and the Executor are loaded once and shared by every
+    session; a session only adds its own Navigator (the current menu node and cursor position), its action
+    source and its display. All sessions run as AsyncMenuSystems on one event loop.
+
+    A MenuServer can be given to a MenuReloader in place of a MenuSystem; a reload is applied to every session.
+
+    '''
+    def __init__(self, menus: Menus, executor: Executor, maxFrameRate: float = None, instrumentation: Instrumentation = NULL_INSTRUMENTATION):
+        self._menus = menus
+        self._executor = executor
+        self._maxFrameRate = maxFrameRate
+        self._instrumentation = instrumentation # shared by all sessions
+        self._sessions: Dict[AsyncMenuSystem, asyncio.Task] = {}
+        self._loop = None
+        self._stopEvent = None
+
+    @property
+    def sessions(self) -> List[AsyncMenuSystem]:
+        return list(self._sessions.keys())
+
+    def add_session(self, display: AsyncDisplay, menuAction: AsyncMenuAction) -> AsyncMenuSystem:
+        '''
+        Adds a session for a display and its action source. Sessions added while the server is running start
+        immediately.
+        '''
+        session = AsyncMenuSystem(self._menus, self._executor, Navigator(self._menus), display, menuAction, maxFrameRate=self._maxFrameRate,
+                                  instrumentation=self._instrumentation)
+        self._sessions[session] = None
+        if self._loop is not None:
+            self._start_session(session)
+        return session
+
+    def remove_session(self, session: AsyncMenuSystem):
+        session.stop()
+        self._sessions.pop(session, None)
+
+    def _start_session(self, session: AsyncMenuSystem):
+        task = self._loop.create_task(session.run())
+        task.add_done_callback(lambda t: self._session_ended(session, t))
+        self._sessions[session] = task
+
+    def _session_ended(self, session: AsyncMenuSystem, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logging.error("Menu session ended with an error: "+str(task.exception()))
+        self._sessions.pop(session, None)
+
+    def call_in_loop(self, callback: Callable):
+        '''
+        Schedules a callable to run on the event loop. Safe to call from any thread.
+        '''
+        if self._loop is None:
+            logging.warning("call_in_loop() before the menu server is running")
+            return
+        self._loop.call_soon_threadsafe(callback)
+
+    def reload(self, menus: Menus, executorNodes: Dict[str, ExecutorNode] = None):
+        '''
+        Swaps reloaded menus into every session. Must run on the event loop, use call_in_loop() from other threads.
+        '''
+        self._menus = menus
+        if executorNodes is not None:
+            self._executor.swap_executor_nodes(executorNodes)
+        for session in self._sessions:
+            # each session swaps the menus between two of its own actions and redraws
+            session._schedule_callback(lambda session=session: session.reload(menus))
+
+    async def run(self):
+        '''
+        Runs every session until stop() is called. Sessions ending on their own (e.g. a quit action) don't stop
+        the server.
+        '''
+        self._loop = asyncio.get_running_loop()
+        self._stopEvent = asyncio.Event()
+
+        for session in list(self._sessions):
+            self._start_session(session)
+
+        try:
+            await self._stopEvent.wait()
+        finally:
+            for session in list(self._sessions):
+                session.stop()
+            await asyncio.gather(*[task for task in self._sessions.values() if task is not None], return_exceptions=True)
+            self._loop = None
+
+    def stop(self):
+        logging.info("MenuServer::stop")
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopEvent.set)
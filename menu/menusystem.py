@@ -1,10 +1,12 @@
-import logging
-from typing import Callable
-from queue import Queue
+import logging, time
+from typing import Callable, List
+from queue import Queue, Empty
+from collections import deque
 
 from .display.display import Display
 from .action.menuaction import MenuAction
-from .menus import Menus, MenuNode, Navigator, MenuNodeType, Executor, MenuDestination
+from .menus import Menus, MenuNode, Navigator, MenuNodeType, MenuNodeSpecialId, Executor, MenuDestination, StreamingOutput
+from .instrumentation import Instrumentation, NULL_INSTRUMENTATION
 
 class MenuSystem(object):
     '''
@@ -16,14 +18,44 @@ class MenuSystem(object):
 
     A MenuSystem may not support all possible MenuActions depending on the implementation of the overall Menu.
 
+    With asyncExecution set, executions are submitted to the Executor's worker pool instead of blocking the event
+    loop. A "Running..." output is displayed until the result arrives, UP/DOWN/HOME keep being handled and HOME
+    cancels the running execution. With streamOutput also set, script output is displayed while the script runs,
+    keeping only as many rows as the display can show.
+
+    Input is processed in batches: every action waiting in the queue is handled before the display is redrawn, so
+    a held button or a bouncing GPIO line causes one redraw instead of one per action. NONE actions don't cause a
+    redraw. maxFrameRate optionally limits how often the display is redrawn; actions arriving in between are
+    folded into the next frame.
+
+    An optional Instrumentation records the time taken to navigate, execute and display each action. With an
+    InstrumentedQueue as the action queue it also records the full latency of each action, from the moment it
+    was put on the queue until the display write finished. See menu/instrumentation.py for the metric names.
+
+    With prefetch set, an execution node under the cursor whose executor node is side-effect-free is started in
+    the background once the cursor has rested on it for prefetchDelay seconds, so its result is ready when it is
+    selected. The prefetch is cancelled when the cursor moves away.
+
     '''
+    RUNNING_OUTPUT = "Running..."
+    STREAMING_OUTPUT_ROWS = 100 # rows kept for displays without a row limit
+    PREFETCH_DELAY = 0.3 # seconds the cursor has to rest on an option before its execution is prefetched
+    PAGE_SIZE = 10 # options moved by a page up or down on displays that show every option
+    SCROLL_ACTIONS = {MenuAction.Action.UP: -1, MenuAction.Action.DOWN: 1} # options moved by each, see process_actions()
+
     def __init__(self,
                  menus: Menus,\
                  executor: Executor,\
                  navigator: Navigator,\
                  display: Display,\
                  actionQueue: Queue,
-                 menuAction: MenuAction):
+                 menuAction: MenuAction,
+                 asyncExecution: bool = False,
+                 streamOutput: bool = False,
+                 maxFrameRate: float = None,
+                 instrumentation: Instrumentation = NULL_INSTRUMENTATION,
+                 prefetch: bool = False,
+                 prefetchDelay: float = PREFETCH_DELAY):
 
         self._menus = menus
         self._navigator = navigator
@@ -34,11 +66,27 @@ class MenuSystem(object):
         self._executor = executor
         self._executor.register_method(self.handle_confirmation_no)
         self._executor.register_method(self.handle_confirmation_yes)
+        self._menus.set_options_provider(self._executor.get_options)
 
         self._savedExecutorNodeId = None
         self._executionResult = None
         self._action = None
 
+        self._asyncExecution = asyncExecution
+        self._streamOutput = streamOutput
+        self._frameInterval = 1.0/maxFrameRate if maxFrameRate else None
+        self._lastDisplayTime = 0.0
+        self._pendingExecution = None
+        self._callbacks = deque() # callables to run on the event loop thread, see call_in_loop()
+
+        self._instrumentation = instrumentation
+        self._enqueueTimes = [] # enqueue times of the actions in the current frame, see InstrumentedQueue
+
+        self._prefetch = prefetch
+        self._prefetchDelay = prefetchDelay
+        self._prefetchTarget = None # executor node id under the cursor
+        self._prefetchDue = None # monotonic time at which to prefetch the target
+
     # Since we're passing in an Executor instance, should we remove this method and force callers to register methods there?
     def register_execution_method(self, method: Callable):
         self._executor.register_method(method)
@@ -74,6 +122,32 @@ class MenuSystem(object):
 
             #TODO: case _: Raise exception for unsupported menu type?
 
+    def call_in_loop(self, callback: Callable):
+        '''
+        Schedules a callable to run on the event loop thread. Safe to call from any thread.
+        '''
+        self._callbacks.append(callback)
+        self._actionQueue.put(MenuAction.Action.NONE) # wake up the event loop
+
+    def run_callbacks(self) -> bool:
+        ranCallbacks = False
+        while self._callbacks:
+            self._callbacks.popleft()()
+            ranCallbacks = True
+        return ranCallbacks
+
+    def reload(self, menus: Menus, executorNodes: dict = None):
+        '''
+        Swaps in reloaded menus (and optionally executor nodes) that have already been loaded and validated.
+        Must run on the event loop thread, between two actions. Use call_in_loop() from other threads.
+        '''
+        self._menus = menus
+        self._menus.set_options_provider(self._executor.get_options)
+        if executorNodes is not None:
+            self._executor.swap_executor_nodes(executorNodes)
+        self._navigator.remap(menus)
+        self._display.invalidate_render_cache()
+
     def handle_execution_node(self, executionNode: MenuNode):
 
         self._executionResult = None
@@ -84,21 +158,247 @@ class MenuSystem(object):
             self._savedExecutorNodeId = executionNode.executor_id
             self._navigator.navigate_to_confirmation_menu()
 
+        elif self._asyncExecution:
+
+            streamingOutput = None
+            progressCallback = None
+            if self._streamOutput:
+                numRows = self._display.num_rows if self._display.num_rows is not None else self.STREAMING_OUTPUT_ROWS
+                streamingOutput = StreamingOutput(numRows, self._display.num_columns)
+                progressCallback = lambda h: self.call_in_loop(lambda: self.handle_execution_progress(h))
+
+            executorNodeId = executionNode.executor_id
+            if executionNode.id == MenuNodeSpecialId.YES.value and self._savedExecutorNodeId is not None:
+                # the confirmed executor node is submitted itself rather than through handle_confirmation_yes, so
+                # cancelling and its timeout apply to its script
+                executorNodeId = self._savedExecutorNodeId
+            handle = self._executor.submit(executorNodeId, streamingOutput=streamingOutput, progressCallback=progressCallback,
+                                           savedExecutorNodeId=self._savedExecutorNodeId, executor=self._executor,
+                                           selectedValue=self._navigator.selected_value)
+            self._savedExecutorNodeId = None
+            self._pendingExecution = handle
+            handle.add_done_callback(lambda h: self.call_in_loop(lambda: self.handle_execution_complete(h)))
+
+            self._executionResult = Executor.ExecutionResult(self.RUNNING_OUTPUT, None, MenuDestination.POST_EXECUTE_OUTPUT)
+            self._navigator.navigate_to_post_execute_output()
+
         else:
 
-            self._executionResult = self._executor.execute(executionNode.executor_id, savedExecutorNodeId=self._savedExecutorNodeId, executor=self._executor)
-            # default behavior is to navigate to the home menu unless postExecuteDestinationOverride is set
+            start = time.perf_counter() if self._instrumentation.enabled else None
+            self._executionResult = self._executor.execute(executionNode.executor_id, savedExecutorNodeId=self._savedExecutorNodeId, executor=self._executor,
+                                                           selectedValue=self._navigator.selected_value)
+            if start is not None:
+                self._instrumentation.observe('menu_execution_seconds', time.perf_counter()-start)
             self._savedExecutorNodeId = None
-            destinationMenuNode = self._executionResult.destination
+            self.handle_execution_result(self._executionResult)
 
-            # lastSelectOptionMenu is necessary for confirmation menu "no" selection
-            if destinationMenuNode == MenuDestination.LAST_SELECT_OPTION_MENU:
-                self._navigator.navigate_to_last_selection_menu()
-            elif destinationMenuNode == MenuDestination.POST_EXECUTE_OUTPUT:
-                self._navigator.navigate_to_post_execute_output()
-            else:
+    def handle_execution_result(self, executionResult: Executor.ExecutionResult):
+
+        # default behavior is to navigate to the home menu unless postExecuteDestinationOverride is set
+        destinationMenuNode = executionResult.destination
+
+        # lastSelectOptionMenu is necessary for confirmation menu "no" selection
+        if destinationMenuNode == MenuDestination.LAST_SELECT_OPTION_MENU:
+            self._navigator.navigate_to_last_selection_menu()
+        elif destinationMenuNode == MenuDestination.POST_EXECUTE_OUTPUT:
+            self._navigator.navigate_to_post_execute_output()
+        else:
+            self._navigator.home()
+
+    def handle_execution_complete(self, handle: Executor.ExecutionHandle):
+
+        # Ignore results of executions that were cancelled or superseded
+        if handle is not self._pendingExecution:
+            return
+
+        self._pendingExecution = None
+        self._executionResult = handle.result()
+        self.handle_execution_result(self._executionResult)
+
+    def handle_execution_progress(self, handle: Executor.ExecutionHandle):
+
+        # The event loop redraws the display after running callbacks
+        if handle is self._pendingExecution and not handle.done():
+            self._executionResult = Executor.ExecutionResult(handle.streaming_output.output, None, MenuDestination.POST_EXECUTE_OUTPUT)
+
+    def cancel_pending_execution(self):
+        if self._pendingExecution is not None:
+            handle = self._pendingExecution
+            self._pendingExecution = None
+            handle.cancel()
+
+
+    def prefetch_target(self) -> str:
+        '''
+        Returns the executor node id of the execution node under the cursor, if any.
+        '''
+        current_node = self._navigator.current_menu_node
+        cursor_position = self._navigator.cursor_position
+        if self._pendingExecution is not None or current_node.type != MenuNodeType.SELECTION or cursor_position is None:
+            return None
+        target_node = self._menus.get_menu_node(current_node.selection_options[cursor_position].id)
+        if target_node.type != MenuNodeType.EXECUTION or target_node.is_confirm:
+            return None
+        return target_node.executor_id
+
+    def update_prefetch(self):
+        '''
+        Cancels the prefetch the cursor moved away from and starts the prefetch of the option under the cursor
+        once it is due. Called by the event loop after each batch of actions.
+        '''
+        target = self.prefetch_target()
+        if target != self._prefetchTarget:
+            if self._prefetchTarget is not None:
+                self._executor.cancel_prefetch(self._prefetchTarget)
+            self._prefetchTarget = target
+            self._prefetchDue = time.monotonic()+self._prefetchDelay if target is not None else None
+
+        if self._prefetchDue is not None and time.monotonic() >= self._prefetchDue:
+            self._prefetchDue = None
+            self._executor.prefetch(self._prefetchTarget)
+
+    def prefetch_wait(self) -> float:
+        '''
+        Seconds until a prefetch is due, None if there is nothing to prefetch. Used as the timeout when waiting
+        for actions so the prefetch starts even if no other action arrives.
+        '''
+        if self._prefetchDue is None:
+            return None
+        return max(self._prefetchDue-time.monotonic(), 0)
+
+    def cancel_prefetch(self):
+        if self._prefetchTarget is not None:
+            self._executor.cancel_prefetch(self._prefetchTarget)
+            self._prefetchTarget = None
+            self._prefetchDue = None
+
+    def jump(self, prefix: str) -> bool:
+        '''
+        Jumps to the first menu node whose display name starts with prefix, see Navigator.jump_to(). Must run on
+        the event loop thread, e.g. through call_in_loop() from a type-ahead input.
+        '''
+        if self._pendingExecution is not None:
+            return False
+        results = self._navigator.search(prefix, limit=1)
+        if not results:
+            return False
+        return self._navigator.jump_to(results[0].id)
+
+    def page_size(self) -> int:
+        '''
+        Options moved by a page up or down: the options the display shows at once.
+        '''
+        return self._display.page_size or self.PAGE_SIZE
+
+    def handle_action(self, action: MenuAction.Action):
+
+        match action:
+            case MenuAction.Action.UP:
+                self._navigator.scroll_up()
+            case MenuAction.Action.DOWN:
+                self._navigator.scroll_down()
+            case MenuAction.Action.LEFT:
+                self._navigator.page_up(self.page_size())
+            case MenuAction.Action.RIGHT:
+                self._navigator.page_down(self.page_size())
+            case MenuAction.Action.TOP:
+                self._navigator.top()
+            case MenuAction.Action.BOTTOM:
+                self._navigator.bottom()
+            case MenuAction.Action.SELECT:
+                # nothing to select while an execution is running
+                if self._pendingExecution is None:
+                    self._navigator.navigate_to_selected_option()
+            case MenuAction.Action.HOME:
+                self.cancel_pending_execution()
                 self._navigator.home()
 
+        # TODO: add logging (or perhaps an exception) for unsupported MenuActions
+
+        current_node = self._navigator.current_menu_node
+
+        if current_node.type == MenuNodeType.EXECUTION:
+            self.handle_execution_node(current_node)
+
+    def get_actions(self, timeout: float = None) -> List[MenuAction.Action]:
+        '''
+        Waits for the next action and returns it along with every other action already waiting in the queue.
+        Returns an empty list if a timeout is given and no action arrives in time.
+        '''
+        try:
+            actions = [self._actionQueue.get(block=True, timeout=timeout)]
+        except Empty:
+            return []
+
+        if self._instrumentation.enabled:
+            self._record_dequeue()
+
+        # Nothing after a quit is processed so don't take it off the queue
+        while actions[-1] != MenuAction.Action.QUIT:
+            try:
+                actions.append(self._actionQueue.get(block=False))
+            except Empty:
+                break
+            if self._instrumentation.enabled:
+                self._record_dequeue()
+
+        return actions
+
+    def _record_dequeue(self):
+        enqueueTime = getattr(self._actionQueue, 'last_enqueue_time', None)
+        if enqueueTime is not None:
+            self._enqueueTimes.append(enqueueTime)
+
+    def process_actions(self, actions: List[MenuAction.Action]) -> bool:
+        '''
+        Handles a batch of actions in order, stopping at a quit. A run of UP and DOWN actions is applied as one
+        cursor move by their net number of options. Returns True if the display needs to be redrawn.
+        '''
+        redraw = self.run_callbacks()
+
+        position = 0
+        while position < len(actions):
+            action = actions[position]
+            self._action = action
+            if action == MenuAction.Action.QUIT:
+                break
+            position += 1
+            if action == MenuAction.Action.NONE:
+                continue
+
+            numActions = 1
+            delta = 0
+            if action in self.SCROLL_ACTIONS:
+                delta = self.SCROLL_ACTIONS[action]
+                while position < len(actions) and (actions[position] in self.SCROLL_ACTIONS or actions[position] == MenuAction.Action.NONE):
+                    if actions[position] != MenuAction.Action.NONE:
+                        delta += self.SCROLL_ACTIONS[actions[position]]
+                        numActions += 1
+                    self._action = actions[position]
+                    position += 1
+
+            start = time.perf_counter() if self._instrumentation.enabled else None
+            if numActions > 1:
+                self._navigator.scroll(delta)
+            else:
+                self.handle_action(action)
+            if start is not None:
+                self._instrumentation.observe('menu_navigation_seconds', time.perf_counter()-start)
+                self._instrumentation.count('menu_actions_total', numActions)
+            redraw = True
+
+        return redraw
+
+    def record_frame(self, displayStart: float, redraw: bool):
+        '''
+        Records the display write of a frame started at displayStart and the latency of the actions it shows.
+        '''
+        now = time.perf_counter()
+        if redraw:
+            self._instrumentation.observe('menu_display_seconds', now-displayStart)
+            for enqueueTime in self._enqueueTimes:
+                self._instrumentation.observe('menu_action_latency_seconds', now-enqueueTime)
+        self._enqueueTimes.clear()
 
     def run(self):
 
@@ -111,30 +411,35 @@ class MenuSystem(object):
 
             # TODO: consider adding a timeout here with a default value of NONE
             # This may help the menu system respond better to a stop request 
-            self._action = self._actionQueue.get(block=True, timeout=None)
-
-            if (self._action != MenuAction.Action.QUIT):
-                match self._action:
-                    case MenuAction.Action.UP:
-                        self._navigator.scroll_up()
-                    case MenuAction.Action.DOWN:
-                        self._navigator.scroll_down()
-                    case MenuAction.Action.SELECT:
-                        self._navigator.navigate_to_selected_option()
-                    case MenuAction.Action.HOME:
-                        self._navigator.home()
-
-                # TODO: add logging (or perhaps an exception) for unsupported MenuActions
-
-                current_node = self._navigator.current_menu_node
-
-                if current_node.type == MenuNodeType.EXECUTION:
-                    self.handle_execution_node(current_node)
-
+            actions = self.get_actions(timeout=self.prefetch_wait())
+            if self._instrumentation.enabled:
+                self._instrumentation.gauge('menu_action_queue_depth', self._actionQueue.qsize())
+            redraw = self.process_actions(actions)
+
+            # Fold actions arriving before the next frame is due into this frame
+            while redraw and self._frameInterval is not None and self._action != MenuAction.Action.QUIT:
+                remaining = self._lastDisplayTime + self._frameInterval - time.monotonic()
+                if remaining <= 0:
+                    break
+                moreActions = self.get_actions(timeout=remaining)
+                self.process_actions(moreActions)
+                actions.extend(moreActions)
+
+            displayStart = time.perf_counter() if self._instrumentation.enabled else None
+            if redraw:
                 self.display()
+                self._lastDisplayTime = time.monotonic()
+            if displayStart is not None:
+                self.record_frame(displayStart, redraw)
+
+            if self._prefetch and self._action != MenuAction.Action.QUIT:
+                self.update_prefetch()
 
-            self._actionQueue.task_done()
+            for action in actions:
+                self._actionQueue.task_done()
     
+        self.cancel_prefetch()
+        self.cancel_pending_execution()
         self._menuAction.stop()
 
     def stop(self):
@@ -0,0 +1,193 @@
+'''
+A long-lived worker process for running Python scripts without paying for interpreter startup and imports on
+every execution.
+
+The worker (a "zygote") is started once, imports a list of commonly used modules, e.g. RPi.GPIO, and then
+waits for requests on stdin. Every script runs in a child forked from the worker, so it starts with those
+modules already imported but can't leave any state behind for the next script. The script's stdout and exit
+code are sent back to the parent as one json line per request.
+
+The worker is replaced after maxRuns scripts, when it dies and when a script times out.
+
+This module only uses the standard library since the worker runs it as a plain script.
+'''
+
+import base64, importlib, io, json, logging, os, runpy, select, signal, subprocess, sys, threading, time, traceback
+from subprocess import TimeoutExpired
+from typing import Callable, List, Tuple
+
+
+class PyScriptWorker(object):
+    '''
+    Parent side of the worker process. run() is safe to call from several threads, scripts run one at a time.
+    '''
+    def __init__(self, preloadModules: List[str] = None, maxRuns: int = 100):
+        self._preloadModules = list(preloadModules) if preloadModules else []
+        self._maxRuns = maxRuns
+        self._process = None
+        self._numRuns = 0
+        self._buffer = b''
+        self._lock = threading.Lock()
+
+    @property
+    def process(self) -> subprocess.Popen:
+        return self._process
+
+    def start(self):
+        '''
+        Starts the worker ahead of the first run so the preloaded modules are imported by the time it's needed.
+        '''
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._start()
+
+    def _start(self):
+        args = [sys.executable, os.path.abspath(__file__)]
+        for module in self._preloadModules:
+            args += ['--preload', module]
+        logging.info("Starting python script worker: %s", self._preloadModules)
+        # a session of its own so a timed out script and the worker can be killed together
+        self._process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0, start_new_session=True)
+        self._numRuns = 0
+        self._buffer = b''
+
+    def stop(self):
+        with self._lock:
+            self._stop()
+
+    def _stop(self):
+        process = self._process
+        self._process = None
+        if process is None:
+            return
+        if process.poll() is None:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        process.wait()
+        process.stdin.close()
+        process.stdout.close()
+
+    def run(self, scriptPath: str, timeout: float = None, onStart: Callable = None) -> Tuple[bytes, int]:
+        '''
+        Runs a python script in a child of the worker and returns its stdout and exit code. onStart is called
+        with the worker process, e.g. so it can be killed to cancel the run. Raises TimeoutExpired if the script
+        runs longer than timeout seconds, the worker is killed in that case.
+        '''
+        with self._lock:
+            if self._process is None or self._process.poll() is not None or self._numRuns >= self._maxRuns:
+                self._stop()
+                self._start()
+            self._numRuns += 1
+
+            if onStart is not None:
+                onStart(self._process)
+
+            try:
+                self._process.stdin.write(json.dumps({'path': scriptPath}).encode('utf-8')+b'\n')
+                response = json.loads(self._read_line(timeout))
+            except TimeoutExpired:
+                self._stop()
+                raise TimeoutExpired(scriptPath, timeout)
+            except (OSError, EOFError, ValueError) as e:
+                self._stop()
+                logging.error("Python script worker failed: "+str(e))
+                raise Exception("Python script worker failed")
+
+            return base64.b64decode(response['output']), response['returnCode']
+
+    def _read_line(self, timeout: float) -> bytes:
+        deadline = None if timeout is None else time.monotonic()+timeout
+        fd = self._process.stdout.fileno()
+        while b'\n' not in self._buffer:
+            remaining = None if deadline is None else deadline-time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutExpired(None, timeout)
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            data = os.read(fd, 65536)
+            if not data:
+                raise EOFError("worker exited")
+            self._buffer += data
+        line, _, self._buffer = self._buffer.partition(b'\n')
+        return line
+
+
+def _run_script(scriptPath: str, protocolFile) -> Tuple[bytes, int]:
+    # Runs in the worker: fork a child for the script and collect its stdout and exit code
+    readFd, writeFd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        returnCode = 1
+        try:
+            protocolFile.close()
+            os.close(readFd)
+            os.dup2(writeFd, 1)
+            os.close(writeFd)
+            devNull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devNull, 0)
+            sys.stdout = io.TextIOWrapper(io.FileIO(1, 'w', closefd=False), write_through=True)
+            sys.argv = [scriptPath]
+            try:
+                runpy.run_path(scriptPath, run_name='__main__')
+                returnCode = 0
+            except SystemExit as e:
+                if e.code is None:
+                    returnCode = 0
+                elif isinstance(e.code, int):
+                    returnCode = e.code
+                else:
+                    print(e.code, file=sys.stderr)
+            except BaseException:
+                traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(returnCode)
+
+    os.close(writeFd)
+    chunks = []
+    while True:
+        data = os.read(readFd, 65536)
+        if not data:
+            break
+        chunks.append(data)
+    os.close(readFd)
+    _, status = os.waitpid(pid, 0)
+    returnCode = os.waitstatus_to_exitcode(status)
+    return b''.join(chunks), returnCode
+
+
+def serve(preloadModules: List[str]):
+    # Keep the protocol channel to the parent and send anything else printed to fd 1 to stderr instead
+    protocolFile = os.fdopen(os.dup(1), 'wb')
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    for module in preloadModules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print("Unable to preload module "+module+": "+str(e), file=sys.stderr)
+
+    for line in sys.stdin.buffer:
+        request = json.loads(line)
+        try:
+            output, returnCode = _run_script(request['path'], protocolFile)
+        except OSError as e:
+            output, returnCode = str(e).encode('utf-8'), 1
+        protocolFile.write(json.dumps({'output': base64.b64encode(output).decode('ascii'), 'returnCode': returnCode}).encode('utf-8')+b'\n')
+        protocolFile.flush()
+
+
+if __name__ == '__main__':
+    preload = []
+    arguments = sys.argv[1:]
+    while len(arguments) >= 2 and arguments[0] == '--preload':
+        preload.append(arguments[1])
+        arguments = arguments[2:]
+    serve(preload)
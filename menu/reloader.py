@@ -0,0 +1,141 @@
+import os, threading, logging
+from typing import Callable
+
+from menu.menus import Menus, Executor
+from menu.menusystem import MenuSystem
+from menu.analyzer import MenuAnalyzer, Severity, diff_menu_nodes
+
+class MenuReloader(object):
+    '''
+        Watches the menu nodes and executors files and hot reloads them into a running MenuSystem.
+
+        The files are polled with os.stat (a change of modification time, size or inode counts as a change, so
+        files replaced by a rename are picked up too). Changed files are parsed and validated on the reloader's
+        own thread; only the swap itself runs on the event loop, between two actions. A file that fails to load
+        is logged and the running menus or executors are kept, while a valid change to the other file is still
+        applied.
+
+        Reloaded files are also run through a MenuAnalyzer and the problems it finds are logged, at most
+        MAX_LOGGED_PROBLEMS of each kind. The analyzer is kept between reloads, so after an edit only the menu
+        nodes that changed are checked again. The menus running at start() can be analyzed first on the
+        reloader's thread, so a large menu doesn't hold up startup.
+    '''
+    MAX_LOGGED_PROBLEMS = 10 # per problem code, the rest are counted
+
+    def __init__(self,
+                 menuSystem: MenuSystem,
+                 executor: Executor,
+                 menu_nodes_filename: str,
+                 executors_filename: str,
+                 pollInterval: float = 1.0,
+                 loadMenus: Callable[[str], Menus] = Menus):
+
+        self._menuSystem = menuSystem
+        self._menuNodesFilename = menu_nodes_filename
+        self._executorsFilename = executors_filename
+        self._executor = executor
+        self._pollInterval = pollInterval
+        self._loadMenus = loadMenus
+
+        self._exitEvent = threading.Event()
+        self._thread = None
+        self._menuNodesStat = self._stat(menu_nodes_filename)
+        self._executorsStat = self._stat(executors_filename)
+        self._analyzer = None # created by the first analyze()
+
+    @staticmethod
+    def _stat(filename: str):
+        try:
+            stat = os.stat(filename)
+            return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except OSError:
+            return None
+
+    def start(self, menus: Menus = None):
+        '''
+        Starts watching the files. The given menus, normally the ones the MenuSystem started with, are analyzed
+        first so the first reload is incremental.
+        '''
+        logging.info("Menu reloader starting")
+        self._thread = threading.Thread(target=self.watch, args=(menus,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        logging.info("Menu reloader stopping")
+        self._exitEvent.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def watch(self, menus: Menus = None):
+        if menus is not None:
+            self.analyze(menus)
+        while not self._exitEvent.wait(self._pollInterval):
+            self.check()
+
+    def check(self) -> bool:
+        '''
+        Reloads the files if either changed since the last check. Returns True if a reload was scheduled.
+        '''
+        menuNodesStat = self._stat(self._menuNodesFilename)
+        executorsStat = self._stat(self._executorsFilename)
+        menuNodesChanged = menuNodesStat != self._menuNodesStat
+        executorsChanged = executorsStat != self._executorsStat
+        if not menuNodesChanged and not executorsChanged:
+            return False
+
+        self._menuNodesStat = menuNodesStat
+        self._executorsStat = executorsStat
+
+        # each file is loaded on its own, so a valid change to one is applied even if the other fails to load
+        menus = None
+        executorNodes = None
+        if menuNodesChanged:
+            try:
+                menus = self._loadMenus(self._menuNodesFilename)
+            except Exception as e:
+                logging.error("Unable to reload menu nodes, keeping the current menus: "+str(e))
+        if executorsChanged:
+            try:
+                executorNodes = self._executor.load_executor_nodes(self._executorsFilename)
+            except Exception as e:
+                logging.error("Unable to reload executor nodes, keeping the current executors: "+str(e))
+        if menus is None and executorNodes is None:
+            return False
+
+        self.analyze(menus, executorNodes)
+
+        logging.info("Reloading menus")
+        self._menuSystem.call_in_loop(lambda: self._swap(menus, executorNodes))
+        return True
+
+    def analyze(self, menus: Menus = None, executorNodes: dict = None) -> list:
+        '''
+        Logs and returns the problems of the given menus, or of the last menus analyzed when only the executor
+        nodes changed. Can be called with the initial menus on startup so the first reload is incremental.
+        '''
+        executorIds = executorNodes.keys() if executorNodes is not None else None
+        if self._analyzer is None:
+            if menus is None:
+                return []
+            self._analyzer = MenuAnalyzer(menus.menu_nodes, executorIds if executorIds is not None else self._executor.executor_nodes.keys())
+            problems = self._analyzer.problems
+        else:
+            changed = diff_menu_nodes(self._analyzer.menu_nodes, menus.menu_nodes) if menus is not None else {}
+            problems = self._analyzer.update(changed, executorIds)
+
+        numLogged = {}
+        for problem in problems:
+            level = logging.ERROR if problem.severity == Severity.ERROR else logging.WARNING
+            numLogged[problem.code] = numLogged.get(problem.code, 0)+1
+            if numLogged[problem.code] <= self.MAX_LOGGED_PROBLEMS:
+                logging.log(level, "Menu problem: %s", problem)
+            elif numLogged[problem.code] == self.MAX_LOGGED_PROBLEMS+1:
+                numMore = sum(1 for other in problems if other.code == problem.code)-self.MAX_LOGGED_PROBLEMS
+                logging.log(level, "Menu problem: %s more %s", numMore, problem.code.value)
+        return problems
+
+    def _swap(self, menus: Menus, executorNodes: dict):
+        if menus is None:
+            self._executor.swap_executor_nodes(executorNodes)
+        else:
+            self._menuSystem.reload(menus, executorNodes)
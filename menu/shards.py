@@ -0,0 +1,293 @@
+'''
+Lazy loading of menus split into shards, one json file per subtree.
+
+A sharded menu is a directory of menu node files. Each shard is named after the id of the menu node that
+leads into it, so ROOT.json holds the root menu node and <id>.json holds the subtree entered through the
+selection option pointing at <id>. A shard has the same format as menunodes.json.
+
+Only the ROOT shard is loaded up front. Every other shard is loaded and validated the first time one of
+its menu nodes is requested, normally when the user navigates into it. Loaded shards are kept in least
+recently used order and cold ones are dropped again when the number of loaded menu nodes goes over a cap.
+The ROOT shard is never dropped.
+
+Rules for a sharded menu:
+
+    - the ROOT shard holds ROOT and the special menu nodes (CONFIRMATION, YES, NO, OUTPUT)
+    - a selection option may point to a menu node in its own shard, in the ROOT shard, or to the entry
+      menu node of another shard
+    - a menu node id appears in one shard only
+
+split_menu_nodes() turns an existing menunodes.json into shards.
+'''
+
+import json, logging, os
+import argparse
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Set
+
+from menu.menus import Menus, MenuNode, MenuNodeSpecialId, MenuNodeType, check_for_duplicates
+from menu.instrumentation import Instrumentation, NULL_INSTRUMENTATION
+
+
+ROOT_SHARD = MenuNodeSpecialId.ROOT.value
+SHARD_EXTENSION = '.json'
+
+
+def option_target_ids(menunode: MenuNode) -> List[str]:
+    '''
+    Ids of the menu nodes a menu node's selection options lead to, without running an options provider.
+    '''
+    if menunode.is_dynamic:
+        return [menunode.selection_options.target_id]
+    return [selectionOption.id for selectionOption in menunode.selection_options or ()]
+
+
+def shard_filename(directory: str, shardId: str) -> str:
+    return os.path.join(directory, shardId + SHARD_EXTENSION)
+
+
+def is_valid_shard_id(shardId: str) -> bool:
+    return bool(shardId) and not shardId.startswith('.') and os.sep not in shardId and (os.altsep is None or os.altsep not in shardId)
+
+
+class ShardedMenuNodes(Mapping):
+    '''
+        A read-only mapping of menu node ids to MenuNodes backed by a directory of shards. Shards are loaded
+        on first use and dropped in least recently used order once more than maxNodes menu nodes are loaded.
+
+        Iterating or taking the length loads every shard in turn, so these are meant for tools rather than
+        for navigation.
+    '''
+
+    def __init__(self, directory: str, maxNodes: int = 10000, instrumentation: Instrumentation = NULL_INSTRUMENTATION):
+        self._directory = directory
+        self._maxNodes = maxNodes
+        self._instrumentation = instrumentation
+
+        self._nodes: Dict[str, MenuNode] = {}
+        self._shards: OrderedDict = OrderedDict() # shard id -> menu node ids, least recently used first
+        self._nodeShards: Dict[str, str] = {} # menu node id -> shard id, kept after a shard is dropped
+        self._numLoadedNodes = 0
+        self._rootShardNodeIds = set()
+
+        self._load_shard(ROOT_SHARD)
+        self._rootShardNodeIds = set(self._shards[ROOT_SHARD])
+
+        rootNodeSelectionOptions = self._nodes[ROOT_SHARD].selection_options
+        if rootNodeSelectionOptions is None or len(rootNodeSelectionOptions)==0:
+            logging.error("Root menu node must have selection options")
+            raise Exception("Root menu node must have selection options")
+
+    @property
+    def root_node_id(self) -> str:
+        return ROOT_SHARD
+
+    @property
+    def loaded_shards(self) -> List[str]:
+        '''
+        Ids of the loaded shards, least recently used first.
+        '''
+        return list(self._shards.keys())
+
+    def _shard_exists(self, shardId: str) -> bool:
+        return is_valid_shard_id(shardId) and os.path.isfile(shard_filename(self._directory, shardId))
+
+    def _load_shard(self, shardId: str):
+        filename = shard_filename(self._directory, shardId)
+        with open(filename, "r") as shard_file:
+            menunodes = json.loads(shard_file.read(), object_hook = MenuNode.as_menu_node)
+
+        self._validate_shard(shardId, menunodes)
+
+        menuNodeIds = [menunode.id for menunode in menunodes]
+        for menunode in menunodes:
+            self._nodes[menunode.id] = menunode
+            self._nodeShards[menunode.id] = shardId
+        self._shards[shardId] = menuNodeIds
+        self._numLoadedNodes += len(menuNodeIds)
+
+        logging.info("Loaded menu shard %s: %s menu nodes", shardId, len(menuNodeIds))
+        if self._instrumentation.enabled:
+            self._instrumentation.count('menu_shard_loads_total')
+
+        self._evict(shardId)
+
+    def _validate_shard(self, shardId: str, menunodes: List[MenuNode]):
+        menuNodeIds = [menunode.id for menunode in menunodes]
+
+        # validate no duplicate menu node ids, within the shard and with menu nodes seen in other shards
+        check_for_duplicates(menuNodeIds)
+        if shardId not in menuNodeIds:
+            logging.error("Menu shard must contain its entry menu node: "+shardId)
+            raise Exception("Menu shard must contain its entry menu node "+shardId)
+        for menuNodeId in menuNodeIds:
+            if self._nodeShards.get(menuNodeId, shardId) != shardId:
+                logging.error("Menu node id found in more than one shard: "+menuNodeId)
+                raise Exception("Menu node id found in more than one shard "+menuNodeId)
+
+        # validate selection options point to valid menu nodes
+        shardNodeIds = set(menuNodeIds)
+        for menunode in menunodes:
+            for targetId in option_target_ids(menunode):
+                if targetId in shardNodeIds or targetId in self._rootShardNodeIds or self._shard_exists(targetId):
+                    continue
+                logging.error("Selection Option must have valid menu node id: "+targetId)
+                raise Exception("Selection Option must have valid menu node id "+targetId)
+
+            # validate executor type menu nodes point to valid executors
+            if menunode.type == MenuNodeType.EXECUTION and menunode.executor_id is None:
+                logging.error("Execution type menu nodes must have an executor node id. menu node id: "+menunode.id)
+                raise Exception("Execution type menu nodes must have an executor node id")
+
+    def _evict(self, keepShardId: str):
+        for shardId in list(self._shards.keys()):
+            if self._numLoadedNodes <= self._maxNodes:
+                break
+            if shardId == ROOT_SHARD or shardId == keepShardId:
+                continue
+            menuNodeIds = self._shards.pop(shardId)
+            for menuNodeId in menuNodeIds:
+                del self._nodes[menuNodeId]
+            self._numLoadedNodes -= len(menuNodeIds)
+            logging.info("Dropped menu shard %s", shardId)
+            if self._instrumentation.enabled:
+                self._instrumentation.count('menu_shard_evictions_total')
+
+        if self._instrumentation.enabled:
+            self._instrumentation.gauge('menu_shard_loaded_nodes', self._numLoadedNodes)
+
+    def __getitem__(self, menuNodeId: str) -> MenuNode:
+        menunode = self._nodes.get(menuNodeId)
+        if menunode is None:
+            shardId = self._nodeShards.get(menuNodeId)
+            if shardId is None:
+                if not self._shard_exists(menuNodeId):
+                    raise KeyError(menuNodeId)
+                shardId = menuNodeId
+            self._load_shard(shardId)
+            menunode = self._nodes[menuNodeId]
+        else:
+            self._shards.move_to_end(self._nodeShards[menuNodeId])
+        return menunode
+
+    def __iter__(self) -> Iterator[str]:
+        # walk shards from the root, following options that lead into shards not seen yet
+        seenShards = {ROOT_SHARD}
+        shardQueue = deque([ROOT_SHARD])
+        while shardQueue:
+            shardId = shardQueue.popleft()
+            if shardId not in self._shards:
+                self._load_shard(shardId)
+            menuNodeIds = list(self._shards[shardId])
+            for menuNodeId in menuNodeIds:
+                yield menuNodeId
+            for menuNodeId in menuNodeIds:
+                menunode = self._nodes.get(menuNodeId) or self[menuNodeId]
+                for targetId in option_target_ids(menunode):
+                    targetShardId = self._nodeShards.get(targetId, targetId)
+                    if targetShardId not in seenShards and self._shard_exists(targetShardId):
+                        seenShards.add(targetShardId)
+                        shardQueue.append(targetShardId)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+def load_sharded_menus(directory: str, maxNodes: int = 10000, instrumentation: Instrumentation = NULL_INSTRUMENTATION) -> Menus:
+    '''
+    Returns Menus backed by a directory of shards. Only the ROOT shard is loaded and validated here.
+    '''
+    menunodes = ShardedMenuNodes(directory, maxNodes, instrumentation)
+    return Menus.from_menu_nodes(menunodes, menunodes.root_node_id)
+
+
+def split_menu_nodes(menu_nodes_filename: str, directory: str, depth: int = 1) -> List[str]:
+    '''
+    Splits a menu nodes json file into shards written to directory and returns the shard ids.
+
+    Every selection menu node up to depth selections below the root starts a shard holding the menu nodes
+    reachable from it. Menu nodes reachable from more than one shard, and those not reachable at all, stay
+    in the ROOT shard so every selection option obeys the sharding rules.
+    '''
+    menus = Menus(menu_nodes_filename)
+    menunodes = menus.menu_nodes
+    specialIds = {specialId.value for specialId in MenuNodeSpecialId}
+
+    # choose shard entries by depth from the root
+    entries: List[str] = []
+    seen = {ROOT_SHARD}
+    level = [ROOT_SHARD]
+    for _ in range(depth):
+        nextLevel = []
+        for menuNodeId in level:
+            for targetId in option_target_ids(menunodes[menuNodeId]):
+                if targetId in seen or targetId in specialIds or menunodes[targetId].type != MenuNodeType.SELECTION:
+                    continue
+                if not is_valid_shard_id(targetId):
+                    logging.warning("Menu node id can't be used as a shard file name, keeping it in the ROOT shard: %s", targetId)
+                    continue
+                seen.add(targetId)
+                entries.append(targetId)
+                nextLevel.append(targetId)
+        level = nextLevel
+
+    # a menu node belongs to the one shard entry that reaches it without passing through another entry
+    entrySet = set(entries)
+    owners: Dict[str, Set[str]] = {}
+    for entryId in entries:
+        stack = [entryId]
+        reached = {entryId}
+        while stack:
+            menuNodeId = stack.pop()
+            owners.setdefault(menuNodeId, set()).add(entryId)
+            for targetId in option_target_ids(menunodes[menuNodeId]):
+                if targetId not in reached and targetId not in entrySet and targetId != ROOT_SHARD:
+                    reached.add(targetId)
+                    stack.append(targetId)
+
+    shards: Dict[str, List[MenuNode]] = {ROOT_SHARD: []}
+    for entryId in entries:
+        shards[entryId] = []
+    for menuNodeId, menunode in menunodes.items():
+        if menuNodeId in entrySet:
+            shards[menuNodeId].append(menunode)
+            continue
+        menuNodeOwners = owners.get(menuNodeId, ())
+        shardId = next(iter(menuNodeOwners)) if len(menuNodeOwners) == 1 else ROOT_SHARD
+        shards[shardId].append(menunode)
+
+    os.makedirs(directory, exist_ok=True)
+    for shardId, shardNodes in shards.items():
+        if not shardNodes:
+            continue
+        with open(shard_filename(directory, shardId), "w") as shard_file:
+            json.dump([_menu_node_json(menunode) for menunode in shardNodes], shard_file, indent=4)
+    logging.info("Split %s into %s menu shards", menu_nodes_filename, len(shards))
+    return list(shards.keys())
+
+
+def _menu_node_json(menunode: MenuNode) -> Dict:
+    dct = {'_id_': menunode.id, 'type': menunode.type.value}
+    if menunode.is_dynamic:
+        dct['optionsProvider'] = menunode.selection_options.as_dict()
+    elif menunode.selection_options is not None:
+        dct['selectionOptions'] = [{'menuNodeId': selectionOption.id, 'displayName': selectionOption.display_name} for selectionOption in menunode.selection_options]
+    if menunode.executor_id is not None:
+        dct['executorNodeId'] = menunode.executor_id
+    if menunode.is_confirm is not None:
+        dct['confirm'] = menunode.is_confirm
+    return dct
+
+
+def main(args: List[str] = None):
+    parser = argparse.ArgumentParser(description="Split a menu nodes json file into shards loaded on demand")
+    parser.add_argument('menunodes', help="menu nodes json file")
+    parser.add_argument('directory', help="directory to write the shards to")
+    parser.add_argument('--depth', type=int, default=1, help="selection levels below the root that start a shard")
+    parsedArgs = parser.parse_args(args)
+    split_menu_nodes(parsedArgs.menunodes, parsedArgs.directory, parsedArgs.depth)
+
+
+if __name__ == '__main__':
+    main()
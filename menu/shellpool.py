@@ -0,0 +1,188 @@
+'''
+A small pool of long-lived shells for running script executor nodes without starting a new shell from the
+menu service process on every execution.
+
+Each worker is a /bin/sh started once with its stdin and stdout connected to the pool. A script is run by
+writing one command line to the shell, which runs the script with stdin from /dev/null, optionally under a
+memory limit, and then prints a frame marker followed by the script's exit code. Everything the script
+printed before the marker is its output. The marker holds a random token per worker and a run counter so
+script output can't be mistaken for it.
+
+A worker is replaced after maxRuns scripts, when it dies and when a script times out. A timed out script is
+killed together with its shell.
+'''
+
+import logging, os, queue, select, shlex, signal, subprocess, time
+from subprocess import TimeoutExpired
+from typing import Callable, Tuple
+
+
+class ShellWorker(object):
+    '''
+    One pre-spawned shell. Not thread safe, the pool hands a worker to one run at a time.
+    '''
+    SHELL = '/bin/sh'
+
+    def __init__(self, maxRuns: int = 100):
+        self._maxRuns = maxRuns
+        self._process = None
+        self._numRuns = 0
+        self._buffer = bytearray()
+        self._token = os.urandom(8).hex()
+
+    @property
+    def process(self) -> subprocess.Popen:
+        return self._process
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self):
+        logging.info("Starting shell worker")
+        # a session of its own so a timed out script and the shell can be killed together
+        self._process = subprocess.Popen([self.SHELL], stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0, start_new_session=True)
+        self._numRuns = 0
+        self._buffer = bytearray()
+
+    def kill(self):
+        process = self._process
+        if process is not None:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def stop(self):
+        process = self._process
+        self._process = None
+        if process is None:
+            return
+        if process.poll() is None:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        process.wait()
+        process.stdin.close()
+        process.stdout.close()
+
+    def run(self, scriptPath: str, timeout: float = None, memoryLimit: int = None, onStart: Callable = None) -> Tuple[bytes, int]:
+        '''
+        Runs a script in the shell and returns its stdout and exit code. memoryLimit is in bytes. Raises
+        TimeoutExpired if the script runs longer than timeout seconds, the shell is killed in that case.
+        '''
+        if not self.is_alive or self._numRuns >= self._maxRuns:
+            self.stop()
+            self.start()
+        self._numRuns += 1
+        if onStart is not None:
+            onStart(self._process)
+
+        marker = ('\036'+self._token+str(self._numRuns)+':').encode('ascii')
+        command = shlex.quote(scriptPath)
+        if memoryLimit is not None:
+            command = '(ulimit -v '+str(max(memoryLimit//1024, 1))+' && exec '+command+')'
+        command += ' </dev/null; printf \'\\036'+self._token+str(self._numRuns)+':%d\\n\' "$?"\n'
+
+        try:
+            self._process.stdin.write(command.encode('utf-8'))
+            return self._read_frame(marker, timeout)
+        except TimeoutExpired:
+            self.stop()
+            raise TimeoutExpired(scriptPath, timeout)
+        except (OSError, EOFError, ValueError) as e:
+            self.stop()
+            logging.error("Shell worker failed: "+str(e))
+            raise Exception("Shell worker failed")
+
+    def _read_frame(self, marker: bytes, timeout: float) -> Tuple[bytes, int]:
+        deadline = None if timeout is None else time.monotonic()+timeout
+        fd = self._process.stdout.fileno()
+        searchFrom = 0
+        while True:
+            markerPos = self._buffer.find(marker, searchFrom)
+            if markerPos >= 0:
+                end = self._buffer.find(b'\n', markerPos)
+                if end >= 0:
+                    output = bytes(self._buffer[:markerPos])
+                    returnCode = int(self._buffer[markerPos+len(marker):end])
+                    del self._buffer[:end+1]
+                    return output, returnCode
+            else:
+                # only the tail can hold the start of a marker split across reads
+                searchFrom = max(len(self._buffer)-len(marker), 0)
+
+            remaining = None if deadline is None else deadline-time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutExpired(None, timeout)
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            data = os.read(fd, 65536)
+            if not data:
+                raise EOFError("shell exited")
+            self._buffer += data
+
+
+class ShellPool(object):
+    '''
+    Up to size shell workers, started on first use or by start(). run() is safe to call from several threads,
+    as many scripts run at the same time as there are workers and further runs wait for a free worker.
+    '''
+    def __init__(self, size: int = 2, maxRuns: int = 100, memoryLimit: int = None):
+        self._size = size
+        self._memoryLimit = memoryLimit
+        self._idle = queue.LifoQueue() # the most recently used shell is the most likely to be paged in
+        self._workers = []
+        for _ in range(size):
+            worker = ShellWorker(maxRuns)
+            self._workers.append(worker)
+            self._idle.put(worker)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def start(self):
+        '''
+        Starts every shell ahead of the first run.
+        '''
+        workers = [self._idle.get() for _ in range(self._size)]
+        try:
+            for worker in workers:
+                if not worker.is_alive:
+                    worker.start()
+        finally:
+            for worker in workers:
+                self._idle.put(worker)
+
+    def stop(self):
+        '''
+        Stops the idle shells and kills the busy ones, whose runs then fail and stop them. A later run starts
+        a new shell.
+        '''
+        idle = []
+        while True:
+            try:
+                idle.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in self._workers:
+            if worker not in idle:
+                worker.kill()
+        for worker in idle:
+            worker.stop()
+            self._idle.put(worker)
+
+    def run(self, scriptPath: str, timeout: float = None, onStart: Callable = None, memoryLimit: int = None) -> Tuple[bytes, int]:
+        '''
+        Runs a script on a free shell worker and returns its stdout and exit code. onStart is called with the
+        shell process, e.g. so it can be killed to cancel the run. memoryLimit overrides the pool's limit in
+        bytes. Raises TimeoutExpired if the script runs longer than timeout seconds.
+        '''
+        worker = self._idle.get()
+        try:
+            return worker.run(scriptPath, timeout, memoryLimit if memoryLimit is not None else self._memoryLimit, onStart)
+        finally:
+            self._idle.put(worker)
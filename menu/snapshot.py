@@ -0,0 +1,374 @@
+'''
+A compact, versioned binary snapshot of a validated Menus graph.
+
+Parsing menunodes.json through the MenuNode object hook and validating the graph is the largest part
+of service start time for big menus. A snapshot is written once from an already validated Menus
+instance and later memory-mapped, decoding individual menu nodes only when they are first requested.
+
+Layout (little endian):
+
+    header
+    string offsets      uint32 * (numStrings+1)
+    string blob         utf-8 encoded, interned ids and display names
+    node records        sorted by menu node id so ids can be found with a binary search
+    option records      target node index, display name string index
+    parent records      per node: parent node index, option index, the MenuIndex paths from the root
+    name records        casefolded and original display name string indexes and node index, sorted
+    row offsets         uint32 * (numOptions+1), only when rows were rendered for a display width
+    row blob            per option: its encoded row text after the cursor marker, see option_row_text()
+
+The header carries a sha256 digest of the source json. A snapshot whose digest does not match the
+current source file is stale and is ignored in favor of the json. Snapshots of an older version are
+ignored the same way and rewritten.
+'''
+
+import hashlib, logging, mmap, os, struct, sys
+import argparse
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List, Tuple
+
+from menu.menus import Menus, MenuNode, MenuNodeType, SelectionOption
+from menu.display.bounded import RenderedSelectionOptions, option_row_text
+
+
+SNAPSHOT_MAGIC = b'MNSN'
+SNAPSHOT_VERSION = 2
+
+_PREFIX = struct.Struct('<4sH')
+_HEADER = struct.Struct('<4sHH32sIIIIIIIIIIIIIII')
+_NODE_RECORD = struct.Struct('<IBbIII')
+_OPTION_RECORD = struct.Struct('<II')
+_PARENT_RECORD = struct.Struct('<II')
+_NAME_RECORD = struct.Struct('<III')
+_OFFSET = struct.Struct('<I')
+
+_NONE_INDEX = 0xFFFFFFFF
+
+_NODE_TYPES = (MenuNodeType.SELECTION, MenuNodeType.EXECUTION, MenuNodeType.OUTPUT)
+_CONFIRM_VALUES = {None: -1, False: 0, True: 1}
+
+
+def source_digest(menu_nodes_filename: str) -> bytes:
+    with open(menu_nodes_filename, "rb") as menunodes_file:
+        return hashlib.sha256(menunodes_file.read()).digest()
+
+
+def write_snapshot(menus: Menus, digest: bytes, snapshot_filename: str, numColumns: int = None, characterEncoding: str = 'ascii'):
+    '''
+    Writes the menu nodes of an already validated Menus instance to a snapshot file, along with its complete
+    MenuIndex and, if numColumns is given, the selection option rows rendered for that display width and
+    encoding. The file is written next to the destination and renamed into place so a reader never sees a
+    partially written snapshot.
+    '''
+    menunodes = sorted(menus.menu_nodes.values(), key=lambda menunode: menunode.id)
+    nodeIndexes = {menunode.id: index for index, menunode in enumerate(menunodes)}
+
+    strings = []
+    stringIndexes = {}
+
+    def intern_string(value: str) -> int:
+        if value is None:
+            return _NONE_INDEX
+        if value not in stringIndexes:
+            stringIndexes[value] = len(strings)
+            strings.append(value)
+        return stringIndexes[value]
+
+    nodeRecords = bytearray()
+    optionRecords = bytearray()
+    numOptions = 0
+
+    for menunode in menunodes:
+        if menunode.is_dynamic:
+            logging.error("Menu snapshots don't support generated selection options: "+menunode.id)
+            raise Exception("Menu snapshots don't support generated selection options")
+        idIndex = intern_string(menunode.id)
+        executorIndex = intern_string(menunode.executor_id)
+        optionsStart = numOptions
+        optionsCount = _NONE_INDEX
+        if menunode.selection_options is not None:
+            optionsCount = len(menunode.selection_options)
+            for selectionOption in menunode.selection_options:
+                optionRecords += _OPTION_RECORD.pack(nodeIndexes[selectionOption.id], intern_string(selectionOption.display_name))
+            numOptions += optionsCount
+        nodeRecords += _NODE_RECORD.pack(idIndex, _NODE_TYPES.index(menunode.type), _CONFIRM_VALUES[menunode.is_confirm], executorIndex, optionsStart, optionsCount)
+
+    parents, names = menus.index.export()
+    parentRecords = bytearray()
+    for menunode in menunodes:
+        parent = parents.get(menunode.id)
+        if parent is None:
+            parentRecords += _PARENT_RECORD.pack(_NONE_INDEX, _NONE_INDEX)
+        else:
+            parentRecords += _PARENT_RECORD.pack(nodeIndexes[parent[0]], parent[1])
+    nameRecords = bytearray()
+    for name, displayName, menuNodeId in names:
+        nameRecords += _NAME_RECORD.pack(intern_string(name), intern_string(displayName), nodeIndexes[menuNodeId])
+
+    rowOffsets = bytearray()
+    rowBlob = bytearray()
+    if numColumns is not None:
+        for menunode in menunodes:
+            for optionNum, selectionOption in enumerate(menunode.selection_options or ()):
+                rowOffsets += _OFFSET.pack(len(rowBlob))
+                rowBlob += option_row_text(optionNum, selectionOption.display_name, numColumns).encode(characterEncoding)
+        rowOffsets += _OFFSET.pack(len(rowBlob))
+    rowEncodingIndex = intern_string(characterEncoding) if numColumns is not None else _NONE_INDEX
+
+    encodedStrings = [value.encode('utf-8') for value in strings]
+    stringOffsets = bytearray()
+    position = 0
+    for encoded in encodedStrings:
+        stringOffsets += _OFFSET.pack(position)
+        position += len(encoded)
+    stringOffsets += _OFFSET.pack(position)
+    stringBlob = b''.join(encodedStrings)
+
+    offsetsOffset = _HEADER.size
+    blobOffset = offsetsOffset + len(stringOffsets)
+    nodesOffset = blobOffset + len(stringBlob)
+    optionsOffset = nodesOffset + len(nodeRecords)
+    parentsOffset = optionsOffset + numOptions*_OPTION_RECORD.size
+    namesOffset = parentsOffset + len(parentRecords)
+    rowOffsetsOffset = namesOffset + len(nameRecords)
+    rowBlobOffset = rowOffsetsOffset + len(rowOffsets)
+
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, digest,
+                          len(strings), len(menunodes), numOptions, nodeIndexes[menus.get_root_menu_node().id],
+                          offsetsOffset, blobOffset, nodesOffset, optionsOffset,
+                          parentsOffset, namesOffset, len(names), numColumns or 0, rowEncodingIndex, rowOffsetsOffset, rowBlobOffset)
+
+    tmpFilename = snapshot_filename + ".tmp"
+    with open(tmpFilename, "wb") as snapshot_file:
+        snapshot_file.write(header)
+        snapshot_file.write(stringOffsets)
+        snapshot_file.write(stringBlob)
+        snapshot_file.write(nodeRecords)
+        snapshot_file.write(optionRecords)
+        snapshot_file.write(parentRecords)
+        snapshot_file.write(nameRecords)
+        snapshot_file.write(rowOffsets)
+        snapshot_file.write(rowBlob)
+    os.replace(tmpFilename, snapshot_filename)
+
+
+def compile_snapshot(menu_nodes_filename: str, snapshot_filename: str, numColumns: int = None, characterEncoding: str = 'ascii') -> Menus:
+    '''
+    Loads and validates a menu nodes json file and writes its snapshot.
+    '''
+    menus = Menus(menu_nodes_filename)
+    write_snapshot(menus, source_digest(menu_nodes_filename), snapshot_filename, numColumns, characterEncoding)
+    logging.info("Compiled menu snapshot: %s", snapshot_filename)
+    return menus
+
+
+class SnapshotMenuNodes(Mapping):
+    '''
+        A read-only mapping of menu node ids to MenuNodes backed by a memory-mapped snapshot. Nodes are
+        decoded the first time they are requested and kept afterwards.
+    '''
+
+    def __init__(self, snapshot_filename: str):
+        with open(snapshot_filename, "rb") as snapshot_file:
+            self._data = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._data) < _PREFIX.size:
+            logging.error("Menu snapshot is truncated: "+snapshot_filename)
+            raise Exception("Menu snapshot is truncated")
+
+        magic, version = _PREFIX.unpack_from(self._data, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            logging.error("Unsupported menu snapshot format: "+snapshot_filename)
+            raise Exception("Unsupported menu snapshot format")
+
+        if len(self._data) < _HEADER.size:
+            logging.error("Menu snapshot is truncated: "+snapshot_filename)
+            raise Exception("Menu snapshot is truncated")
+
+        (_magic, _version, _flags, self._digest,
+         self._numStrings, self._numNodes, self._numOptions, self._rootIndex,
+         self._offsetsOffset, self._blobOffset, self._nodesOffset, self._optionsOffset,
+         self._parentsOffset, self._namesOffset, self._numNames, self._rowColumns, rowEncodingIndex,
+         self._rowOffsetsOffset, self._rowBlobOffset) = _HEADER.unpack_from(self._data, 0)
+
+        self._strings: Dict[int, str] = {}
+        self._nodes: Dict[int, MenuNode] = {}
+        self._indexes: Dict[str, int] = {}
+        self._rowEncoding = self._string(rowEncodingIndex)
+
+    @property
+    def digest(self) -> bytes:
+        return self._digest
+
+    @property
+    def index_data(self) -> Tuple:
+        '''
+        The arguments of a complete MenuIndex over the snapshot, read from the snapshot as they are used.
+        '''
+        return (_SnapshotParents(self), _SnapshotNames(self))
+
+    @property
+    def row_geometry(self) -> Tuple[int, str]:
+        '''
+        The display width and character encoding the option rows were rendered for, None if they weren't.
+        '''
+        return (self._rowColumns, self._rowEncoding) if self._rowColumns else None
+
+    @property
+    def root_node_id(self) -> str:
+        return self._node_id(self._rootIndex)
+
+    def _string(self, stringIndex: int) -> str:
+        if stringIndex == _NONE_INDEX:
+            return None
+        value = self._strings.get(stringIndex)
+        if value is None:
+            start, = _OFFSET.unpack_from(self._data, self._offsetsOffset + stringIndex*_OFFSET.size)
+            end, = _OFFSET.unpack_from(self._data, self._offsetsOffset + (stringIndex+1)*_OFFSET.size)
+            value = sys.intern(self._data[self._blobOffset+start:self._blobOffset+end].decode('utf-8'))
+            self._strings[stringIndex] = value
+        return value
+
+    def _node_id(self, nodeIndex: int) -> str:
+        idIndex, = _OFFSET.unpack_from(self._data, self._nodesOffset + nodeIndex*_NODE_RECORD.size)
+        return self._string(idIndex)
+
+    def _find_node_index(self, menuNodeId: str) -> int:
+        nodeIndex = self._indexes.get(menuNodeId)
+        if nodeIndex is not None:
+            return nodeIndex
+        low, high = 0, self._numNodes
+        while low < high:
+            middle = (low+high)//2
+            if self._node_id(middle) < menuNodeId:
+                low = middle+1
+            else:
+                high = middle
+        if low < self._numNodes and self._node_id(low) == menuNodeId:
+            self._indexes[menuNodeId] = low
+            return low
+        return None
+
+    def _decode_node(self, nodeIndex: int) -> MenuNode:
+        idIndex, typeCode, confirm, executorIndex, optionsStart, optionsCount = _NODE_RECORD.unpack_from(self._data, self._nodesOffset + nodeIndex*_NODE_RECORD.size)
+
+        selectionOptions = None
+        if optionsCount != _NONE_INDEX:
+            selectionOptions = []
+            for optionIndex in range(optionsStart, optionsStart+optionsCount):
+                targetIndex, displayNameIndex = _OPTION_RECORD.unpack_from(self._data, self._optionsOffset + optionIndex*_OPTION_RECORD.size)
+                selectionOptions.append(SelectionOption(id=self._node_id(targetIndex), displayName=self._string(displayNameIndex)))
+            if self._rowColumns:
+                selectionOptions = RenderedSelectionOptions(selectionOptions, self._rows(optionsStart, optionsCount), self._rowColumns, self._rowEncoding)
+
+        menuNodeId = self._string(idIndex)
+        return MenuNode(id=menuNodeId, menuNodeType=_NODE_TYPES[typeCode], selectionOptions=selectionOptions,
+                        confirm=None if confirm < 0 else bool(confirm), executorNodeId=self._string(executorIndex),
+                        isRoot=menuNodeId == 'ROOT')
+
+    def _rows(self, optionsStart: int, optionsCount: int) -> List[bytes]:
+        offsets = struct.unpack_from('<%sI' % (optionsCount+1), self._data, self._rowOffsetsOffset + optionsStart*_OFFSET.size)
+        blobOffset = self._rowBlobOffset
+        return [self._data[blobOffset+offsets[position]:blobOffset+offsets[position+1]] for position in range(optionsCount)]
+
+    def _parent(self, nodeIndex: int) -> Tuple[str, int]:
+        parentIndex, optionIndex = _PARENT_RECORD.unpack_from(self._data, self._parentsOffset + nodeIndex*_PARENT_RECORD.size)
+        if parentIndex == _NONE_INDEX:
+            return None
+        return (self._node_id(parentIndex), optionIndex)
+
+    def _name(self, position: int) -> Tuple[str, str, str]:
+        nameIndex, displayNameIndex, nodeIndex = _NAME_RECORD.unpack_from(self._data, self._namesOffset + position*_NAME_RECORD.size)
+        return (self._string(nameIndex), self._string(displayNameIndex), self._node_id(nodeIndex))
+
+    def __getitem__(self, menuNodeId: str) -> MenuNode:
+        nodeIndex = self._find_node_index(menuNodeId)
+        if nodeIndex is None:
+            raise KeyError(menuNodeId)
+        menunode = self._nodes.get(nodeIndex)
+        if menunode is None:
+            menunode = self._decode_node(nodeIndex)
+            self._nodes[nodeIndex] = menunode
+        return menunode
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._node_id(nodeIndex) for nodeIndex in range(self._numNodes))
+
+    def __len__(self) -> int:
+        return self._numNodes
+
+
+class _SnapshotParents(Mapping):
+    '''
+    MenuIndex parents of the menu nodes reachable from the root, decoded from a snapshot.
+    '''
+    def __init__(self, menunodes: SnapshotMenuNodes):
+        self._menunodes = menunodes
+
+    def __getitem__(self, menuNodeId: str) -> Tuple[str, int]:
+        nodeIndex = self._menunodes._find_node_index(menuNodeId)
+        if nodeIndex is None or (nodeIndex != self._menunodes._rootIndex and self._menunodes._parent(nodeIndex) is None):
+            raise KeyError(menuNodeId)
+        return self._menunodes._parent(nodeIndex)
+
+    def __iter__(self) -> Iterator[str]:
+        return (menuNodeId for menuNodeId in self._menunodes if menuNodeId in self)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class _SnapshotNames(Sequence):
+    '''
+    The sorted MenuIndex display names, decoded from a snapshot.
+    '''
+    def __init__(self, menunodes: SnapshotMenuNodes):
+        self._menunodes = menunodes
+
+    def __getitem__(self, position: int) -> Tuple[str, str, str]:
+        if position < 0 or position >= self._menunodes._numNames:
+            raise IndexError(position)
+        return self._menunodes._name(position)
+
+    def __len__(self) -> int:
+        return self._menunodes._numNames
+
+
+def load_menus(menu_nodes_filename: str, snapshot_filename: str, recompile: bool = True) -> Menus:
+    '''
+    Returns Menus backed by the snapshot when it is current for the given menu nodes json file. A missing,
+    unreadable or stale snapshot falls back to loading the json and, if recompile is set, rewrites the
+    snapshot so the next start is fast again.
+    '''
+    try:
+        menunodes = SnapshotMenuNodes(snapshot_filename)
+        if not os.path.exists(menu_nodes_filename) or menunodes.digest == source_digest(menu_nodes_filename):
+            return Menus.from_menu_nodes(menunodes, menunodes.root_node_id, menunodes.index_data)
+        logging.warning("Menu snapshot is stale: %s", snapshot_filename)
+    except FileNotFoundError:
+        logging.info("No menu snapshot found: %s", snapshot_filename)
+    except Exception as e:
+        logging.warning("Unable to load menu snapshot: %s", e)
+
+    if not recompile:
+        return Menus(menu_nodes_filename)
+
+    menus = Menus(menu_nodes_filename)
+    try:
+        write_snapshot(menus, source_digest(menu_nodes_filename), snapshot_filename)
+        logging.info("Compiled menu snapshot: %s", snapshot_filename)
+    except Exception as e:
+        logging.warning("Unable to write menu snapshot: %s", e)
+    return menus
+
+
+def main(args: List[str] = None):
+    parser = argparse.ArgumentParser(description="Validate a menu nodes json file and write its binary snapshot")
+    parser.add_argument('menunodes', help="menu nodes json file")
+    parser.add_argument('snapshot', help="snapshot file to write")
+    parsedArgs = parser.parse_args(args)
+    compile_snapshot(parsedArgs.menunodes, parsedArgs.snapshot)
+
+
+if __name__ == '__main__':
+    main()
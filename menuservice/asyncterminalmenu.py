@@ -0,0 +1,31 @@
+from pathlib import Path
+import asyncio, signal, os, logging
+
+from menu.display.terminal import TerminalDisplay
+from menu.display.asyncdisplay import AsyncDisplayAdapter
+from menu.action.asyncmenuaction import AsyncKeyboardMenuAction
+from menu.asyncmenusystem import AsyncMenuSystem
+from menu.menus import Menus, Executor, Navigator
+
+# Get the current location of this script
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+logging.basicConfig(filename='/var/log/terminalmenu.log', level=logging.INFO)
+
+nodesPath = os.path.join(__location__, 'menunodes.json')
+executorsPath = os.path.join(__location__, 'executors.json')
+scriptsPath = os.path.join(__location__, 'scripts')
+
+async def main():
+    menus = Menus(nodesPath)
+    executor = Executor(executorsPath, Path(scriptsPath))
+    navigator = Navigator(menus)
+
+    menuSystem = AsyncMenuSystem(menus, executor, navigator, AsyncDisplayAdapter(TerminalDisplay()), AsyncKeyboardMenuAction())
+
+    # Unlike the threaded terminal menu, ctrl-c stops the menu promptly
+    asyncio.get_running_loop().add_signal_handler(signal.SIGINT, menuSystem.stop)
+
+    await menuSystem.run() # Will return when the user quits via terminal input 'q'
+
+asyncio.run(main())
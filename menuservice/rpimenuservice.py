@@ -3,9 +3,15 @@ import signal, os, logging
 from queue import Queue
 
 from menu.menusystem import MenuSystem
+from menu.reloader import MenuReloader
 from menu.action.rpibuttonmenuaction import RPiButtonBoardMenuAction
 from menu.display.sparkfunlcd import Sparkfun4x20LCDDisplay
-from menu.menus import Menus, Executor, Navigator
+from menu.menus import Executor, Navigator, ResultCache
+from menu.pyworker import PyScriptWorker
+from menu.shellpool import ShellPool
+from menu.snapshot import load_menus
+from menu.action.replaymenuaction import RecordingQueue
+from menu.instrumentation import MetricsInstrumentation, InstrumentedQueue, NULL_INSTRUMENTATION
 
 # Get the current location of this script
 __location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
@@ -20,26 +26,70 @@ GPIO_PIN_S1 = 40    # GPIO21
 GPIO_PIN_S2 = 38    # GPIO20
 
 nodesPath = os.path.join(__location__, 'menunodes.json')
+nodesSnapshotPath = os.path.join(__location__, 'menunodes.snapshot')
 executorsPath = os.path.join(__location__, 'executors.json')
 scriptsPath = os.path.join(__location__, 'scripts')
 
-menus = Menus(nodesPath)
-executor = Executor(executorsPath, Path(scriptsPath))
+# Set to e.g. a node exporter textfile collector path (*.prom) or a *.json file to record latency metrics
+metricsPath = os.environ.get('RPIMENU_METRICS_FILE')
+instrumentation = MetricsInstrumentation() if metricsPath else NULL_INSTRUMENTATION
+# Set to a file to record the button presses of the session for replay with benchmark.replay
+actionLogPath = os.environ.get('RPIMENU_ACTION_LOG')
+# Opt-in features, off unless set
+# comma separated modules imported once by a worker that runs pyscript executors, e.g. RPi.GPIO
+preloadModules = [module for module in os.environ.get('RPIMENU_PYSCRIPT_PRELOAD', '').split(',') if module]
+# number of pre-spawned shells running script executors that aren't streamed
+shellPoolSize = int(os.environ.get('RPIMENU_SHELL_POOL', '0'))
+# file the results of cacheable script executors are persisted to
+resultCachePath = os.environ.get('RPIMENU_RESULT_CACHE')
+asyncExecution = os.environ.get('RPIMENU_ASYNC_EXECUTION') == '1'
+streamOutput = os.environ.get('RPIMENU_STREAM_OUTPUT') == '1'
+prefetch = os.environ.get('RPIMENU_PREFETCH') == '1'
+writerThread = os.environ.get('RPIMENU_LCD_WRITER_THREAD') == '1'
+
+menus = load_menus(nodesPath, nodesSnapshotPath)
+pyWorker = PyScriptWorker(preloadModules=preloadModules) if preloadModules else None
+shellPool = ShellPool(size=shellPoolSize) if shellPoolSize > 0 else None
+resultCache = ResultCache(filename=resultCachePath) if resultCachePath else None
+executor = Executor(executorsPath, Path(scriptsPath), instrumentation=instrumentation, resultCache=resultCache,
+                    pyWorker=pyWorker, shellPool=shellPool)
 navigator = Navigator(menus)
-display = Sparkfun4x20LCDDisplay(4, 20, 'ascii')
-actionQueue = Queue()
+display = Sparkfun4x20LCDDisplay(4, 20, 'ascii', instrumentation, writerThread=writerThread)
+if actionLogPath:
+    actionQueue = RecordingQueue(actionLogPath, instrumentation)
+else:
+    actionQueue = InstrumentedQueue(instrumentation) if metricsPath else Queue()
 menuAction = RPiButtonBoardMenuAction(actionQueue, GPIO_PIN_S1, GPIO_PIN_S2, GPIO_PIN_UP, GPIO_PIN_DOWN, GPIO_PIN_LEFT, GPIO_PIN_RIGHT)
 
-menuSystem = MenuSystem(menus, executor, navigator, display, actionQueue, menuAction)
+menuSystem = MenuSystem(menus, executor, navigator, display, actionQueue, menuAction, asyncExecution=asyncExecution, streamOutput=streamOutput,
+                        instrumentation=instrumentation, prefetch=prefetch)
+reloader = MenuReloader(menuSystem, executor, nodesPath, executorsPath, loadMenus=lambda path: load_menus(path, nodesSnapshotPath))
 
 def handle_sigterm(sig, frame):
     logging.info('Stopping')
+    reloader.stop()
     menuAction.stop()
     menuSystem.stop()
+    executor.shutdown()
     display.cleanup()
+    if actionLogPath:
+        actionQueue.close()
+    if metricsPath:
+        instrumentation.stop_dump()
 
 signal.signal(signal.SIGTERM, handle_sigterm)
 
 logging.info('Started')
 
+# the starting menus are analyzed on the reloader's thread
+reloader.start(menus)
+if pyWorker is not None:
+    pyWorker.start()
+if shellPool is not None:
+    shellPool.start()
+if resultCache is not None:
+    executor.warm_cache()
+if metricsPath:
+    instrumentation.start_dump(metricsPath)
+
 menuSystem.run()
@@ -9,3 +9,5 @@ GPIO.setup(16, GPIO.OUT)
 
 GPIO.output(16, GPIO.HIGH)
 
+
+print("Let there be light!")
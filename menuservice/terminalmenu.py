@@ -20,7 +20,8 @@ menus = Menus(nodesPath)
 executor = Executor(executorsPath, Path(scriptsPath))
 navigator = Navigator(menus)
 actionQueue = Queue()
-keyboardMenuAction = KeyboardMenuAction(actionQueue)
+# '/name' jumps to the first menu option starting with name
+keyboardMenuAction = KeyboardMenuAction(actionQueue, searchCallback=lambda prefix: menuSystem.call_in_loop(lambda: menuSystem.jump(prefix)))
 
 menuSystem = MenuSystem(menus, executor, navigator, TerminalDisplay(), actionQueue, keyboardMenuAction)
 
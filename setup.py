@@ -19,13 +19,16 @@ setup(
     license = "BSD",
     keywords = "menu raspberrypi lcd button terminal keyboard",
     url = "http://packages.python.org/an_example_pypi_project",
-    packages=['menu', 'menu.action', 'menu.display', 'menuservice', 'test', 'test.action', 'test.display'],
+    packages=['menu', 'benchmark', 'menu.action', 'menu.display', 'menuservice', 'test', 'test.action', 'test.display'],
     include_package_data=True,
     install_requires = [
         'RPi.GPIO',
         'sparkfun-qwiic-i2c',
         'sparkfun-qwiic-serlcd'
     ],
+    entry_points = {
+        'console_scripts': ['menusystem-compile = menu.compiler:main']
+    },
     long_description=read('README.md'),
     classifiers=[
         "Development Status :: 3 - Alpha",
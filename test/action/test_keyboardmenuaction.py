@@ -24,6 +24,10 @@ class TestKeyboardMenuActions(unittest.TestCase):
         ("s", MenuAction.Action.SELECT),
         ("q", MenuAction.Action.QUIT),
         ("a", MenuAction.Action.HOME),
+        ("u", MenuAction.Action.LEFT),
+        ("n", MenuAction.Action.RIGHT),
+        ("t", MenuAction.Action.TOP),
+        ("b", MenuAction.Action.BOTTOM),
         ("d", MenuAction.Action.NONE)
     ])
     def test_map_input_to_action(self, inputKey, expectedAction: MenuAction.Action):
@@ -60,5 +64,20 @@ class TestKeyboardMenuActions(unittest.TestCase):
         mockActionQueue.join.assert_called_once()
         mockExitEvent.set.assert_not_called()
 
+    @patch('menu.action.keyboardmenuaction.KeyboardMenuAction.get_input', return_value='/wifi')
+    def test_get_action_search(self, mockGetEventMethod):
+
+        mockExitEvent = Mock(spec=threading.Event)
+        mockExitEvent.is_set.side_effect = [False, True]
+        mockActionQueue = Mock(spec=Queue)
+        mockSearchCallback = Mock()
+        keyBoardMA = KeyboardMenuAction(mockActionQueue, searchCallback=mockSearchCallback)
+        with patch.object(keyBoardMA, '_exitEvent', mockExitEvent):
+            keyBoardMA.get_actions()
+
+        mockSearchCallback.assert_called_once_with('wifi')
+        mockActionQueue.put.assert_not_called()
+        mockActionQueue.join.assert_called_once()
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import os, shutil, tempfile, time
+from pathlib import Path
+from queue import Queue
+
+from menu.action.menuaction import MenuAction
+from menu.action.replaymenuaction import ActionRecord, RecordingQueue, ReplayMenuAction, read_action_log, write_action_log
+from menu.display.headless import HeadlessDisplay
+from menu.instrumentation import MetricsInstrumentation
+from menu.menus import Menus, Navigator, Executor
+from menu.menusystem import MenuSystem
+
+MENU_NODES = "test/test_input_menunode_files/menunodes_search.json"
+EXECUTORS = "test/test_input_executor_files/executors_valid_init.json"
+
+Action = MenuAction.Action
+
+def records(*actions, interval: float = 0.0):
+    return [ActionRecord(position*interval, action) for position, action in enumerate(actions)]
+
+class TestActionLog(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpDir = tempfile.mkdtemp()
+        self._logFilename = os.path.join(self._tmpDir, "session.log")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpDir)
+
+    def test_write_and_read(self):
+        written = [ActionRecord(0.5, Action.DOWN, 0.002), ActionRecord(1.25, Action.SELECT), ActionRecord(1.25, Action.HOME, 0.0)]
+        write_action_log(written, self._logFilename)
+
+        self.assertEqual(os.path.getsize(self._logFilename), 14+9*3)
+        read = read_action_log(self._logFilename)
+        self.assertEqual([(record.timestamp, record.action, record.latency) for record in read],
+                         [(0.5, Action.DOWN, 0.002), (1.25, Action.SELECT, None), (1.25, Action.HOME, 0.0)])
+
+    def test_truncated_record_dropped(self):
+        write_action_log(records(Action.DOWN, Action.UP), self._logFilename)
+        with open(self._logFilename, "r+b") as log_file:
+            log_file.truncate(os.path.getsize(self._logFilename)-4)
+        self.assertEqual([record.action for record in read_action_log(self._logFilename)], [Action.DOWN])
+
+    def test_not_an_action_log(self):
+        with open(self._logFilename, "wb") as log_file:
+            log_file.write(b"menunodes")
+        with self.assertRaises(Exception):
+            read_action_log(self._logFilename)
+
+
+class TestRecordAndReplay(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpDir = tempfile.mkdtemp()
+        self._logFilename = os.path.join(self._tmpDir, "session.log")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpDir)
+
+    def run_menu_system(self, actionQueue: Queue, menuAction: MenuAction) -> HeadlessDisplay:
+        menus = Menus(MENU_NODES)
+        display = HeadlessDisplay(rows=2, columns=14)
+        MenuSystem(menus, Executor(EXECUTORS, Path(".")), Navigator(menus), display, actionQueue, menuAction).run()
+        return display
+
+    def test_replay_as_fast_as_possible(self):
+        actionQueue = Queue()
+        menuAction = ReplayMenuAction(actionQueue, records(Action.DOWN, Action.SELECT, Action.DOWN), realTime=False)
+        display = self.run_menu_system(actionQueue, menuAction)
+
+        self.assertEqual(len(menuAction.latencies), 3)
+        self.assertEqual(display.num_frames, 4)
+
+    def test_replay_with_recorded_timing(self):
+        actionQueue = Queue()
+        menuAction = ReplayMenuAction(actionQueue, [ActionRecord(10.0, Action.DOWN), ActionRecord(10.2, Action.DOWN), ActionRecord(10.4, Action.UP)])
+        start = time.monotonic()
+        self.run_menu_system(actionQueue, menuAction)
+        # timed from the first action, a recording doesn't start with its idle time
+        self.assertGreaterEqual(time.monotonic()-start, 0.39)
+        self.assertLess(time.monotonic()-start, 2)
+        self.assertEqual(menuAction.latencies, [])
+
+    def test_replay_speed_and_max_delay(self):
+        actionQueue = Queue()
+        menuAction = ReplayMenuAction(actionQueue, [ActionRecord(0.0, Action.DOWN), ActionRecord(3600.0, Action.UP), ActionRecord(3601.0, Action.DOWN)],
+                                      speed=10.0, maxDelay=1.0)
+        start = time.monotonic()
+        self.run_menu_system(actionQueue, menuAction)
+        self.assertLess(time.monotonic()-start, 1)
+
+    def test_record_replay(self):
+        actions = [Action.DOWN, Action.DOWN, Action.UP, Action.BOTTOM, Action.TOP, Action.HOME]
+        actionQueue = RecordingQueue(self._logFilename)
+        self.run_menu_system(actionQueue, ReplayMenuAction(actionQueue, records(*actions, interval=0.01)))
+        actionQueue.close()
+
+        recorded = read_action_log(self._logFilename)
+        self.assertEqual([record.action for record in recorded], actions+[Action.QUIT])
+        self.assertTrue(all(record.latency is not None and record.latency >= 0 for record in recorded))
+        self.assertEqual(sorted(record.timestamp for record in recorded), [record.timestamp for record in recorded])
+
+        # replaying the recording gives the same frames as the original session
+        queue = Queue()
+        replayed = self.run_menu_system(queue, ReplayMenuAction(queue, records(*actions), realTime=False))
+        again = Queue()
+        fromLog = self.run_menu_system(again, ReplayMenuAction(again, recorded, realTime=False))
+        self.assertEqual([frame.rows for frame in fromLog.frames], [frame.rows for frame in replayed.frames])
+
+    def test_recording_keeps_queue_metrics(self):
+        instrumentation = MetricsInstrumentation()
+        actionQueue = RecordingQueue(self._logFilename, instrumentation)
+        for action in (Action.UP, Action.DOWN):
+            actionQueue.put(action)
+            self.assertEqual(actionQueue.get(), action)
+            self.assertIsNotNone(actionQueue.last_enqueue_time)
+            actionQueue.task_done()
+        actionQueue.close()
+
+        self.assertEqual(instrumentation.histogram('menu_action_queue_wait_seconds').count, 2)
+        self.assertEqual([record.action for record in read_action_log(self._logFilename)], [Action.UP, Action.DOWN])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -33,6 +33,7 @@ class TestKeyboardMenuActions(unittest.TestCase):
         (GPIO_PIN_DOWN, MenuAction.Action.DOWN),
         (GPIO_PIN_S2, MenuAction.Action.SELECT),
         (GPIO_PIN_RIGHT, MenuAction.Action.SELECT),
+        (GPIO_PIN_LEFT, MenuAction.Action.LEFT),
         (GPIO_PIN_S1, MenuAction.Action.HOME)
     ])
     @patch.multiple('RPi.GPIO',
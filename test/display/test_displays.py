@@ -1,10 +1,13 @@
-import unittest
+import unittest, threading
 from unittest.mock import MagicMock, call, patch
 
 from menu.menus import MenuNode, MenuNodeType, SelectionOption, MenuDestination
 from menu.display.terminal import TerminalDisplay
+from menu.display.listwindow import ListWindow
+from menu.display.headless import HeadlessDisplay
 from menu.display.bounded import BoundedCharacterTerminalDisplay
 from menu.display.sparkfunlcd import Sparkfun4x20LCDDisplay
+from menu.instrumentation import MetricsInstrumentation
 
 class TestTerminalDisplay(unittest.TestCase):
 
@@ -35,6 +38,105 @@ class TestTerminalDisplay(unittest.TestCase):
         self._terminalDisplay._output_data.assert_has_calls(calls)
 
 
+    def test_display_menu_page(self):
+        selectionOptions = [SelectionOption(id=str(pos), displayName="Option"+str(pos)) for pos in range(10)]
+        menuNodeWithSelections = MenuNode(id=None, menuNodeType=MenuNodeType.SELECTION, selectionOptions=selectionOptions, confirm=False, executorNodeId=None, isRoot=False)
+        terminalDisplay = TerminalDisplay(pageSize=4)
+        terminalDisplay._output_data = MagicMock()
+
+        terminalDisplay.display_menu(menuNodeWithSelections, 0)
+        terminalDisplay._output_data.reset_mock()
+        terminalDisplay.display_menu(menuNodeWithSelections, 5)
+
+        self.assertEqual(terminalDisplay._output_data.call_args_list, [call('> 5: Option5'), call('  6: Option6'), call('  7: Option7'), call('  8: Option8')])
+
+
+class TestHeadlessDisplay(unittest.TestCase):
+
+    def setUp(self):
+        selectionOptions = [SelectionOption("id"+str(pos), "Option "+str(pos)) for pos in range(1, 7)]
+        self._menuNode = MenuNode(id="menu", menuNodeType=MenuNodeType.SELECTION, selectionOptions=selectionOptions, confirm=False, executorNodeId=None, isRoot=False)
+
+    def test_display_menu_framebuffer(self):
+        headlessDisplay = HeadlessDisplay(rows=4, columns=12)
+        headlessDisplay.display_menu(self._menuNode, 0)
+        for cursorPos in range(1, 5):
+            headlessDisplay.display_menu(self._menuNode, cursorPos)
+
+        self.assertEqual(headlessDisplay.text, " 2: Option 2\n 3: Option 3\n 4: Option 4\n>5: Option 5")
+        self.assertEqual(headlessDisplay.num_frames, 5)
+        frames = headlessDisplay.frames
+        self.assertEqual(frames[0].rows, [">1: Option 1", " 2: Option 2", " 3: Option 3", " 4: Option 4"])
+        self.assertTrue(all(earlier.timestamp <= later.timestamp for earlier, later in zip(frames, frames[1:])))
+
+    def test_display_output_blanks_rows(self):
+        headlessDisplay = HeadlessDisplay(rows=3, columns=5)
+        headlessDisplay.display_output(None, "hello world")
+        self.assertEqual(headlessDisplay.framebuffer, ["hello", " worl", "d    "])
+        headlessDisplay.display_output(None, b"hi")
+        self.assertEqual(headlessDisplay.framebuffer, ["hi   ", "     ", "     "])
+        headlessDisplay.clear()
+        self.assertEqual(headlessDisplay.framebuffer, ["     "]*3)
+
+    def test_max_frames(self):
+        headlessDisplay = HeadlessDisplay(maxFrames=2)
+        for cursorPos in range(6):
+            headlessDisplay.display_menu(self._menuNode, cursorPos)
+        self.assertEqual(headlessDisplay.num_frames, 6)
+        self.assertEqual(len(headlessDisplay.frames), 2)
+
+        headlessDisplay = HeadlessDisplay(maxFrames=0)
+        headlessDisplay.display_menu(self._menuNode, 0)
+        self.assertEqual(headlessDisplay.frames, [])
+        self.assertTrue(headlessDisplay.text.startswith(">1: Option 1"))
+
+    def test_render_and_output_time(self):
+        instrumentation = MetricsInstrumentation()
+        headlessDisplay = HeadlessDisplay(instrumentation=instrumentation)
+        headlessDisplay.display_menu(self._menuNode, 0)
+        self.assertGreater(headlessDisplay.render_seconds, 0)
+        self.assertGreater(headlessDisplay.output_seconds, 0)
+        self.assertEqual(instrumentation.histogram('display_render_seconds').count, 1)
+        self.assertEqual(instrumentation.histogram('display_output_seconds').count, 1)
+
+        headlessDisplay.reset_stats()
+        self.assertEqual((headlessDisplay.num_frames, headlessDisplay.render_seconds, headlessDisplay.frames), (0, 0.0, []))
+
+    def test_display_menu_exception(self):
+        emptyMenuNode = MenuNode(id=None, menuNodeType=None, selectionOptions=None, confirm=True, executorNodeId=None, isRoot=False)
+        with self.assertRaises(Exception) as ecm:
+            HeadlessDisplay().display_menu(emptyMenuNode, None)
+        self.assertEqual(str(ecm.exception), "Must have selection options to display")
+
+
+class TestListWindow(unittest.TestCase):
+
+    def test_scroll_one_row(self):
+        listWindow = ListWindow(4)
+        for cursor in range(5):
+            listWindow.move(cursor, 10)
+        self.assertEqual((listWindow.top, listWindow.bottom), (1, 4))
+        for cursor in range(4, -1, -1):
+            listWindow.move(cursor, 10)
+        self.assertEqual((listWindow.top, listWindow.bottom), (0, 3))
+
+    def test_page_keeps_cursor_row(self):
+        listWindow = ListWindow(4)
+        listWindow.move(1, 10)
+        listWindow.move(5, 10)
+        self.assertEqual(listWindow.top, 4)
+        listWindow.move(1, 10)
+        self.assertEqual(listWindow.top, 0)
+
+    def test_jump_to_end(self):
+        listWindow = ListWindow(4)
+        listWindow.move(9, 10)
+        self.assertEqual(listWindow.top, 6)
+        self.assertEqual(list(listWindow.visible(10)), [6, 7, 8, 9])
+        listWindow.move(0, 10)
+        self.assertEqual(list(listWindow.visible(2)), [0, 1])
+
+
 class TestBoundedCharacterTerminalDisplay(unittest.TestCase):
 
     def setUp(self):
@@ -78,6 +180,36 @@ class TestBoundedCharacterTerminalDisplay(unittest.TestCase):
         self.assertEqual(rowByteArrays[1].decode(), '01234567890123456789')
         self.assertEqual(rowByteArrays[2].decode(), '0')
 
+    def test_prepare_selection_menu_display_buffer_short_window(self):
+        selectionOptions = [SelectionOption("id1", "Option 1"), SelectionOption("id2", "Option 2")]
+
+        rowByteArrays = self._boundedDisplay.prepare_selection_menu_display_buffer(selectionOptions, windowTop=0, windowBottom=3, cursorPos=1)
+
+        self.assertEqual(2, len(rowByteArrays))
+        self.assertEqual(rowByteArrays[1].decode(), '>2: Option 2        ')
+
+    def test_prepare_menu_node_display_buffer_cache(self):
+        selectionOptions = [SelectionOption("id1", "Option 1"), SelectionOption("id2", "Option 2")]
+        menuNode = MenuNode(id='node', menuNodeType=MenuNodeType.SELECTION, selectionOptions=selectionOptions, confirm=False, executorNodeId=None, isRoot=False)
+
+        rowByteArrays = self._boundedDisplay.prepare_menu_node_display_buffer(menuNode, 0, 3, 0)
+        self.assertIs(self._boundedDisplay.prepare_menu_node_display_buffer(menuNode, 0, 3, 0), rowByteArrays)
+        self.assertIsNot(self._boundedDisplay.prepare_menu_node_display_buffer(menuNode, 0, 3, 1), rowByteArrays)
+
+        self._boundedDisplay.invalidate_render_cache()
+        self.assertIsNot(self._boundedDisplay.prepare_menu_node_display_buffer(menuNode, 0, 3, 0), rowByteArrays)
+
+    def test_prepare_menu_node_display_buffer_cache_eviction(self):
+        selectionOptions = [SelectionOption("id1", "Option 1")]
+        menuNodes = [MenuNode(id=str(n), menuNodeType=MenuNodeType.SELECTION, selectionOptions=selectionOptions, confirm=False, executorNodeId=None, isRoot=False) for n in range(BoundedCharacterTerminalDisplay.RENDER_CACHE_SIZE+1)]
+
+        firstRows = self._boundedDisplay.prepare_menu_node_display_buffer(menuNodes[0], 0, 3, 0)
+        for menuNode in menuNodes[1:]:
+            self._boundedDisplay.prepare_menu_node_display_buffer(menuNode, 0, 3, 0)
+
+        self.assertEqual(len(self._boundedDisplay._renderCache), BoundedCharacterTerminalDisplay.RENDER_CACHE_SIZE)
+        self.assertIsNot(self._boundedDisplay.prepare_menu_node_display_buffer(menuNodes[0], 0, 3, 0), firstRows)
+
     def test_display_menu_exception(self):
  
         menuNode = MenuNode(id='', menuNodeType=None, selectionOptions=None, confirm=False, executorNodeId=None, isRoot=False)
@@ -117,6 +249,22 @@ class TestBoundedCharacterTerminalDisplay(unittest.TestCase):
         self._boundedDisplay.display_output(None, output) 
         self._boundedDisplay._output_data.assert_has_calls(calls)
 
+    def test_display_output_string(self):
+
+        self._boundedDisplay._output_data = MagicMock()
+
+        self._boundedDisplay.display_output(None, "Running...")
+        self._boundedDisplay._output_data.assert_has_calls([call('Running...')])
+
+def sent_bytes(mockLcd) -> bytes:
+    '''
+    The byte stream written to a mocked lcd through I2C block writes.
+    '''
+    return b''.join(bytes([blockCall.args[1]]+list(blockCall.args[2])) for blockCall in mockLcd.return_value._i2c.writeBlock.call_args_list)
+
+def set_cursor(column, row) -> bytes:
+    return bytes([254, 0x80 | (column+[0x00, 0x40, 0x14, 0x54][row])])
+
 class TestSparkfun4x20LCDDisplay(unittest.TestCase):
 
     @patch('menu.display.sparkfunlcd.QwiicSerlcd')
@@ -131,8 +279,56 @@ class TestSparkfun4x20LCDDisplay(unittest.TestCase):
         menuNode = MenuNode(id='', menuNodeType=None, selectionOptions=selectionOptions, confirm=False, executorNodeId=None, isRoot=False)
         display.display_menu(menuNode, 0)
 
-        self.assertTrue(all(x in mockLcd.mock_calls for x in [call().setCursor(0, 0), call().setCursor(0, 1)]))
-        self.assertTrue(all(x in mockLcd.mock_calls for x in [call().print('>1: option1         '), call().print(' 2: option2         ')]))
+        self.assertEqual(sent_bytes(mockLcd), set_cursor(0, 0)+b'>1: option1         '+set_cursor(0, 1)+b' 2: option2         '+
+                                              set_cursor(0, 2)+b' '*20+set_cursor(0, 3)+b' '*20)
+        self.assertTrue(all(len(blockCall.args[2])+1 <= Sparkfun4x20LCDDisplay.MAX_BLOCK_SIZE for blockCall in mockLcd.return_value._i2c.writeBlock.call_args_list))
+        mockLcd.return_value.print.assert_not_called()
+
+    @patch('menu.display.sparkfunlcd.QwiicSerlcd')
+    def test_display_menu_only_sends_changes(self, mockLcd):
+
+        display = Sparkfun4x20LCDDisplay(4, 20, 'ascii')
+
+        selectionOptions = [SelectionOption(id='id1', displayName="option1"), SelectionOption(id='id2', displayName="option2")]
+        menuNode = MenuNode(id='', menuNodeType=None, selectionOptions=selectionOptions, confirm=False, executorNodeId=None, isRoot=False)
+        display.display_menu(menuNode, 0)
+
+        mockLcd.reset_mock()
+        display.display_menu(menuNode, 1)
+
+        # both changes go in a single I2C transaction
+        self.assertEqual(mockLcd.return_value._i2c.writeBlock.call_count, 1)
+        self.assertEqual(sent_bytes(mockLcd), set_cursor(0, 0)+b' '+set_cursor(0, 1)+b'>')
+        mockLcd.return_value.clearScreen.assert_not_called()
+
+    @patch('menu.display.sparkfunlcd.QwiicSerlcd')
+    def test_display_output_blanks_unused_rows(self, mockLcd):
+
+        display = Sparkfun4x20LCDDisplay(4, 20, 'ascii')
+        display.display_output(None, bytearray("0123456789012345678901234567890123456789", 'ascii'))
+
+        mockLcd.reset_mock()
+        display.display_output(None, bytearray("0123Hello", 'ascii'))
+
+        self.assertEqual(sent_bytes(mockLcd), set_cursor(4, 0)+b'Hello           '+set_cursor(0, 1)+b' '*20)
+
+    @patch('menu.display.sparkfunlcd.QwiicSerlcd')
+    def test_display_output_not_in_lcd_encoding(self, mockLcd):
+
+        display = Sparkfun4x20LCDDisplay(4, 20, 'ascii')
+        display.display_output(None, "Temp: 45.2\u00b0C\n".encode('utf-8'))
+
+        self.assertEqual(sent_bytes(mockLcd)[:2+12], set_cursor(0, 0)+b'Temp: 45.2??')
+
+    @patch('menu.display.sparkfunlcd.QwiicSerlcd')
+    def test_display_output_without_i2c_driver(self, mockLcd):
+
+        del mockLcd.return_value._i2c
+        display = Sparkfun4x20LCDDisplay(4, 20, 'ascii')
+        display.display_output(None, bytearray("Hello", 'ascii'))
+
+        self.assertEqual(mockLcd.return_value.specialCommand.call_args_list, [call(0x80 | offset) for offset in [0x00, 0x40, 0x14, 0x54]])
+        self.assertEqual(''.join(printCall.args[0] for printCall in mockLcd.return_value.print.call_args_list), 'Hello'+' '*75)
 
     @patch('menu.display.sparkfunlcd.QwiicSerlcd')
     def test_display_menu_no_selection_options(self, mockLcd):
@@ -166,6 +362,64 @@ class TestSparkfun4x20LCDDisplay(unittest.TestCase):
 
         self.assertTrue(mockLcd.print.called_with('Hello World'))
 
+    @patch('menu.display.sparkfunlcd.time.sleep')
+    @patch('menu.display.sparkfunlcd.QwiicSerlcd')
+    def test_send_data_counts_retries(self, mockLcd, mockSleep):
+
+        instrumentation = MetricsInstrumentation()
+        display = Sparkfun4x20LCDDisplay(4, 20, 'ascii', instrumentation)
+        mockLcd.return_value._i2c.writeBlock.side_effect = [OSError("i2c error")] + [None]*4
+
+        display.display_output(None, bytearray("Hello World", 'ascii'))
+
+        self.assertEqual(instrumentation.counter_value('lcd_write_retries_total'), 1)
+        self.assertEqual(instrumentation.counter_value('lcd_reinit_total'), 1)
+
+
+    @patch('menu.display.sparkfunlcd.QwiicSerlcd')
+    def test_writer_thread_keeps_latest_frame(self, mockLcd):
+
+        instrumentation = MetricsInstrumentation()
+        display = Sparkfun4x20LCDDisplay(4, 20, 'ascii', instrumentation, writerThread=True)
+        selectionOptions = [SelectionOption(id='id'+str(pos), displayName="option"+str(pos)) for pos in range(1, 4)]
+        menuNode = MenuNode(id='', menuNodeType=None, selectionOptions=selectionOptions, confirm=False, executorNodeId=None, isRoot=False)
+
+        # hold the bus while more frames are handed to the display
+        writing = threading.Event()
+        release = threading.Event()
+        def write_block(*args):
+            writing.set()
+            release.wait(5)
+        mockLcd.return_value._i2c.writeBlock.side_effect = write_block
+
+        display.display_menu(menuNode, 0)
+        self.assertTrue(writing.wait(5))
+        display.display_menu(menuNode, 1)
+        display.display_menu(menuNode, 2)
+        release.set()
+        self.assertTrue(display.flush(5))
+
+        # the frame with the cursor on the second option was never written
+        self.assertEqual(instrumentation.counter_value('lcd_frames_dropped_total'), 1)
+        self.assertTrue(sent_bytes(mockLcd).endswith(set_cursor(0, 0)+b' '+set_cursor(0, 2)+b'>'))
+        display.cleanup()
+
+    @patch.object(Sparkfun4x20LCDDisplay, 'RECONNECT_DELAY', 0.01)
+    @patch('menu.display.sparkfunlcd.QwiicSerlcd')
+    def test_writer_thread_reconnects(self, mockLcd):
+
+        instrumentation = MetricsInstrumentation()
+        display = Sparkfun4x20LCDDisplay(4, 20, 'ascii', instrumentation, writerThread=True)
+        mockLcd.return_value._i2c.writeBlock.side_effect = [OSError("i2c error"), OSError("i2c error")] + [None]*10
+
+        display.display_output(None, bytearray("Hello World", 'ascii'))
+        self.assertTrue(display.flush(5))
+
+        self.assertEqual(instrumentation.counter_value('lcd_write_retries_total'), 2)
+        self.assertEqual(instrumentation.counter_value('lcd_reinit_total'), 2)
+        self.assertTrue(sent_bytes(mockLcd).endswith(set_cursor(0, 0)+b'Hello World'))
+        display.cleanup()
+
 
 if __name__ == '__main__':
     unittest.main()
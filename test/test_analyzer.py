@@ -0,0 +1,147 @@
+import unittest
+from unittest.mock import patch
+import io, json, os, shutil, tempfile
+from contextlib import redirect_stdout
+
+from menu.menus import MenuNode, Menus
+from menu.analyzer import MenuAnalyzer, ProblemCode, Severity, diff_menu_nodes, analyze_files, main
+
+SPECIAL_MENU_NODES = [
+    {"_id_": "CONFIRMATION", "type": "selection", "selectionOptions": [{"menuNodeId": "YES", "displayName": "Yes"}, {"menuNodeId": "NO", "displayName": "No"}]},
+    {"_id_": "YES", "type": "execution", "executorNodeId": "YES"},
+    {"_id_": "NO", "type": "execution", "executorNodeId": "NO"},
+    {"_id_": "OUTPUT", "type": "output"}
+]
+
+def menu_nodes(*nodes) -> dict:
+    menunodes = [MenuNode.as_menu_node(dict(node)) for node in SPECIAL_MENU_NODES+list(nodes)]
+    return {menunode.id: menunode for menunode in menunodes}
+
+def selection(menuNodeId: str, *targetIds) -> dict:
+    return {"_id_": menuNodeId, "type": "selection", "selectionOptions": [{"menuNodeId": targetId, "displayName": targetId.title()} for targetId in targetIds]}
+
+def execution(menuNodeId: str, executorNodeId: str = None) -> dict:
+    return {"_id_": menuNodeId, "type": "execution", "executorNodeId": executorNodeId or menuNodeId}
+
+def codes(problems) -> set:
+    return {(problem.code, problem.menu_node_id) for problem in problems}
+
+class TestMenuAnalyzer(unittest.TestCase):
+
+    def test_valid_menu(self):
+        analyzer = MenuAnalyzer(Menus("test/test_input_menunode_files/menunodes_valid_init.json").menu_nodes)
+        self.assertEqual(analyzer.problems, [])
+
+    def test_reports_all_errors(self):
+        menunodes = menu_nodes(selection("ROOT", "RUN", "BADID", "NOEXEC"), execution("RUN", "MISSING"), {"_id_": "NOEXEC", "type": "execution"})
+        del menunodes["OUTPUT"]
+        analyzer = MenuAnalyzer(menunodes, executorIds=["YES", "NO"])
+
+        self.assertEqual(codes(analyzer.problems), {(ProblemCode.INVALID_SELECTION_OPTION, "ROOT"),
+                                                    (ProblemCode.UNKNOWN_EXECUTOR, "RUN"),
+                                                    (ProblemCode.MISSING_EXECUTOR_ID, "NOEXEC"),
+                                                    (ProblemCode.MISSING_SPECIAL_NODE, "OUTPUT")})
+        self.assertTrue(all(problem.severity == Severity.ERROR for problem in analyzer.problems))
+        self.assertIn("Selection Option must have valid menu node id BADID", [problem.message for problem in analyzer.problems])
+
+    def test_root_menu_node(self):
+        self.assertEqual(codes(MenuAnalyzer(menu_nodes(selection("ROOT"))).problems), {(ProblemCode.ROOT_WITHOUT_OPTIONS, "ROOT"), (ProblemCode.DEAD_END, "ROOT")})
+        self.assertEqual(codes(MenuAnalyzer(menu_nodes(selection("TOP", "YES"))).errors), {(ProblemCode.MISSING_ROOT, "ROOT")})
+
+    def test_dynamic_options(self):
+        menunodes = menu_nodes(selection("ROOT", "PICK"),
+                               {"_id_": "PICK", "type": "selection", "optionsProvider": {"executorNodeId": "LIST", "targetMenuNodeId": "GONE"}})
+        self.assertEqual(codes(MenuAnalyzer(menunodes, executorIds=["YES", "NO"]).errors),
+                         {(ProblemCode.INVALID_OPTIONS_TARGET, "PICK"), (ProblemCode.UNKNOWN_EXECUTOR, "PICK")})
+
+    def test_unreachable_dead_ends_and_cycles(self):
+        menunodes = menu_nodes(selection("ROOT", "RUN", "LOOP1", "EMPTY", "SHOW"),
+                               execution("RUN"),
+                               selection("LOOP1", "LOOP2"), selection("LOOP2", "LOOP1", "OUTPUT"),
+                               selection("EMPTY"),
+                               selection("SHOW", "SHOW"),
+                               selection("ORPHAN", "RUN"))
+        analyzer = MenuAnalyzer(menunodes)
+
+        self.assertEqual(analyzer.errors, [])
+        self.assertEqual(codes(analyzer.problems), {(ProblemCode.CYCLE_WITHOUT_EXIT, "LOOP1"),
+                                                    (ProblemCode.DEAD_END, "EMPTY"),
+                                                    (ProblemCode.CYCLE_WITHOUT_EXIT, "SHOW"),
+                                                    (ProblemCode.UNREACHABLE, "ORPHAN")})
+        cycleProblem = next(problem for problem in analyzer.problems if problem.menu_node_id == "LOOP1")
+        self.assertEqual(str(cycleProblem), "warning cycle-without-exit [LOOP1] Selection cycle without an exit: LOOP1, LOOP2")
+
+    def test_deep_menu(self):
+        chain = [selection("N"+str(depth), "N"+str(depth+1)) for depth in range(5000)] + [selection("N5000", "N0")]
+        analyzer = MenuAnalyzer(menu_nodes(selection("ROOT", "N0", "RUN"), execution("RUN"), *chain))
+        self.assertEqual(codes(analyzer.problems), {(ProblemCode.CYCLE_WITHOUT_EXIT, "N0")})
+
+    def test_update_rechecks_changed_menu_nodes(self):
+        analyzer = MenuAnalyzer(menu_nodes(selection("ROOT", "RUN", "SUB"), execution("RUN"), selection("SUB", "LATER")))
+        self.assertEqual(codes(analyzer.problems), {(ProblemCode.INVALID_SELECTION_OPTION, "SUB"), (ProblemCode.DEAD_END, "SUB")})
+
+        # adding the missing target fixes the option that points at it
+        problems = analyzer.update({"LATER": MenuNode.as_menu_node(execution("LATER"))})
+        self.assertEqual(problems, [])
+
+        problems = analyzer.update({"RUN": None})
+        self.assertEqual(codes(problems), {(ProblemCode.INVALID_SELECTION_OPTION, "ROOT")})
+
+    def test_update_without_new_edges_skips_graph_checks(self):
+        analyzer = MenuAnalyzer(menu_nodes(selection("ROOT", "RUN"), execution("RUN")))
+        renamed = MenuNode.as_menu_node({"_id_": "ROOT", "type": "selection", "selectionOptions": [{"menuNodeId": "RUN", "displayName": "Go"}]})
+
+        with patch.object(analyzer, '_check_graph') as mockCheckGraph:
+            analyzer.update({"ROOT": renamed})
+            mockCheckGraph.assert_not_called()
+
+            analyzer.update({"ROOT": MenuNode.as_menu_node(selection("ROOT", "RUN", "YES"))})
+            mockCheckGraph.assert_called_once()
+
+    def test_update_executor_ids(self):
+        analyzer = MenuAnalyzer(menu_nodes(selection("ROOT", "RUN"), execution("RUN")), executorIds=["YES", "NO", "RUN"])
+        self.assertEqual(codes(analyzer.update({}, executorIds=["YES", "NO"])), {(ProblemCode.UNKNOWN_EXECUTOR, "RUN")})
+
+    def test_diff_menu_nodes(self):
+        previous = menu_nodes(selection("ROOT", "RUN", "OLD"), execution("RUN"), execution("OLD"))
+        current = menu_nodes(selection("ROOT", "RUN", "NEW"), execution("RUN"), execution("NEW"))
+        changed = diff_menu_nodes(previous, current)
+        self.assertEqual(sorted(changed.keys()), ["NEW", "OLD", "ROOT"])
+        self.assertIsNone(changed["OLD"])
+
+        analyzer = MenuAnalyzer(previous)
+        self.assertEqual(analyzer.update(changed), [])
+        self.assertEqual(diff_menu_nodes(analyzer.menu_nodes, current), {})
+
+
+class TestAnalyzerCommandLine(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpDir)
+
+    def test_duplicate_menu_nodes(self):
+        problems = analyze_files("test/test_input_menunode_files/menunodes_multiple_root.json")
+        self.assertIn((ProblemCode.DUPLICATE_MENU_NODE, "ROOT"), codes(problems))
+
+    def test_main(self):
+        menuNodesFilename = os.path.join(self._tmpDir, "menunodes.json")
+        with open(menuNodesFilename, "w") as menunodes_file:
+            json.dump(SPECIAL_MENU_NODES+[selection("ROOT", "RUN"), execution("RUN", "ER5KI5")], menunodes_file)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(main([menuNodesFilename, "--executors", "test/test_input_executor_files/executors_valid_init.json"]), 0)
+        self.assertEqual(output.getvalue(), "0 errors, 0 warnings\n")
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(main(["test/test_input_menunode_files/menunodes_search.json", "--executors", "test/test_input_executor_files/executors_valid_init.json"]), 1)
+        self.assertIn("error unknown-executor [SCAN] Executor node not found: SCAN", output.getvalue())
+        self.assertIn("5 errors, 1 warnings", output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import asyncio
+from pathlib import Path
+
+from menu.asyncmenusystem import AsyncMenuSystem
+from menu.action.asyncmenuaction import AsyncQueueMenuAction
+from menu.action.menuaction import MenuAction
+from menu.display.asyncdisplay import AsyncDisplay
+from menu.menus import Menus, Navigator, Executor, MenuNode, MenuDestination
+
+class RecordingAsyncDisplay(AsyncDisplay):
+
+    def __init__(self):
+        self.frames = []
+        self.frameEvent = asyncio.Event()
+
+    async def display_menu(self, menunode: MenuNode, cursorPos: int):
+        self.frames.append((menunode.id, cursorPos))
+        self.frameEvent.set()
+
+    async def display_output(self, menunode: MenuNode, output: str):
+        self.frames.append((menunode.id, output))
+        self.frameEvent.set()
+
+    async def clear(self):
+        pass
+
+    async def cleanup(self):
+        pass
+
+    async def wait_for(self, frame):
+        while frame not in self.frames:
+            self.frameEvent.clear()
+            await asyncio.wait_for(self.frameEvent.wait(), 5)
+
+
+class TestAsyncMenuSystem(unittest.TestCase):
+
+    def setUp(self):
+        self._menus = Menus("test/test_input_menunode_files/menunodes_valid_init.json")
+        self._executor = Executor("test/test_input_executor_files/executors_valid_init.json", Path("test/test_input_scripts"))
+        self._navigator = Navigator(self._menus)
+        self._display = RecordingAsyncDisplay()
+        self._menuAction = AsyncQueueMenuAction()
+        self._menuSystem = AsyncMenuSystem(self._menus, self._executor, self._navigator, self._display, self._menuAction)
+
+    def test_navigate_and_quit(self):
+
+        async def scenario():
+            runTask = asyncio.create_task(self._menuSystem.run())
+            await self._display.wait_for(("ROOT", 0))
+            self._menuAction.put(MenuAction.Action.DOWN)
+            await self._display.wait_for(("ROOT", 1))
+            self._menuAction.put(MenuAction.Action.QUIT)
+            await asyncio.wait_for(runTask, 5)
+
+        asyncio.run(scenario())
+        self.assertEqual(self._display.frames, [("ROOT", 0), ("ROOT", 1)])
+
+    def test_stop_is_prompt(self):
+
+        async def scenario():
+            runTask = asyncio.create_task(self._menuSystem.run())
+            await self._display.wait_for(("ROOT", 0))
+            self._menuSystem.stop()
+            await asyncio.wait_for(runTask, 1)
+
+        asyncio.run(scenario())
+
+    def test_execute_method(self):
+
+        async def slow_method(**kwargs):
+            await asyncio.sleep(0.05)
+            return Executor.ExecutionResult("slow output", 0, MenuDestination.POST_EXECUTE_OUTPUT)
+        slow_method.__name__ = "handle_confirmation_no"
+
+        async def scenario():
+            self._executor.register_method(slow_method)
+            runTask = asyncio.create_task(self._menuSystem.run())
+            await self._display.wait_for(("ROOT", 0))
+            # "NO" is the second option of the confirmation menu
+            self._navigator.navigate_to_confirmation_menu()
+            self._menuAction.put(MenuAction.Action.DOWN)
+            self._menuAction.put(MenuAction.Action.SELECT)
+            await self._display.wait_for(("OUTPUT", AsyncMenuSystem.RUNNING_OUTPUT))
+            await self._display.wait_for(("OUTPUT", "slow output"))
+            self._menuSystem.stop()
+            await asyncio.wait_for(runTask, 5)
+
+        asyncio.run(scenario())
+
+    def test_home_cancels_execution(self):
+
+        cancelled = []
+
+        async def slow_method(**kwargs):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        slow_method.__name__ = "handle_confirmation_no"
+
+        async def scenario():
+            self._executor.register_method(slow_method)
+            runTask = asyncio.create_task(self._menuSystem.run())
+            await self._display.wait_for(("ROOT", 0))
+            self._navigator.navigate_to_confirmation_menu()
+            self._menuAction.put(MenuAction.Action.DOWN)
+            self._menuAction.put(MenuAction.Action.SELECT)
+            await self._display.wait_for(("OUTPUT", AsyncMenuSystem.RUNNING_OUTPUT))
+            self._menuAction.put(MenuAction.Action.HOME)
+            self._menuAction.put(MenuAction.Action.QUIT)
+            await asyncio.wait_for(runTask, 5)
+
+        asyncio.run(scenario())
+        self.assertEqual(cancelled, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import io, os, tempfile
+from contextlib import redirect_stdout
+
+from benchmark.generators import wide_menu_nodes, deep_menu_nodes, random_dag_menu_nodes, write_json
+from benchmark.harness import random_walk
+from benchmark.metrics import BenchmarkResult, percentile, retained_memory, compare_to_baseline
+from benchmark.run import BenchmarkContext, run_benchmarks, menus_bytes_per_node
+from benchmark import replay
+from menu.action.replaymenuaction import ActionRecord, write_action_log
+from menu.action.menuaction import MenuAction
+from menu.menus import Menus, MenuNodeType
+
+class TestGenerators(unittest.TestCase):
+
+    def load(self, menunodes) -> Menus:
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "menunodes.json")
+            write_json(menunodes, filename)
+            return Menus(filename)
+
+    def test_wide(self):
+        menus = self.load(wide_menu_nodes(101))
+        self.assertEqual(len(menus.get_root_menu_node().selection_options), 100)
+
+    def test_deep(self):
+        menus = self.load(deep_menu_nodes(20))
+        menunode = menus.get_root_menu_node()
+        depth = 1
+        while menunode.selection_options[0].id.startswith("S"):
+            menunode = menus.get_menu_node(menunode.selection_options[0].id)
+            depth += 1
+        self.assertEqual(depth, 10)
+
+    def test_random_dag(self):
+        menunodes = random_dag_menu_nodes(1000, maxOptions=5, seed=3)
+        self.assertEqual(menunodes, random_dag_menu_nodes(1000, maxOptions=5, seed=3))
+        menus = self.load(menunodes)
+        for menunode in menus.menu_nodes.values():
+            if menunode.type == MenuNodeType.SELECTION:
+                self.assertTrue(1 <= len(menunode.selection_options) <= 5)
+
+    def test_random_walk(self):
+        menus = self.load(random_dag_menu_nodes(200))
+        actions = random_walk(menus, 500)
+        self.assertEqual(len(actions), 500)
+        self.assertNotIn(MenuAction.Action.QUIT, actions)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_percentile(self):
+        samples = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(samples, 50), 50.0)
+        self.assertEqual(percentile(samples, 99), 99.0)
+        self.assertEqual(percentile(samples, 100), 100.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_compare_to_baseline(self):
+        baseline = {'fast': BenchmarkResult('fast', [0.001]*10, 1000).as_dict()}
+        self.assertEqual(compare_to_baseline([BenchmarkResult('fast', [0.001]*10, 1000)], baseline), [])
+        regressions = compare_to_baseline([BenchmarkResult('fast', [0.002]*10, 2000), BenchmarkResult('new', [1.0], None)], baseline)
+        self.assertEqual(len(regressions), 3)
+
+    def test_retained_memory(self):
+        self.assertGreaterEqual(retained_memory(lambda: bytearray(100000)), 100000)
+        self.assertLess(retained_memory(lambda: len(bytearray(100000))), 100000)
+
+    def test_menus_bytes_per_node(self):
+        with tempfile.TemporaryDirectory() as directory:
+            context = BenchmarkContext(directory, 'wide', 100, 0)
+            self.assertGreater(menus_bytes_per_node(context), 0)
+
+    def test_run_benchmarks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            context = BenchmarkContext(directory, 'dag', 100, 0)
+            results = run_benchmarks(context, 20, measureMemory=False)
+        self.assertEqual([result.name for result in results],
+                         ['menus_load', 'scroll_down', 'navigate', 'page_down', 'jump_to', 'search', 'render_selection', 'render_output', 'execute', 'execute_script', 'execute_shell_pool', 'action', 'keypress'])
+        for result in results:
+            self.assertTrue(result.samples)
+
+
+class TestReplay(unittest.TestCase):
+
+    def test_main(self):
+        actions = [MenuAction.Action.DOWN, MenuAction.Action.DOWN, MenuAction.Action.UP, MenuAction.Action.HOME]
+        with tempfile.TemporaryDirectory() as directory:
+            logFilename = os.path.join(directory, "session.log")
+            outputFilename = os.path.join(directory, "replay.log")
+            write_action_log([ActionRecord(position*0.01, action, 0.001) for position, action in enumerate(actions)], logFilename)
+            arguments = [logFilename, "test/test_input_menunode_files/menunodes_search.json", "test/test_input_executor_files/executors_valid_init.json"]
+
+            output = io.StringIO()
+            with redirect_stdout(output):
+                self.assertEqual(replay.main(arguments+["--output", outputFilename]), 0)
+            self.assertIn("recorded", output.getvalue())
+            self.assertIn("replayed", output.getvalue())
+            self.assertTrue(os.path.exists(outputFilename))
+
+            with redirect_stdout(io.StringIO()) as output:
+                self.assertEqual(replay.main(arguments+["--fast", "--max-p95", "0"]), 1)
+            self.assertIn("REGRESSION", output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import io, json, os, shutil, tempfile
+from contextlib import redirect_stdout
+
+from menu.analyzer import ProblemCode, Severity
+from menu.compiler import compile_menus, expand_source, main
+from menu.snapshot import load_menus, SnapshotMenuNodes
+
+COMPILER_FILES = "test/test_input_compiler_files/"
+MENU_NODES_SOURCE = COMPILER_FILES+"menunodes.json"
+EXECUTORS_SOURCE = COMPILER_FILES+"executors.json"
+SCRIPTS = "test/test_input_scripts"
+
+def codes(problems) -> set:
+    return {(problem.code, problem.menu_node_id) for problem in problems}
+
+class TestMenuCompiler(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpDir = tempfile.mkdtemp()
+        self._outputDir = os.path.join(self._tmpDir, "build")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpDir)
+
+    def write_source(self, filename: str, source) -> str:
+        filename = os.path.join(self._tmpDir, filename)
+        with open(filename, "w") as source_file:
+            json.dump(source, source_file)
+        return filename
+
+    def test_expand_includes_and_templates(self):
+        nodes = {node['_id_']: node for node in expand_source(MENU_NODES_SOURCE)}
+
+        self.assertIn("CONFIRMATION", nodes)
+        self.assertEqual(sorted(nodeId for nodeId in nodes if nodeId.startswith("NGINX_")), ["NGINX_MENU", "NGINX_RESTART", "NGINX_STATUS"])
+        # references to nodes of the template are prefixed, others are left alone
+        self.assertEqual([(option['menuNodeId'], option['displayName']) for option in nodes["SSH_MENU"]['selectionOptions']],
+                         [("SSH_STATUS", "ssh status"), ("SSH_RESTART", "Restart ssh"), ("ROOT", "Back")])
+        self.assertEqual(nodes["SSH_RESTART"]['executorNodeId'], "ECHO")
+
+    def test_expand_errors(self):
+        with self.assertRaises(Exception):
+            expand_source(COMPILER_FILES+"include_cycle.json")
+        with self.assertRaises(Exception):
+            expand_source(COMPILER_FILES+"missing_parameter.json")
+        with self.assertRaises(Exception):
+            expand_source(self.write_source("unknown.json", [{"template": "NOPE"}]))
+        with self.assertRaises(Exception):
+            expand_source(self.write_source("recursive.json", {"templates": {"T": [{"template": "T"}]}, "nodes": [{"template": "T"}]}))
+
+    def test_compile(self):
+        problems = compile_menus(MENU_NODES_SOURCE, EXECUTORS_SOURCE, self._outputDir, SCRIPTS, numColumns=14)
+        self.assertEqual(problems, [])
+
+        with open(os.path.join(self._outputDir, "menunodes.json")) as menunodes_file:
+            contents = menunodes_file.read()
+        self.assertEqual(contents, json.dumps(json.loads(contents), separators=(',', ':')))
+
+        menus = load_menus(os.path.join(self._outputDir, "menunodes.json"), os.path.join(self._outputDir, "menunodes.snapshot"), recompile=False)
+        self.assertIsInstance(menus.menu_nodes, SnapshotMenuNodes)
+        self.assertEqual(menus.menu_nodes.row_geometry, (14, 'ascii'))
+        self.assertEqual(menus.get_menu_node("NGINX_MENU").selection_options.rows, [b'1: nginx stat', b'2: Restart ng', b'3: Back      '])
+
+        # the index comes from the snapshot, nothing needs to be walked
+        self.assertEqual(len(menus.index._walkQueue), 0)
+        self.assertEqual(menus.index.path_to("SSH_RESTART"), [("ROOT", 1), ("SSH_MENU", 1)])
+        self.assertEqual([option.id for option in menus.index.search("restart")], ["NGINX_RESTART", "SSH_RESTART"])
+
+    def test_compile_reports_problems(self):
+        executors = self.write_source("executors.json", [{"_id_": "YES", "type": "method", "name": "yes"},
+                                                         {"_id_": "YES", "type": "method", "name": "yes"},
+                                                         {"_id_": "ECHO", "type": "script", "name": "missing.sh"}])
+        problems = compile_menus(MENU_NODES_SOURCE, executors, self._outputDir, SCRIPTS)
+
+        self.assertEqual(codes(problems), {(ProblemCode.DUPLICATE_EXECUTOR, "YES"),
+                                           (ProblemCode.UNKNOWN_EXECUTOR, "NO"),
+                                           (ProblemCode.MISSING_SCRIPT, "ECHO")})
+        self.assertFalse(os.path.exists(self._outputDir))
+
+    def test_compile_unencodable_display_name(self):
+        menunodes = self.write_source("menunodes.json", {"nodes": [{"include": os.path.abspath(COMPILER_FILES+"common.json")},
+                                                                   {"_id_": "ROOT", "type": "selection", "selectionOptions": [{"menuNodeId": "RUN", "displayName": "Café"}]},
+                                                                   {"_id_": "RUN", "type": "execution", "executorNodeId": "ECHO"}]})
+        self.assertEqual(codes(compile_menus(menunodes, EXECUTORS_SOURCE, self._outputDir, numColumns=20)), {(ProblemCode.INVALID_FILE, "ROOT")})
+        self.assertEqual(compile_menus(menunodes, EXECUTORS_SOURCE, self._outputDir, numColumns=20, characterEncoding='latin-1'), [])
+
+    def test_compile_generated_options(self):
+        os.makedirs(self._outputDir)
+        open(os.path.join(self._outputDir, "menunodes.snapshot"), "w").close()
+
+        problems = compile_menus("test/test_input_menunode_files/menunodes_dynamic.json", "test/test_input_executor_files/executors_dynamic.json", self._outputDir)
+        self.assertEqual([problem for problem in problems if problem.severity == Severity.ERROR], [])
+        self.assertTrue(os.path.exists(os.path.join(self._outputDir, "menunodes.json")))
+        self.assertFalse(os.path.exists(os.path.join(self._outputDir, "menunodes.snapshot")))
+
+    def test_main(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(main([MENU_NODES_SOURCE, EXECUTORS_SOURCE, self._outputDir, "--scripts", SCRIPTS, "--columns", "20"]), 0)
+        self.assertEqual(output.getvalue(), "0 errors, 0 warnings\n")
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(main([COMPILER_FILES+"include_cycle.json", EXECUTORS_SOURCE, self._outputDir]), 1)
+        self.assertIn("error invalid-file", output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
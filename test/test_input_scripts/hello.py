@@ -0,0 +1,2 @@
+import sys
+print("hello " + sys.argv[0].rsplit("/", 1)[-1])
@@ -0,0 +1,3 @@
+#!/bin/sh
+for i in $(seq 1 50); do echo "line $i"; done
+printf "no newline"
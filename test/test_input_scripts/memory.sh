@@ -0,0 +1,3 @@
+#!/bin/sh
+data=$(head -c 33554432 /dev/zero | tr '\000' x)
+echo "allocated ${#data}"
@@ -0,0 +1,2 @@
+import sys
+print("colorsys" in sys.modules)
@@ -0,0 +1 @@
+raise ValueError("broken script")
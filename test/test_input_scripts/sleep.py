@@ -0,0 +1,3 @@
+import time
+time.sleep(5)
+print("too late")
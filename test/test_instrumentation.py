@@ -0,0 +1,135 @@
+import unittest
+import json, os, tempfile
+from unittest.mock import Mock
+from pathlib import Path
+
+from menu.instrumentation import Histogram, MetricsInstrumentation, InstrumentedQueue, NULL_INSTRUMENTATION
+from menu.menusystem import MenuSystem
+from menu.menus import MenuNode, MenuNodeType, Executor
+from menu.action.menuaction import MenuAction
+
+class TestHistogram(unittest.TestCase):
+
+    def test_observe(self):
+        histogram = Histogram([0.001, 0.01, 0.1])
+        for value in [0.0005, 0.005, 0.005, 0.05, 5.0]:
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 5)
+        self.assertAlmostEqual(histogram.sum, 5.0605)
+        self.assertEqual(histogram.quantile(0.5), 0.01)
+        self.assertEqual(histogram.quantile(0.99), float('inf'))
+        self.assertEqual(histogram.as_dict()['buckets'], {'0.001': 1, '0.01': 3, '0.1': 4, '+Inf': 5})
+
+    def test_empty(self):
+        self.assertIsNone(Histogram().quantile(0.5))
+
+
+class TestMetricsInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self._instrumentation = MetricsInstrumentation([0.1, 1.0])
+        self._instrumentation.count('lcd_reinit_total')
+        self._instrumentation.count('lcd_reinit_total', 2)
+        self._instrumentation.gauge('menu_action_queue_depth', 4)
+        self._instrumentation.observe('menu_display_seconds', 0.05)
+
+    def test_null_instrumentation(self):
+        self.assertFalse(NULL_INSTRUMENTATION.enabled)
+        NULL_INSTRUMENTATION.count('lcd_reinit_total')
+        NULL_INSTRUMENTATION.observe('menu_display_seconds', 0.05)
+
+    def test_snapshot(self):
+        snapshot = self._instrumentation.snapshot()
+        self.assertEqual(snapshot['counters'], {'lcd_reinit_total': 3})
+        self.assertEqual(snapshot['gauges'], {'menu_action_queue_depth': 4})
+        self.assertEqual(snapshot['histograms']['menu_display_seconds']['count'], 1)
+
+    def test_to_prometheus(self):
+        expected = "\n".join([
+            "# TYPE lcd_reinit_total counter",
+            "lcd_reinit_total 3",
+            "# TYPE menu_action_queue_depth gauge",
+            "menu_action_queue_depth 4.0",
+            "# TYPE menu_display_seconds histogram",
+            'menu_display_seconds_bucket{le="0.1"} 1',
+            'menu_display_seconds_bucket{le="1.0"} 1',
+            'menu_display_seconds_bucket{le="+Inf"} 1',
+            "menu_display_seconds_sum 0.05",
+            "menu_display_seconds_count 1",
+        ])+"\n"
+        self.assertEqual(self._instrumentation.to_prometheus(), expected)
+
+    def test_dump(self):
+        with tempfile.TemporaryDirectory() as directory:
+            jsonFilename = os.path.join(directory, "metrics.json")
+            promFilename = os.path.join(directory, "metrics.prom")
+            self._instrumentation.dump(jsonFilename)
+            self._instrumentation.dump(promFilename)
+            with open(jsonFilename) as jsonFile:
+                self.assertEqual(json.load(jsonFile)['counters'], {'lcd_reinit_total': 3})
+            with open(promFilename) as promFile:
+                self.assertIn("lcd_reinit_total 3", promFile.read())
+
+    def test_periodic_dump(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "metrics.prom")
+            self._instrumentation.start_dump(filename, interval=60)
+            self._instrumentation.stop_dump()
+            # a final dump is written when stopping
+            self.assertTrue(os.path.exists(filename))
+
+
+class TestInstrumentedQueue(unittest.TestCase):
+
+    def test_records_enqueue_time(self):
+        instrumentation = MetricsInstrumentation()
+        actionQueue = InstrumentedQueue(instrumentation)
+        actionQueue.put(MenuAction.Action.UP)
+        actionQueue.put(MenuAction.Action.DOWN)
+        self.assertEqual(actionQueue.get(), MenuAction.Action.UP)
+        self.assertIsNotNone(actionQueue.last_enqueue_time)
+        self.assertEqual(actionQueue.get(), MenuAction.Action.DOWN)
+        self.assertEqual(instrumentation.histogram('menu_action_queue_wait_seconds').count, 2)
+
+
+class TestMenuSystemInstrumentation(unittest.TestCase):
+
+    def test_run_records_latency(self):
+
+        menuNode = MenuNode(id="test-id", menuNodeType=MenuNodeType.SELECTION, selectionOptions=None,confirm=False,executorNodeId=None,isRoot=False)
+
+        instrumentation = MetricsInstrumentation()
+        mockNavigator=Mock(current_menu_node=menuNode, cursor_position=0)
+        actionQueue = InstrumentedQueue(instrumentation)
+
+        menuSystem = MenuSystem(menus=Mock(),executor=Mock(),navigator=mockNavigator,display=Mock(),actionQueue=actionQueue,menuAction=Mock(),
+                                instrumentation=instrumentation)
+
+        for action in [MenuAction.Action.DOWN, MenuAction.Action.DOWN, MenuAction.Action.UP, MenuAction.Action.QUIT]:
+            actionQueue.put(action)
+
+        menuSystem.run()
+
+        self.assertEqual(instrumentation.counter_value('menu_actions_total'), 3)
+        # the three scrolls are one cursor move
+        self.assertEqual(instrumentation.histogram('menu_navigation_seconds').count, 1)
+        # one frame for the whole batch, every action taken off the queue is part of it
+        self.assertEqual(instrumentation.histogram('menu_display_seconds').count, 1)
+        self.assertEqual(instrumentation.histogram('menu_action_latency_seconds').count, 4)
+
+    def test_executor_records_durations(self):
+
+        instrumentation = MetricsInstrumentation()
+        executor = Executor("test/test_input_executor_files/executors_async.json", Path("test/test_input_scripts"), instrumentation=instrumentation)
+
+        executor.execute("ECHO")
+        executor.execute("FAIL")
+        executor.execute("SLEEP")
+
+        self.assertEqual(instrumentation.histogram('executor_script_seconds').count, 3)
+        self.assertEqual(instrumentation.counter_value('executor_failures_total'), 2)
+        self.assertEqual(instrumentation.counter_value('executor_timeouts_total'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
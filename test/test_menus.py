@@ -1,12 +1,14 @@
 import unittest
 from unittest.mock import patch
+import asyncio, json, os, tempfile, threading, time
 
 from pathlib import Path
 
 from menu.menus import SelectionOption
 from menu.menus import MenuDestination, ExecutorNode, ExecutorNodeType
 from menu.menus import Menus, MenuNode, MenuNodeType
-from menu.menus import Navigator, Executor
+from menu.menus import Navigator, Executor, StreamingOutput, CachePolicy, ResultCache, DynamicSelectionOptions
+from menu.shellpool import ShellPool
 
 class TestSelectionOption(unittest.TestCase):
 
@@ -39,6 +41,19 @@ class TestExecutorNode(unittest.TestCase):
         self.assertEqual(executorNode.name, testName)
         self.assertEqual(executorNode.executor_type, ExecutorNodeType(testType))
         self.assertEqual(executorNode.destination, MenuDestination(testDestinationOverride))
+        self.assertIsNone(executorNode.cache_policy)
+
+    def test_as_executor_node_cache_policy(self):
+        inputDict = {'_id_': '12345', 'type': 'script', 'name': 'status.sh', 'cache': {'ttl': 30, 'maxBytes': 1024}}
+
+        executorNode = ExecutorNode.as_executor_node(inputDict)
+        self.assertEqual(executorNode.cache_policy.ttl, 30)
+        self.assertEqual(executorNode.cache_policy.max_bytes, 1024)
+
+    def test_cache_policy_invalid_ttl(self):
+        with self.assertRaises(Exception) as ecm:
+            CachePolicy(ttl=0)
+        self.assertEqual(str(ecm.exception), "Cache policy ttl must be greater than zero")
 
 class TestMenuNode(unittest.TestCase):
 
@@ -76,6 +91,15 @@ class TestMenuNode(unittest.TestCase):
         self.assertTrue(menuNode.is_confirm)
         self.assertEqual(menuNode.type, MenuNodeType('selection'))
 
+    def test_compact_representation(self):
+        menus = Menus("test/test_input_menunode_files/menunodes_valid_init.json")
+        rootMenuNode = menus.get_root_menu_node()
+        selectionOption = rootMenuNode.selection_options[0]
+        self.assertFalse(hasattr(rootMenuNode, '__dict__'))
+        self.assertFalse(hasattr(selectionOption, '__dict__'))
+        # selection options share the id string of their target menu node
+        self.assertIs(selectionOption.id, menus.get_menu_node(selectionOption.id).id)
+
 class TestMenu(unittest.TestCase):
 
     def test_valid_menu_init(self):
@@ -164,6 +188,18 @@ class TestNavigator(unittest.TestCase):
         navigator.scroll_down()
         self.assertEqual(navigator.cursor_position, 1)
 
+    def test_scroll(self):
+
+        menus = Menus("test/test_input_menunode_files/menunodes_valid_init.json")
+        navigator = Navigator(menus)
+
+        navigator.scroll(5)
+        self.assertEqual(navigator.cursor_position, 1)
+        navigator.scroll(-1)
+        self.assertEqual(navigator.cursor_position, 0)
+        navigator.scroll(-3)
+        self.assertEqual(navigator.cursor_position, 0)
+
     def navigate_to_selected_option(self):
 
         menus = Menus("test/test_input_menunode_files/menunodes_valid_init.json")
@@ -209,6 +245,54 @@ class TestNavigator(unittest.TestCase):
         self.assertEqual(navigator.current_menu_node.id, "OUTPUT")
         self.assertEqual(navigator.current_menu_node.selection_options, None)
 
+    def test_remap_keeps_position(self):
+
+        menus = Menus("test/test_input_menunode_files/menunodes_valid_init.json")
+        navigator = Navigator(menus)
+        navigator.scroll_down()
+
+        reloadedMenus = Menus("test/test_input_menunode_files/menunodes_valid_init.json")
+        navigator.remap(reloadedMenus)
+
+        self.assertIs(navigator.current_menu_node, reloadedMenus.get_root_menu_node())
+        self.assertEqual(navigator.cursor_position, 1)
+
+    def test_remap_missing_node_goes_home(self):
+
+        menus = Menus("test/test_input_menunode_files/menunodes_valid_init.json")
+        navigator = Navigator(menus)
+        navigator.navigate_to_confirmation_menu()
+        del menus.menu_nodes["CONFIRMATION"]
+
+        navigator.remap(menus)
+
+        self.assertEqual(navigator.current_menu_node.id, "ROOT")
+        self.assertEqual(navigator.cursor_position, 0)
+
+
+    def test_page_up_down(self):
+
+        menus = Menus("test/test_input_menunode_files/menunodes_search.json")
+        navigator = Navigator(menus)
+        navigator.page_down(2)
+        self.assertEqual(navigator.cursor_position, 2)
+        navigator.page_down(2)
+        self.assertEqual(navigator.cursor_position, 2)
+        navigator.page_up(2)
+        self.assertEqual(navigator.cursor_position, 0)
+        navigator.bottom()
+        self.assertEqual(navigator.cursor_position, 2)
+        navigator.top()
+        self.assertEqual(navigator.cursor_position, 0)
+
+    def test_page_output_node(self):
+
+        menus = Menus("test/test_input_menunode_files/menunodes_valid_init.json")
+        navigator = Navigator(menus)
+        navigator.navigate_to_post_execute_output()
+        navigator.page_down(2)
+        navigator.bottom()
+        self.assertIsNone(navigator.cursor_position)
 
 class TestExecutor(unittest.TestCase):
 
@@ -224,6 +308,13 @@ class TestExecutor(unittest.TestCase):
         actualException = ecm.exception
         self.assertEqual(str(actualException), "Duplicates found")
 
+    def test_swap_executor_nodes(self):
+
+        executor = Executor("test/test_input_executor_files/executors_valid_init.json", Path("test-path"))
+        executorNodes = executor.load_executor_nodes("test/test_input_executor_files/executors_async.json")
+        executor.swap_executor_nodes(executorNodes)
+        self.assertIs(executor._executors, executorNodes)
+
     def test_execute_unsupported(self):
 
         executor = Executor("test/test_input_executor_files/executors_valid_init.json", Path("test-path"))
@@ -256,5 +347,629 @@ class TestExecutor(unittest.TestCase):
         self.assertEqual(executionResult.output, "test-output")
 
 
+class TestMenuIndex(unittest.TestCase):
+
+    def setUp(self):
+        self._menus = Menus("test/test_input_menunode_files/menunodes_search.json")
+        self._navigator = Navigator(self._menus)
+
+    def test_path_to(self):
+        index = self._menus.index
+        self.assertEqual(index.path_to("ROOT"), [])
+        # NET is reachable through SYS too but the path from the root is shorter
+        self.assertEqual(index.path_to("NET"), [("ROOT", 1)])
+        self.assertEqual(index.path_to("SCAN"), [("ROOT", 1), ("NET", 1), ("WIFI", 0)])
+        self.assertIsNone(index.path_to("ORPHAN"))
+        self.assertIsNone(index.path_to("MISSING"))
+
+    def test_index_built_on_load(self):
+        self.assertEqual(len(self._menus.index._walkQueue), 0)
+        self.assertIn("SCAN", self._menus.index._parents)
+
+    def test_path_walks_only_as_far_as_needed(self):
+        index = Menus.from_menu_nodes(self._menus.menu_nodes, "ROOT").index
+        index.path_to("SYS")
+        self.assertNotIn("SCAN", index._parents)
+
+    def test_search(self):
+        self.assertEqual([(option.display_name, option.id) for option in self._navigator.search("net")], [("Network", "NET")])
+        self.assertEqual([option.id for option in self._navigator.search("")], ["DISK", "HELLO", "IP", "NET", "SCAN", "SYS", "TEMP", "WIFI"])
+        self.assertEqual([option.id for option in self._navigator.search("", limit=2)], ["DISK", "HELLO"])
+        self.assertEqual(self._navigator.search("xyz"), [])
+        # options of menus that can't be reached aren't found
+        self.assertEqual(self._navigator.search("hello again"), [])
+
+    def test_jump_to_selection_menu(self):
+        self.assertTrue(self._navigator.jump_to("WIFI"))
+        self.assertEqual(self._navigator.current_menu_node.id, "WIFI")
+        self.assertEqual(self._navigator.cursor_position, 0)
+        self._navigator.navigate_to_last_selection_menu()
+        self.assertEqual(self._navigator.current_menu_node.id, "NET")
+
+    def test_jump_to_execution_node(self):
+        self.assertTrue(self._navigator.jump_to("TEMP"))
+        self.assertEqual(self._navigator.current_menu_node.id, "SYS")
+        self.assertEqual(self._navigator.cursor_position, 1)
+        self._navigator.navigate_to_selected_option()
+        self.assertEqual(self._navigator.current_menu_node.id, "TEMP")
+
+    def test_jump_to_unreachable(self):
+        self._navigator.scroll_down()
+        self.assertFalse(self._navigator.jump_to("ORPHAN"))
+        self.assertEqual(self._navigator.current_menu_node.id, "ROOT")
+        self.assertEqual(self._navigator.cursor_position, 1)
+
+    def test_index_from_menu_nodes(self):
+        menus = Menus.from_menu_nodes(self._menus.menu_nodes, "ROOT")
+        self.assertEqual(menus.index.path_to("IP"), [("ROOT", 1), ("NET", 0)])
+
+
+class TestDynamicSelectionOptions(unittest.TestCase):
+
+    NETWORKS = ["home", "office", "cafe", "library", "airport"]
+
+    def setUp(self):
+        self._menus = Menus("test/test_input_menunode_files/menunodes_dynamic.json")
+        self._executor = Executor("test/test_input_executor_files/executors_dynamic.json", Path("test/test_input_scripts"))
+        self._calls = []
+        def list_networks(offset, limit):
+            self._calls.append((offset, limit))
+            return [[network, network.title()] for network in self.NETWORKS[offset:offset+limit]]
+        self._executor.register_method(list_networks)
+        self._menus.set_options_provider(self._executor.get_options)
+        self._navigator = Navigator(self._menus)
+
+    def test_as_menu_node(self):
+        menuNode = self._menus.get_menu_node("NETWORKS")
+        self.assertTrue(menuNode.is_dynamic)
+        self.assertEqual(menuNode.selection_options.executor_id, "LISTNETWORKS")
+        self.assertEqual(menuNode.selection_options.target_id, "JOIN")
+        self.assertFalse(self._menus.get_root_menu_node().is_dynamic)
+
+    def test_as_menu_node_static_and_dynamic(self):
+        inputDict = {'_id_': 'X', 'type': 'selection', 'selectionOptions': [{'menuNodeId': 'Y', 'displayName': 'Y'}],
+                     'optionsProvider': {'executorNodeId': 'P', 'targetMenuNodeId': 'Y'}}
+        with self.assertRaises(Exception) as ecm:
+            MenuNode.as_menu_node(inputDict)
+        self.assertEqual(str(ecm.exception), "Menu node can't have both selection options and an options provider")
+
+    def test_invalid_target(self):
+        with open("test/test_input_menunode_files/menunodes_dynamic.json") as menunodes_file:
+            menunodes = json.load(menunodes_file)
+        menunodes[5]['optionsProvider']['targetMenuNodeId'] = "BADID"
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "menunodes.json")
+            with open(filename, "w") as menunodes_file:
+                json.dump(menunodes, menunodes_file)
+            with self.assertRaises(Exception) as ecm:
+                Menus(filename)
+        self.assertEqual(str(ecm.exception), "Options provider must have valid target menu node id BADID")
+
+    def test_options_fetched_on_entry_a_page_at_a_time(self):
+        self.assertEqual(self._calls, [])
+        self._navigator.navigate_to_selected_option()
+        self.assertEqual(self._navigator.cursor_position, 0)
+        self.assertEqual(self._calls, [(0, 2)])
+
+        for _ in range(10):
+            self._navigator.scroll_down()
+        self.assertEqual(self._navigator.cursor_position, 4)
+        self.assertEqual(self._calls, [(0, 2), (2, 2), (4, 2)])
+
+        selectionOptions = self._navigator.current_menu_node.selection_options
+        self.assertTrue(selectionOptions.is_complete)
+        self.assertEqual([selectionOption.display_name for selectionOption in selectionOptions], [network.title() for network in self.NETWORKS])
+        self.assertEqual(selectionOptions[4].id, "JOIN")
+
+    def test_display_window_fetches_visible_page(self):
+        self._navigator.navigate_to_selected_option()
+        selectionOptions = self._navigator.current_menu_node.selection_options
+        selectionOptions[0]
+        selectionOptions[1]
+        self.assertEqual(self._calls, [(0, 2), (2, 2)]) # one option of look ahead
+
+    def test_page_down_fetches_options(self):
+        self._navigator.navigate_to_selected_option()
+        self._navigator.page_down(3)
+        self.assertEqual(self._navigator.cursor_position, 3)
+        self.assertEqual(self._calls, [(0, 2), (2, 2)])
+        self._navigator.page_down(3)
+        self.assertEqual(self._navigator.cursor_position, 4)
+
+    def test_bottom_fetches_all_options(self):
+        self._navigator.navigate_to_selected_option()
+        self._navigator.bottom()
+        self.assertEqual(self._navigator.cursor_position, 4)
+        self.assertTrue(self._navigator.current_menu_node.selection_options.is_complete)
+
+    def test_selected_value(self):
+        self._navigator.navigate_to_selected_option()
+        self._navigator.scroll_down()
+        self._navigator.navigate_to_selected_option()
+        self.assertEqual(self._navigator.current_menu_node.id, "JOIN")
+        self.assertEqual(self._navigator.selected_value, "office")
+
+        # the value is kept through the confirmation menu
+        self._navigator.navigate_to_confirmation_menu()
+        self._navigator.navigate_to_selected_option()
+        self.assertEqual(self._navigator.selected_value, "office")
+
+        self._navigator.home()
+        self._navigator.scroll_down()
+        self._navigator.navigate_to_selected_option()
+        self.assertIsNone(self._navigator.selected_value)
+
+    def test_options_cached_for_ttl(self):
+        self._navigator.navigate_to_selected_option()
+        self._navigator.home()
+        self._navigator.navigate_to_selected_option()
+        self.assertEqual(self._calls, [(0, 2)])
+
+        with patch('time.monotonic', return_value=time.monotonic()+61):
+            self._navigator.home()
+            self._navigator.navigate_to_selected_option()
+        self.assertEqual(self._calls, [(0, 2), (0, 2)])
+
+    def test_options_kept_per_navigator(self):
+        # two sessions sharing the menus, e.g. under a MenuServer
+        self._navigator.navigate_to_selected_option()
+        self._navigator.bottom()
+
+        self.NETWORKS = ["mobile"]
+        navigator = Navigator(self._menus)
+        with patch('time.monotonic', return_value=time.monotonic()+61):
+            navigator.navigate_to_selected_option()
+        self.assertEqual([selectionOption.display_name for selectionOption in navigator.current_menu_node.selection_options], ["Mobile"])
+
+        self.assertEqual(len(self._navigator.current_menu_node.selection_options), 5)
+        self._navigator.navigate_to_selected_option()
+        self.assertEqual(self._navigator.selected_value, "airport")
+        self.assertFalse(self._menus.get_menu_node("NETWORKS").selection_options.is_complete)
+
+    def test_script_provider(self):
+        self._navigator.scroll_down()
+        self._navigator.navigate_to_selected_option()
+        selectionOptions = self._navigator.current_menu_node.selection_options
+        self.assertEqual(selectionOptions[0].display_name, "line 1")
+        self.assertEqual(len(selectionOptions), 20)
+        self.assertEqual([selectionOption.value for selectionOption in selectionOptions][-1], "no newline")
+        self.assertEqual(len(selectionOptions), 51)
+
+    def test_failing_provider(self):
+        self._navigator.scroll_down()
+        self._navigator.scroll_down()
+        self._navigator.navigate_to_selected_option()
+        selectionOptions = self._navigator.current_menu_node.selection_options
+        self.assertEqual(len(selectionOptions), 1)
+        self.assertEqual(selectionOptions[0].display_name, DynamicSelectionOptions.ERROR_OPTIONS)
+        self._navigator.navigate_to_selected_option()
+        self.assertEqual(self._navigator.current_menu_node.id, "ROOT")
+
+    def test_failed_provider_retried_on_entry(self):
+        networks = self.NETWORKS
+        self.NETWORKS = None # the provider raises
+        self._navigator.navigate_to_selected_option()
+        self.assertEqual(self._navigator.current_menu_node.selection_options[0].display_name, DynamicSelectionOptions.ERROR_OPTIONS)
+
+        self.NETWORKS = networks
+        self._navigator.home()
+        self._navigator.navigate_to_selected_option()
+        self.assertEqual(self._navigator.current_menu_node.selection_options[0].display_name, "Home")
+
+    def test_empty_provider(self):
+        self.NETWORKS = []
+        self._navigator.navigate_to_selected_option()
+        selectionOptions = self._navigator.current_menu_node.selection_options
+        self.assertEqual([selectionOption.display_name for selectionOption in selectionOptions], [DynamicSelectionOptions.NO_OPTIONS])
+
+    def test_no_options_provider(self):
+        menus = Menus("test/test_input_menunode_files/menunodes_dynamic.json")
+        navigator = Navigator(menus)
+        navigator.navigate_to_selected_option()
+        self.assertEqual(navigator.current_menu_node.selection_options[0].display_name, DynamicSelectionOptions.ERROR_OPTIONS)
+
+    def test_index_skips_generated_options(self):
+        self.assertEqual(self._navigator.search("Home"), [])
+        self.assertEqual(self._calls, [])
+
+
+class TestStreamingOutput(unittest.TestCase):
+
+    def test_keeps_last_rows(self):
+        streamingOutput = StreamingOutput(maxRows=2, numColumns=6)
+        streamingOutput.write(b"one\ntwo\nthr")
+        streamingOutput.write(b"ee\nfour")
+        self.assertEqual(streamingOutput.output, b"three four")
+
+    def test_wraps_long_lines(self):
+        streamingOutput = StreamingOutput(maxRows=4, numColumns=4)
+        streamingOutput.write(b"abcdefghij\n")
+        self.assertEqual(streamingOutput.output, b"abcdefghij  ")
+
+    def test_unbounded_columns(self):
+        streamingOutput = StreamingOutput(maxRows=2)
+        streamingOutput.write(b"one\ntwo\nthree\n")
+        self.assertEqual(streamingOutput.output, b"two\nthree")
+
+class TestExecutorSubmit(unittest.TestCase):
+
+    def setUp(self):
+        self._executor = Executor("test/test_input_executor_files/executors_async.json", Path("test/test_input_scripts"), maxWorkers=2)
+        self._releaseMethod = threading.Event()
+
+    def tearDown(self):
+        self._releaseMethod.set()
+        self._executor.shutdown()
+
+    def slow_method(self, **kwargs) -> Executor.ExecutionResult:
+        self._releaseMethod.wait(5)
+        return None
+
+    def test_timeout_from_executor_node(self):
+        executorNode = self._executor._executors["SLEEP"]
+        self.assertEqual(executorNode.timeout, 0.2)
+        self.assertIsNone(self._executor._executors["ECHO"].timeout)
+
+    def test_submit_script(self):
+        handle = self._executor.submit("ECHO")
+        executionResult = handle.result(timeout=5)
+        self.assertTrue(handle.done())
+        self.assertEqual(executionResult.output, b"hello async\n")
+        self.assertEqual(executionResult.return_code, 0)
+        self.assertEqual(executionResult.destination, MenuDestination.POST_EXECUTE_OUTPUT)
+
+    def test_submit_script_streaming(self):
+        progress = []
+        streamingOutput = StreamingOutput(maxRows=4, numColumns=20)
+        handle = self._executor.submit("LINES", streamingOutput=streamingOutput, progressCallback=progress.append)
+        executionResult = handle.result(timeout=5)
+        self.assertEqual(executionResult.return_code, 0)
+        self.assertEqual(executionResult.output, b"line 48".ljust(20)+b"line 49".ljust(20)+b"line 50".ljust(20)+b"no newline")
+        self.assertTrue(len(progress) >= 1)
+        self.assertIs(progress[0], handle)
+
+    def test_submit_script_error(self):
+        executionResult = self._executor.submit("FAIL").result(timeout=5)
+        self.assertEqual(executionResult.return_code, 1)
+        self.assertEqual(executionResult.destination, MenuDestination.POST_EXECUTE_OUTPUT)
+
+    def test_submit_script_timeout(self):
+        handle = self._executor.submit("SLEEP")
+        executionResult = handle.result(timeout=5)
+        self.assertEqual(executionResult.output, "Execution timed out")
+        self.assertEqual(executionResult.return_code, 1)
+
+    def test_run_script_on_start(self):
+        started = []
+        output, returnCode = Executor._run_script("test/test_input_scripts/echo.sh", None, started.append)
+        self.assertEqual((output, returnCode), (b"hello async\n", 0))
+        self.assertEqual(started[0].returncode, 0)
+
+    def test_submit_method_timeout(self):
+        self._executor.register_method(self.slow_method)
+        executionResult = self._executor.submit("METHOD").result(timeout=5)
+        self.assertEqual(executionResult.output, "Execution timed out")
+
+    def test_method_timeout_does_not_block_scripts(self):
+        executor = Executor("test/test_input_executor_files/executors_async.json", Path("test/test_input_scripts"), maxWorkers=1)
+        executor.register_method(self.slow_method)
+        try:
+            self.assertEqual(executor.submit("METHOD").result(timeout=5).output, "Execution timed out")
+            # the method still runs on its worker, the script doesn't wait for it
+            executionResult = executor.submit("ECHO").result(timeout=2)
+            self.assertEqual(executionResult.output, b"hello async\n")
+        finally:
+            self._releaseMethod.set()
+            executor.shutdown()
+
+    def test_execute_async_script(self):
+        executionResult = asyncio.run(self._executor.execute_async("ECHO"))
+        self.assertEqual(executionResult.output, b"hello async\n")
+        self.assertEqual(executionResult.return_code, 0)
+
+    def test_execute_async_script_timeout(self):
+        executionResult = asyncio.run(self._executor.execute_async("SLEEP"))
+        self.assertEqual(executionResult.output, "Execution timed out")
+
+    def test_cancel(self):
+        self._executor.register_method(self.slow_method)
+        handle = self._executor.submit("METHOD")
+        completed = []
+        handle.add_done_callback(completed.append)
+
+        self.assertTrue(handle.cancel())
+        self.assertFalse(handle.cancel())
+        self.assertEqual(handle.result(timeout=0).output, "Execution cancelled")
+        self.assertEqual(handle.result(timeout=0).destination, MenuDestination.HOME)
+        self.assertEqual(completed, [handle])
+
+
+class TestResultCache(unittest.TestCase):
+
+    def result(self, output) -> Executor.ExecutionResult:
+        return Executor.ExecutionResult(output, 0, MenuDestination.POST_EXECUTE_OUTPUT)
+
+    def test_get_put(self):
+        resultCache = ResultCache()
+        self.assertIsNone(resultCache.get("A"))
+        executionResult = self.result(b"output")
+        self.assertTrue(resultCache.put("A", executionResult, ttl=60))
+        self.assertIs(resultCache.get("A"), executionResult)
+        self.assertEqual(resultCache.num_bytes, 6)
+
+    @patch('menu.menus.time.time')
+    def test_expiry(self, mockTime):
+        mockTime.return_value = 1000.0
+        resultCache = ResultCache()
+        resultCache.put("A", self.result(b"output"), ttl=10)
+        mockTime.return_value = 1009.0
+        self.assertIsNotNone(resultCache.get("A"))
+        mockTime.return_value = 1010.0
+        self.assertIsNone(resultCache.get("A"))
+        self.assertEqual(len(resultCache), 0)
+        self.assertEqual(resultCache.num_bytes, 0)
+
+    def test_lru_eviction_by_entries(self):
+        resultCache = ResultCache(maxEntries=2)
+        resultCache.put("A", self.result(b"a"), ttl=60)
+        resultCache.put("B", self.result(b"b"), ttl=60)
+        resultCache.get("A")
+        resultCache.put("C", self.result(b"c"), ttl=60)
+        self.assertIsNotNone(resultCache.get("A"))
+        self.assertIsNone(resultCache.get("B"))
+        self.assertIsNotNone(resultCache.get("C"))
+
+    def test_eviction_by_bytes(self):
+        resultCache = ResultCache(maxBytes=10)
+        resultCache.put("A", self.result(b"aaaaaa"), ttl=60)
+        resultCache.put("B", self.result(b"bbbbbb"), ttl=60)
+        self.assertIsNone(resultCache.get("A"))
+        self.assertEqual(resultCache.num_bytes, 6)
+        self.assertFalse(resultCache.put("C", self.result(b"c"*11), ttl=60))
+        self.assertFalse(resultCache.put("D", self.result(b"dddd"), ttl=60, maxBytes=3))
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "results.json")
+            resultCache = ResultCache(filename=filename)
+            resultCache.put("A", self.result(b"\x00binary"), ttl=60)
+            resultCache.put("B", Executor.ExecutionResult("text", 0, None), ttl=60)
+            resultCache.close()
+
+            loadedCache = ResultCache(filename=filename)
+            self.assertEqual(loadedCache.get("A").output, b"\x00binary")
+            self.assertEqual(loadedCache.get("A").destination, MenuDestination.POST_EXECUTE_OUTPUT)
+            self.assertEqual(loadedCache.get("B").output, "text")
+            self.assertIsNone(loadedCache.get("B").destination)
+
+    def test_puts_saved_once_after_delay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "results.json")
+            resultCache = ResultCache(filename=filename, saveDelay=0.1)
+            with patch.object(ResultCache, '_save', autospec=True, side_effect=ResultCache._save) as save:
+                resultCache.put("A", self.result(b"a"), ttl=60)
+                resultCache.put("B", self.result(b"b"), ttl=60)
+                self.assertFalse(os.path.exists(filename))
+                time.sleep(0.5)
+                save.assert_called_once()
+            self.assertEqual(ResultCache(filename=filename).get("B").output, b"b")
+
+    def test_concurrent_puts_saved(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "results.json")
+            resultCache = ResultCache(filename=filename, saveDelay=0)
+            def put(index):
+                for count in range(20):
+                    resultCache.put(f"{index}-{count}", self.result(b"x"*count), ttl=60)
+                    resultCache.save()
+            threads = [threading.Thread(target=put, args=(index,)) for index in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            resultCache.close()
+
+            self.assertEqual(len(ResultCache(filename=filename)), 60)
+            self.assertEqual(os.listdir(directory), ["results.json"])
+
+    def test_load_corrupt_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "results.json")
+            with open(filename, "w") as cache_file:
+                cache_file.write("not json")
+            self.assertEqual(len(ResultCache(filename=filename)), 0)
+
+
+class TestExecutorResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self._resultCache = ResultCache()
+        self._executor = Executor("test/test_input_executor_files/executors_cached.json", Path("test/test_input_scripts"), resultCache=self._resultCache)
+
+    def tearDown(self):
+        self._executor.shutdown()
+
+    def test_execute_cached(self):
+        first = self._executor.execute("NOW")
+        second = self._executor.execute("NOW")
+        self.assertIs(first, second)
+
+    def test_execute_uncached(self):
+        first = self._executor.execute("UNCACHED")
+        second = self._executor.execute("UNCACHED")
+        self.assertNotEqual(first.output, second.output)
+
+    def test_execute_too_large_for_policy(self):
+        first = self._executor.execute("SHORT")
+        second = self._executor.execute("SHORT")
+        self.assertIsNot(first, second)
+
+    def test_failure_not_cached(self):
+        self._executor.execute("FAIL")
+        self.assertIsNone(self._resultCache.get("FAIL"))
+
+    def test_submit_and_execute_async_use_cache(self):
+        executionResult = self._executor.execute("NOW")
+        handle = self._executor.submit("NOW")
+        self.assertTrue(handle.done())
+        self.assertIs(handle.result(), executionResult)
+        self.assertIs(asyncio.run(self._executor.execute_async("NOW")), executionResult)
+
+    def test_submit_caches_result(self):
+        executionResult = self._executor.submit("NOW").result(timeout=5)
+        self.assertIs(self._executor.execute("NOW"), executionResult)
+
+    def test_warm_cache(self):
+        self._executor.warm_cache().join(5)
+        self.assertIsNotNone(self._resultCache.get("NOW"))
+        self.assertIsNone(self._resultCache.get("UNCACHED"))
+
+    def test_swap_invalidates_changed_nodes(self):
+        self._executor.execute("NOW")
+        executorNodes = dict(self._executor._executors)
+        self._executor.swap_executor_nodes(executorNodes)
+        self.assertIsNotNone(self._resultCache.get("NOW"))
+        executorNodes = {executorNodeId: executorNode for executorNodeId, executorNode in executorNodes.items() if executorNodeId != "NOW"}
+        self._executor.swap_executor_nodes(executorNodes)
+        self.assertIsNone(self._resultCache.get("NOW"))
+
+
+class TestExecutorPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self._executor = Executor("test/test_input_executor_files/executors_prefetch.json", Path("test/test_input_scripts"), maxPrefetches=1)
+
+    def tearDown(self):
+        self._executor.shutdown()
+
+    def test_side_effect_free_flag(self):
+        self.assertTrue(self._executor._executors["NOW"].is_side_effect_free)
+        self.assertFalse(self._executor._executors["UNSAFE"].is_side_effect_free)
+
+    def test_prefetch_not_side_effect_free(self):
+        self.assertFalse(self._executor.prefetch("UNSAFE"))
+        self.assertFalse(self._executor.prefetch("MISSING"))
+
+    def test_prefetch_used_by_execute(self):
+        self.assertTrue(self._executor.prefetch("NOW"))
+        prefetch = self._executor._prefetches["NOW"]
+        prefetchResult = prefetch.result(timeout=5)
+
+        self.assertIs(self._executor.execute("NOW"), prefetchResult)
+        # a prefetch is only used once
+        self.assertNotIn("NOW", self._executor._prefetches)
+
+    def test_prefetch_used_by_submit_and_execute_async(self):
+        self._executor.prefetch("NOW")
+        prefetch = self._executor._prefetches["NOW"]
+        self.assertIs(self._executor.submit("NOW"), prefetch)
+
+        self._executor.prefetch("NOW")
+        prefetchResult = self._executor._prefetches["NOW"].result(timeout=5)
+        self.assertIs(asyncio.run(self._executor.execute_async("NOW")), prefetchResult)
+
+    def test_stale_prefetch_not_used(self):
+        self._executor.prefetch("NOW")
+        prefetchResult = self._executor._prefetches["NOW"].result(timeout=5)
+        with patch.object(Executor, 'PREFETCH_MAX_AGE', 0):
+            time.sleep(0.01)
+            self.assertIsNot(self._executor.execute("NOW"), prefetchResult)
+
+    def test_prefetch_budget(self):
+        self.assertTrue(self._executor.prefetch("SLEEP"))
+        self.assertFalse(self._executor.prefetch("SLEEP2"))
+        # already running
+        self.assertTrue(self._executor.prefetch("SLEEP"))
+
+    def test_cancel_prefetch(self):
+        self._executor.prefetch("SLEEP")
+        prefetch = self._executor._prefetches["SLEEP"]
+        start = time.monotonic()
+        self._executor.cancel_prefetch("SLEEP")
+
+        self.assertEqual(prefetch.result(timeout=5).output, "Execution cancelled")
+        self.assertLess(time.monotonic()-start, 2)
+        # the budget is free again
+        self.assertTrue(self._executor.prefetch("SLEEP2"))
+
+
+class TestExecutorPyScript(unittest.TestCase):
+
+    def setUp(self):
+        self._executor = Executor("test/test_input_executor_files/executors_pyscript.json", Path("test/test_input_scripts"))
+
+    def tearDown(self):
+        self._executor.shutdown()
+
+    def test_execute(self):
+        executionResult = self._executor.execute("HELLO")
+        self.assertEqual(executionResult.output, b"hello hello.py\n")
+        self.assertEqual(executionResult.return_code, 0)
+        self.assertEqual(executionResult.destination, MenuDestination.POST_EXECUTE_OUTPUT)
+
+    def test_execute_failure(self):
+        executionResult = self._executor.execute("EXIT3")
+        self.assertEqual(executionResult.output, "Error executing script")
+        self.assertEqual(executionResult.return_code, 1)
+
+    def test_execute_timeout(self):
+        executionResult = self._executor.execute("SLEEP")
+        self.assertEqual(executionResult.return_code, 1)
+        self.assertEqual(self._executor.execute("HELLO").return_code, 0)
+
+    def test_submit_cancel(self):
+        handle = self._executor.submit("SLEEP")
+        time.sleep(0.1)
+        handle.cancel()
+        self.assertEqual(handle.result(timeout=5).output, "Execution cancelled")
+        self.assertEqual(self._executor.submit("HELLO").result(timeout=5).return_code, 0)
+
+    def test_execute_async(self):
+        executionResult = asyncio.run(self._executor.execute_async("HELLO"))
+        self.assertEqual(executionResult.output, b"hello hello.py\n")
+        executionResult = asyncio.run(self._executor.execute_async("SLEEP"))
+        self.assertEqual(executionResult.output, "Execution timed out")
+
+
+class TestExecutorShellPool(unittest.TestCase):
+
+    def setUp(self):
+        self._shellPool = ShellPool(size=1)
+        self._executor = Executor("test/test_input_executor_files/executors_async.json", Path("test/test_input_scripts"), shellPool=self._shellPool)
+
+    def tearDown(self):
+        self._executor.shutdown()
+
+    def test_execute(self):
+        executionResult = self._executor.execute("ECHO")
+        self.assertEqual(executionResult.output, b"hello async\n")
+        self.assertEqual(executionResult.return_code, 0)
+        self.assertEqual(executionResult.destination, MenuDestination.POST_EXECUTE_OUTPUT)
+        self.assertEqual(self._executor.execute("FAIL").output, "Error executing script")
+
+    def test_execute_timeout(self):
+        self.assertEqual(self._executor.execute("SLEEP").return_code, 1)
+        self.assertEqual(self._executor.execute("ECHO").return_code, 0)
+
+    def test_submit_keeps_shell(self):
+        processes = []
+        for _ in range(2):
+            self.assertEqual(self._executor.submit("ECHO").result(timeout=5).output, b"hello async\n")
+            processes.append(self._shellPool._workers[0].process)
+        self.assertIs(processes[0], processes[1])
+        self.assertIsNone(processes[1].poll())
+
+    def test_submit_cancel(self):
+        handle = self._executor.submit("SLEEP")
+        time.sleep(0.1)
+        handle.cancel()
+        self.assertEqual(handle.result(timeout=5).output, "Execution cancelled")
+        self.assertEqual(self._executor.submit("ECHO").result(timeout=5).return_code, 0)
+
+    def test_execute_async(self):
+        self.assertEqual(asyncio.run(self._executor.execute_async("ECHO")).output, b"hello async\n")
+        self.assertEqual(asyncio.run(self._executor.execute_async("SLEEP")).output, "Execution timed out")
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
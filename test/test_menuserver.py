@@ -0,0 +1,103 @@
+import unittest
+import asyncio
+from pathlib import Path
+
+from menu.menuserver import MenuServer
+from menu.action.asyncmenuaction import AsyncQueueMenuAction
+from menu.action.menuaction import MenuAction
+from menu.display.asyncdisplay import AsyncDisplay
+from menu.menus import Menus, Executor, MenuNode
+
+class RecordingAsyncDisplay(AsyncDisplay):
+
+    def __init__(self):
+        self.frames = []
+        self.frameEvent = asyncio.Event()
+
+    async def display_menu(self, menunode: MenuNode, cursorPos: int):
+        self.frames.append((menunode.id, cursorPos))
+        self.frameEvent.set()
+
+    async def display_output(self, menunode: MenuNode, output: str):
+        self.frames.append((menunode.id, output))
+        self.frameEvent.set()
+
+    async def clear(self):
+        pass
+
+    async def cleanup(self):
+        pass
+
+    async def wait_for(self, frame):
+        while frame not in self.frames:
+            self.frameEvent.clear()
+            await asyncio.wait_for(self.frameEvent.wait(), 5)
+
+
+class TestMenuServer(unittest.TestCase):
+
+    def setUp(self):
+        self._menus = Menus("test/test_input_menunode_files/menunodes_valid_init.json")
+        self._executor = Executor("test/test_input_executor_files/executors_valid_init.json", Path("test-path"))
+        self._server = MenuServer(self._menus, self._executor)
+
+    def test_sessions_are_independent(self):
+
+        display1, menuAction1 = RecordingAsyncDisplay(), AsyncQueueMenuAction()
+        display2, menuAction2 = RecordingAsyncDisplay(), AsyncQueueMenuAction()
+        session1 = self._server.add_session(display1, menuAction1)
+        session2 = self._server.add_session(display2, menuAction2)
+
+        async def scenario():
+            serverTask = asyncio.create_task(self._server.run())
+            await display1.wait_for(("ROOT", 0))
+            await display2.wait_for(("ROOT", 0))
+            menuAction1.put(MenuAction.Action.DOWN)
+            await display1.wait_for(("ROOT", 1))
+            self._server.stop()
+            await asyncio.wait_for(serverTask, 5)
+
+        asyncio.run(scenario())
+
+        self.assertEqual(display2.frames, [("ROOT", 0)])
+        self.assertIs(session1._menus, session2._menus)
+        self.assertIsNot(session1._navigator, session2._navigator)
+
+    def test_session_added_while_running(self):
+
+        display, menuAction = RecordingAsyncDisplay(), AsyncQueueMenuAction()
+
+        async def scenario():
+            serverTask = asyncio.create_task(self._server.run())
+            await asyncio.sleep(0)
+            self._server.add_session(display, menuAction)
+            await display.wait_for(("ROOT", 0))
+            menuAction.put(MenuAction.Action.QUIT)
+            while self._server.sessions:
+                await asyncio.sleep(0.01)
+            self._server.stop()
+            await asyncio.wait_for(serverTask, 5)
+
+        asyncio.run(scenario())
+
+    def test_reload_applies_to_sessions(self):
+
+        display, menuAction = RecordingAsyncDisplay(), AsyncQueueMenuAction()
+        session = self._server.add_session(display, menuAction)
+        reloadedMenus = Menus("test/test_input_menunode_files/menunodes_valid_init.json")
+
+        async def scenario():
+            serverTask = asyncio.create_task(self._server.run())
+            await display.wait_for(("ROOT", 0))
+            self._server.call_in_loop(lambda: self._server.reload(reloadedMenus))
+            while session._menus is not reloadedMenus:
+                await asyncio.sleep(0.01)
+            self._server.stop()
+            await asyncio.wait_for(serverTask, 5)
+
+        asyncio.run(scenario())
+        self.assertIs(session._navigator.current_menu_node, reloadedMenus.get_root_menu_node())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,13 @@
 import unittest
 from unittest.mock import Mock, call
+from queue import Queue
+from pathlib import Path
 
 from menu.menusystem import MenuSystem
-from menu.menus import MenuNode, MenuNodeType, MenuDestination
+from menu.menus import MenuNode, MenuNodeType, MenuDestination, SelectionOption, Menus, Navigator
 from menu.menus import Executor
 from menu.action.menuaction import MenuAction
+from menu.display.headless import HeadlessDisplay
 
 class TestMenuSystem(unittest.TestCase):
 
@@ -174,5 +177,319 @@ class TestMenuSystem(unittest.TestCase):
         mockMenuAction.stop.assert_called()
 
 
+    def test_handle_execution_node_async(self):
+
+        mockMenus=Mock()
+        mockExecutor=Mock()
+        mockNavigator=Mock()
+        mockDisplay = Mock()
+        mockActionQueue = Mock()
+        mockMenuAction = Mock()
+
+        menuSystem = MenuSystem(menus=mockMenus,executor=mockExecutor,navigator=mockNavigator,display=mockDisplay,actionQueue=mockActionQueue,menuAction=mockMenuAction,asyncExecution=True)
+
+        mockHandle = Mock()
+        mockExecutor.submit.return_value = mockHandle
+        executionNode = MenuNode(id="test-id", menuNodeType=MenuNodeType.EXECUTION, selectionOptions=None, confirm=False, executorNodeId="test-executor-node=id", isRoot=False)
+        menuSystem.handle_execution_node(executionNode)
+
+        mockExecutor.execute.assert_not_called()
+        mockNavigator.navigate_to_post_execute_output.assert_called()
+        self.assertEqual(menuSystem._executionResult.output, MenuSystem.RUNNING_OUTPUT)
+
+        # the done callback schedules completion on the event loop
+        doneCallback = mockHandle.add_done_callback.call_args[0][0]
+        doneCallback(mockHandle)
+        mockActionQueue.put.assert_called_with(MenuAction.Action.NONE)
+
+        mockHandle.result.return_value = Executor.ExecutionResult(output="test-output", returnCode=0, postExecuteMenuDestination=MenuDestination.LAST_SELECT_OPTION_MENU)
+        menuSystem.run_callbacks()
+        mockNavigator.navigate_to_last_selection_menu.assert_called()
+        self.assertEqual(menuSystem._executionResult.output, "test-output")
+
+    def test_handle_execution_node_async_confirmed(self):
+
+        mockExecutor=Mock()
+        menuSystem = MenuSystem(menus=Mock(),executor=mockExecutor,navigator=Mock(),display=Mock(),actionQueue=Mock(),menuAction=Mock(),asyncExecution=True)
+
+        confirmNode = MenuNode(id="test-id", menuNodeType=MenuNodeType.EXECUTION, selectionOptions=None, confirm=True, executorNodeId="test-executor-node-id", isRoot=False)
+        menuSystem.handle_execution_node(confirmNode)
+        mockExecutor.submit.assert_not_called()
+
+        # the confirmed executor node is submitted itself so it can be cancelled and timed out
+        yesNode = MenuNode(id="YES", menuNodeType=MenuNodeType.EXECUTION, selectionOptions=None, confirm=False, executorNodeId="YES", isRoot=False)
+        menuSystem.handle_execution_node(yesNode)
+        self.assertEqual(mockExecutor.submit.call_args[0][0], "test-executor-node-id")
+
+    def test_handle_execution_node_streaming(self):
+
+        mockMenus=Mock()
+        mockExecutor=Mock()
+        mockNavigator=Mock()
+        mockDisplay = Mock(num_rows=4, num_columns=20)
+        mockActionQueue = Mock()
+        mockMenuAction = Mock()
+
+        menuSystem = MenuSystem(menus=mockMenus,executor=mockExecutor,navigator=mockNavigator,display=mockDisplay,actionQueue=mockActionQueue,menuAction=mockMenuAction,asyncExecution=True,streamOutput=True)
+
+        mockHandle = Mock()
+        mockHandle.done.return_value = False
+        mockExecutor.submit.return_value = mockHandle
+        executionNode = MenuNode(id="test-id", menuNodeType=MenuNodeType.EXECUTION, selectionOptions=None, confirm=False, executorNodeId="test-executor-node=id", isRoot=False)
+        menuSystem.handle_execution_node(executionNode)
+
+        submitKwargs = mockExecutor.submit.call_args[1]
+        streamingOutput = submitKwargs['streamingOutput']
+        streamingOutput.write(b"partial output")
+        mockHandle.streaming_output = streamingOutput
+
+        submitKwargs['progressCallback'](mockHandle)
+        menuSystem.run_callbacks()
+        self.assertEqual(menuSystem._executionResult.output, b"partial output")
+
+    def test_run_coalesces_queued_actions(self):
+
+        menuNode = MenuNode(id="test-id", menuNodeType=MenuNodeType.SELECTION, selectionOptions=None,confirm=False,executorNodeId=None,isRoot=False)
+
+        mockMenus=Mock()
+        mockExecutor=Mock()
+        mockNavigator=Mock(current_menu_node=menuNode, cursor_position=0)
+        mockDisplay = Mock()
+        actionQueue = Queue()
+        mockMenuAction = Mock()
+
+        menuSystem = MenuSystem(menus=mockMenus,executor=mockExecutor,navigator=mockNavigator,display=mockDisplay,actionQueue=actionQueue,menuAction=mockMenuAction)
+
+        for action in [MenuAction.Action.DOWN, MenuAction.Action.DOWN, MenuAction.Action.NONE, MenuAction.Action.UP, MenuAction.Action.DOWN, MenuAction.Action.QUIT]:
+            actionQueue.put(action)
+
+        menuSystem.run()
+
+        # the run of scrolls is one cursor move by the net number of options
+        mockNavigator.scroll.assert_called_once_with(2)
+        mockNavigator.scroll_down.assert_not_called()
+        mockNavigator.scroll_up.assert_not_called()
+        # the initial display plus one for the whole batch
+        self.assertEqual(mockDisplay.display_menu.call_count, 2)
+        self.assertEqual(actionQueue.unfinished_tasks, 0)
+
+    def test_process_actions_none_does_not_redraw(self):
+
+        mockMenus=Mock()
+        mockExecutor=Mock()
+        mockNavigator=Mock()
+        mockDisplay = Mock()
+        mockActionQueue = Mock()
+        mockMenuAction = Mock()
+
+        menuSystem = MenuSystem(menus=mockMenus,executor=mockExecutor,navigator=mockNavigator,display=mockDisplay,actionQueue=mockActionQueue,menuAction=mockMenuAction)
+
+        self.assertFalse(menuSystem.process_actions([MenuAction.Action.NONE]))
+
+        menuSystem.call_in_loop(lambda: None)
+        self.assertTrue(menuSystem.process_actions([MenuAction.Action.NONE]))
+
+    def test_get_actions_stops_at_quit(self):
+
+        actionQueue = Queue()
+        menuSystem = MenuSystem(menus=Mock(),executor=Mock(),navigator=Mock(),display=Mock(),actionQueue=actionQueue,menuAction=Mock())
+
+        for action in [MenuAction.Action.UP, MenuAction.Action.QUIT, MenuAction.Action.DOWN]:
+            actionQueue.put(action)
+
+        self.assertEqual(menuSystem.get_actions(), [MenuAction.Action.UP, MenuAction.Action.QUIT])
+        self.assertEqual(menuSystem.get_actions(timeout=0), [MenuAction.Action.DOWN])
+        self.assertEqual(menuSystem.get_actions(timeout=0), [])
+
+    def test_reload(self):
+
+        mockMenus=Mock()
+        mockExecutor=Mock()
+        mockNavigator=Mock()
+        mockDisplay = Mock()
+        mockActionQueue = Mock()
+        mockMenuAction = Mock()
+
+        menuSystem = MenuSystem(menus=mockMenus,executor=mockExecutor,navigator=mockNavigator,display=mockDisplay,actionQueue=mockActionQueue,menuAction=mockMenuAction)
+
+        reloadedMenus = Mock()
+        executorNodes = {}
+        menuSystem.reload(reloadedMenus, executorNodes)
+
+        mockNavigator.remap.assert_called_with(reloadedMenus)
+        mockExecutor.swap_executor_nodes.assert_called_with(executorNodes)
+        mockDisplay.invalidate_render_cache.assert_called()
+
+    def test_run_home_cancels_async_execution(self):
+
+        executionNode = MenuNode(id="test-id", menuNodeType=MenuNodeType.EXECUTION, selectionOptions=None, confirm=False, executorNodeId="test-executor-node=id", isRoot=False)
+        outputNode = MenuNode(id="OUTPUT", menuNodeType=MenuNodeType.OUTPUT, selectionOptions=None, confirm=False, executorNodeId=None, isRoot=False)
+
+        mockMenus=Mock()
+        mockExecutor=Mock()
+        mockNavigator=Mock(current_menu_node=outputNode, cursor_position=None)
+        mockDisplay = Mock()
+        mockActionQueue = Mock()
+        mockMenuAction = Mock()
+
+        menuSystem = MenuSystem(menus=mockMenus,executor=mockExecutor,navigator=mockNavigator,display=mockDisplay,actionQueue=mockActionQueue,menuAction=mockMenuAction,asyncExecution=True)
+
+        mockHandle = Mock()
+        mockExecutor.submit.return_value = mockHandle
+        menuSystem.handle_execution_node(executionNode)
+
+        mockActionQueue.get.side_effect = [MenuAction.Action.SELECT, MenuAction.Action.HOME, MenuAction.Action.QUIT]
+        menuSystem.run()
+
+        mockNavigator.navigate_to_selected_option.assert_not_called()
+        mockHandle.cancel.assert_called_once()
+        mockNavigator.home.assert_called()
+
+        # a late result from the cancelled execution is ignored
+        menuSystem.handle_execution_complete(mockHandle)
+        mockHandle.result.assert_not_called()
+
+
+class TestMenuSystemJump(unittest.TestCase):
+
+    def setUp(self):
+        self._menus = Menus("test/test_input_menunode_files/menunodes_search.json")
+        self._navigator = Navigator(self._menus)
+        self._menuSystem = MenuSystem(menus=self._menus,executor=Mock(),navigator=self._navigator,display=Mock(),actionQueue=Queue(),menuAction=Mock())
+
+    def test_jump(self):
+        self.assertTrue(self._menuSystem.jump("sca"))
+        self.assertEqual(self._navigator.current_menu_node.id, "WIFI")
+        self.assertFalse(self._menuSystem.jump("nothing"))
+        self.assertEqual(self._navigator.current_menu_node.id, "WIFI")
+
+    def test_jump_ignored_while_executing(self):
+        self._menuSystem._pendingExecution = Mock()
+        self.assertFalse(self._menuSystem.jump("sca"))
+        self.assertEqual(self._navigator.current_menu_node.id, "ROOT")
+
+
+class TestMenuSystemPaging(unittest.TestCase):
+
+    def test_page_actions(self):
+        menus = Menus("test/test_input_menunode_files/menunodes_search.json")
+        navigator = Navigator(menus)
+        menuSystem = MenuSystem(menus=menus,executor=Mock(),navigator=navigator,display=Mock(page_size=2),actionQueue=Queue(),menuAction=Mock())
+
+        menuSystem.process_actions([MenuAction.Action.RIGHT])
+        self.assertEqual(navigator.cursor_position, 2)
+        menuSystem.process_actions([MenuAction.Action.LEFT])
+        self.assertEqual(navigator.cursor_position, 0)
+        menuSystem.process_actions([MenuAction.Action.BOTTOM])
+        self.assertEqual(navigator.cursor_position, 2)
+        menuSystem.process_actions([MenuAction.Action.TOP])
+        self.assertEqual(navigator.cursor_position, 0)
+
+    def test_page_size_of_unbounded_display(self):
+        menuSystem = MenuSystem(menus=Mock(),executor=Mock(),navigator=Mock(),display=Mock(page_size=None),actionQueue=Queue(),menuAction=Mock())
+        self.assertEqual(menuSystem.page_size(), MenuSystem.PAGE_SIZE)
+
+
+class TestMenuSystemHeadless(unittest.TestCase):
+
+    def test_golden_frames(self):
+        menus = Menus("test/test_input_menunode_files/menunodes_search.json")
+        display = HeadlessDisplay(rows=2, columns=14)
+        menuSystem = MenuSystem(menus=menus,executor=Mock(),navigator=Navigator(menus),display=display,actionQueue=Queue(),menuAction=Mock())
+
+        menuSystem.display()
+        for action in [MenuAction.Action.DOWN, MenuAction.Action.SELECT, MenuAction.Action.BOTTOM, MenuAction.Action.HOME]:
+            menuSystem.process_actions([action])
+            menuSystem.display()
+
+        self.assertEqual([frame.text for frame in display.frames],
+                         [">1: System    \n 2: Network   ",
+                          " 1: System    \n>2: Network   ",
+                          ">1: Ip address\n 2: Wifi      ",
+                          " 1: Ip address\n>2: Wifi      ",
+                          ">1: System    \n 2: Network   "])
+
+
+class TestMenuSystemDynamicOptions(unittest.TestCase):
+
+    def test_selected_value_passed_to_method(self):
+        menus = Menus("test/test_input_menunode_files/menunodes_dynamic.json")
+        executor = Executor("test/test_input_executor_files/executors_dynamic.json", Path("test/test_input_scripts"))
+        connected = []
+        def list_networks(offset, limit):
+            return ["home", "office"][offset:offset+limit]
+        def connect(**kwargs):
+            connected.append(kwargs['selectedValue'])
+        executor.register_method(list_networks)
+        executor.register_method(connect)
+        navigator = Navigator(menus)
+        menuSystem = MenuSystem(menus=menus,executor=executor,navigator=navigator,display=Mock(),actionQueue=Queue(),menuAction=Mock())
+
+        # into the generated networks menu, pick the second network and confirm
+        menuSystem.process_actions([MenuAction.Action.SELECT, MenuAction.Action.DOWN, MenuAction.Action.SELECT])
+        self.assertEqual(navigator.current_menu_node.id, "CONFIRMATION")
+        menuSystem.process_actions([MenuAction.Action.SELECT])
+        self.assertEqual(connected, ["office"])
+        self.assertEqual(navigator.current_menu_node.id, "OUTPUT")
+
+
+class TestMenuSystemPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self._executionNode = MenuNode(id="exec", menuNodeType=MenuNodeType.EXECUTION, selectionOptions=None,confirm=False,executorNodeId="STATUS",isRoot=False)
+        self._confirmNode = MenuNode(id="confirm", menuNodeType=MenuNodeType.EXECUTION, selectionOptions=None,confirm=True,executorNodeId="REBOOT",isRoot=False)
+        self._subMenuNode = MenuNode(id="sub", menuNodeType=MenuNodeType.SELECTION, selectionOptions=[SelectionOption("exec", "Status")],confirm=None,executorNodeId=None,isRoot=False)
+        self._rootNode = MenuNode(id="ROOT", menuNodeType=MenuNodeType.SELECTION,
+                                  selectionOptions=[SelectionOption("exec", "Status"), SelectionOption("confirm", "Reboot"), SelectionOption("sub", "More")],
+                                  confirm=None,executorNodeId=None,isRoot=True)
+        nodes = {node.id: node for node in [self._executionNode, self._confirmNode, self._subMenuNode, self._rootNode]}
+
+        self._mockMenus = Mock()
+        self._mockMenus.get_menu_node.side_effect = lambda menuNodeId: nodes[menuNodeId]
+        self._mockExecutor = Mock()
+        self._mockNavigator = Mock(current_menu_node=self._rootNode, cursor_position=0)
+        self._menuSystem = MenuSystem(menus=self._mockMenus,executor=self._mockExecutor,navigator=self._mockNavigator,display=Mock(),actionQueue=Queue(),
+                                      menuAction=Mock(),prefetch=True,prefetchDelay=0)
+
+    def test_prefetch_target(self):
+        self.assertEqual(self._menuSystem.prefetch_target(), "STATUS")
+        # confirmed executions are never run speculatively
+        self._mockNavigator.cursor_position = 1
+        self.assertIsNone(self._menuSystem.prefetch_target())
+        self._mockNavigator.cursor_position = 2
+        self.assertIsNone(self._menuSystem.prefetch_target())
+
+    def test_update_prefetch_starts_and_cancels(self):
+        self._menuSystem.update_prefetch()
+        self._mockExecutor.prefetch.assert_called_once_with("STATUS")
+
+        # staying on the option doesn't start it again
+        self._menuSystem.update_prefetch()
+        self._mockExecutor.prefetch.assert_called_once_with("STATUS")
+
+        self._mockNavigator.cursor_position = 2
+        self._menuSystem.update_prefetch()
+        self._mockExecutor.cancel_prefetch.assert_called_once_with("STATUS")
+
+    def test_prefetch_waits_for_cursor_to_rest(self):
+        self._menuSystem._prefetchDelay = 60
+        self._menuSystem.update_prefetch()
+        self._mockExecutor.prefetch.assert_not_called()
+        self.assertGreater(self._menuSystem.prefetch_wait(), 0)
+
+    def test_run_prefetches_after_delay(self):
+        actionQueue = Queue()
+        prefetched = []
+        self._mockExecutor.prefetch.side_effect = lambda executorNodeId: prefetched.append(executorNodeId) or actionQueue.put(MenuAction.Action.QUIT)
+        menuSystem = MenuSystem(menus=self._mockMenus,executor=self._mockExecutor,navigator=self._mockNavigator,display=Mock(),actionQueue=actionQueue,
+                                menuAction=Mock(),prefetch=True,prefetchDelay=0.01)
+
+        actionQueue.put(MenuAction.Action.NONE)
+        menuSystem.run()
+
+        self.assertEqual(prefetched, ["STATUS"])
+        self._mockExecutor.cancel_prefetch.assert_called_once_with("STATUS")
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,69 @@
+import unittest
+import os, time
+from subprocess import TimeoutExpired
+
+from menu.pyworker import PyScriptWorker
+
+SCRIPTS = os.path.abspath("test/test_input_scripts")
+
+class TestPyScriptWorker(unittest.TestCase):
+
+    def setUp(self):
+        self._worker = PyScriptWorker(preloadModules=['colorsys', 'module_that_does_not_exist'], maxRuns=3)
+
+    def tearDown(self):
+        self._worker.stop()
+
+    def script(self, name: str) -> str:
+        return os.path.join(SCRIPTS, name)
+
+    def test_run(self):
+        self.assertEqual(self._worker.run(self.script("hello.py")), (b"hello hello.py\n", 0))
+
+    def test_preloaded_modules(self):
+        self.assertEqual(self._worker.run(self.script("preloaded.py")), (b"True\n", 0))
+
+    def test_exit_code(self):
+        self.assertEqual(self._worker.run(self.script("exit3.py")), (b"failing\n", 3))
+
+    def test_exception(self):
+        output, returnCode = self._worker.run(self.script("raise.py"))
+        self.assertEqual(output, b"")
+        self.assertEqual(returnCode, 1)
+
+    def test_missing_script(self):
+        _, returnCode = self._worker.run(self.script("missing.py"))
+        self.assertEqual(returnCode, 1)
+
+    def test_worker_reused_and_recycled(self):
+        pids = [self._worker.run(self.script("workerpid.py"))[0] for _ in range(4)]
+        self.assertEqual(pids[0], pids[1])
+        self.assertEqual(pids[0], pids[2])
+        # replaced after maxRuns
+        self.assertNotEqual(pids[2], pids[3])
+
+    def test_timeout(self):
+        start = time.monotonic()
+        with self.assertRaises(TimeoutExpired):
+            self._worker.run(self.script("sleep.py"), timeout=0.3)
+        self.assertLess(time.monotonic()-start, 2)
+        self.assertIsNone(self._worker.process)
+        # a new worker is started for the next run
+        self.assertEqual(self._worker.run(self.script("hello.py"))[1], 0)
+
+    def test_restart_after_crash(self):
+        self._worker.start()
+        self._worker.process.kill()
+        self._worker.process.wait()
+        self.assertEqual(self._worker.run(self.script("hello.py"))[1], 0)
+
+    def test_killed_during_run(self):
+        processes = []
+        with self.assertRaises(Exception) as ecm:
+            self._worker.run(self.script("sleep.py"), onStart=lambda process: processes.append(process) or process.kill())
+        self.assertEqual(str(ecm.exception), "Python script worker failed")
+        self.assertEqual(len(processes), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from unittest.mock import Mock
+import os, shutil, tempfile
+from pathlib import Path
+
+from menu.menus import Menus, Executor
+from menu.reloader import MenuReloader
+
+class TestMenuReloader(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpDir = tempfile.mkdtemp()
+        self._menuNodesFilename = os.path.join(self._tmpDir, "menunodes.json")
+        self._executorsFilename = os.path.join(self._tmpDir, "executors.json")
+        shutil.copyfile("test/test_input_menunode_files/menunodes_valid_init.json", self._menuNodesFilename)
+        shutil.copyfile("test/test_input_executor_files/executors_valid_init.json", self._executorsFilename)
+
+        self._executor = Executor(self._executorsFilename, Path("test-path"))
+        self._mockMenuSystem = Mock()
+        self._mockMenuSystem.call_in_loop.side_effect = lambda callback: callback()
+        self._reloader = MenuReloader(self._mockMenuSystem, self._executor, self._menuNodesFilename, self._executorsFilename)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpDir)
+
+    def _replace(self, sourceFilename: str, destinationFilename: str):
+        tmpFilename = destinationFilename+".tmp"
+        shutil.copyfile(sourceFilename, tmpFilename)
+        os.replace(tmpFilename, destinationFilename)
+
+    def test_no_change(self):
+        self.assertFalse(self._reloader.check())
+        self._mockMenuSystem.call_in_loop.assert_not_called()
+
+    def test_menu_nodes_changed(self):
+        self._replace("test/test_input_menunode_files/menunodes_valid_init.json", self._menuNodesFilename)
+
+        self.assertTrue(self._reloader.check())
+
+        menus, executorNodes = self._mockMenuSystem.reload.call_args[0]
+        self.assertEqual(menus.get_root_menu_node().id, "ROOT")
+        self.assertIsNone(executorNodes)
+        self.assertFalse(self._reloader.check())
+
+    def test_executors_changed(self):
+        self._replace("test/test_input_executor_files/executors_async.json", self._executorsFilename)
+
+        self.assertTrue(self._reloader.check())
+
+        self._mockMenuSystem.reload.assert_not_called()
+        self.assertIn("ECHO", self._executor._executors)
+
+    def test_menu_problems_logged(self):
+        self.assertEqual(self._reloader.analyze(), [])
+        self._replace("test/test_input_menunode_files/menunodes_valid_init.json", self._menuNodesFilename)
+
+        with self.assertLogs(level='ERROR') as logs:
+            self.assertTrue(self._reloader.check())
+        self.assertIn("Menu problem: error unknown-executor [LAKMYC] Executor node not found: DZPWJB", logs.output[0])
+
+        # only the executor ids changed, the menu nodes are not analyzed again
+        self._replace("test/test_input_executor_files/executors_async.json", self._executorsFilename)
+        with self.assertLogs(level='ERROR') as logs:
+            self.assertTrue(self._reloader.check())
+        self.assertTrue(any("[YUAD5J]" in line for line in logs.output))
+
+    def test_menu_problems_counted_beyond_limit(self):
+        self._reloader.MAX_LOGGED_PROBLEMS = 0
+        self._replace("test/test_input_menunode_files/menunodes_valid_init.json", self._menuNodesFilename)
+
+        with self.assertLogs(level='ERROR') as logs:
+            self.assertTrue(self._reloader.check())
+        self.assertEqual(logs.output, ["ERROR:root:Menu problem: 1 more unknown-executor"])
+
+    def test_start_analyzes_on_reloader_thread(self):
+        reloader = MenuReloader(self._mockMenuSystem, self._executor, self._menuNodesFilename, self._executorsFilename, pollInterval=60)
+        with self.assertLogs(level='ERROR') as logs:
+            reloader.start(Menus(self._menuNodesFilename))
+            reloader.stop()
+        self.assertIn("[LAKMYC]", logs.output[0])
+        self.assertIsNotNone(reloader._analyzer)
+
+    def test_invalid_menu_nodes_kept(self):
+        self._replace("test/test_input_menunode_files/menunodes_invalid_selection_id.json", self._menuNodesFilename)
+
+        self.assertFalse(self._reloader.check())
+        self._mockMenuSystem.call_in_loop.assert_not_called()
+
+    def test_executors_changed_with_invalid_menu_nodes(self):
+        self._replace("test/test_input_menunode_files/menunodes_invalid_selection_id.json", self._menuNodesFilename)
+        self._replace("test/test_input_executor_files/executors_async.json", self._executorsFilename)
+
+        with self.assertLogs(level='ERROR'):
+            self.assertTrue(self._reloader.check())
+
+        self._mockMenuSystem.reload.assert_not_called()
+        self.assertIn("ECHO", self._executor._executors)
+        self.assertFalse(self._reloader.check())
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+import json, os, shutil, tempfile
+
+from menu.menus import Menus, Navigator, MenuNodeType
+from menu.shards import ShardedMenuNodes, load_sharded_menus, split_menu_nodes, shard_filename
+from menu.instrumentation import MetricsInstrumentation
+
+SEARCH_MENU_NODES = "test/test_input_menunode_files/menunodes_search.json"
+
+class TestShards(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpDir = tempfile.mkdtemp()
+        self._shardDir = os.path.join(self._tmpDir, "shards")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpDir)
+
+    def write_shard(self, shardId, menunodes):
+        with open(shard_filename(self._shardDir, shardId), "w") as shard_file:
+            json.dump(menunodes, shard_file)
+
+    def test_split_menu_nodes(self):
+        shardIds = split_menu_nodes(SEARCH_MENU_NODES, self._shardDir)
+        self.assertEqual(sorted(shardIds), ["NET", "ROOT", "SYS"])
+
+        with open(shard_filename(self._shardDir, "SYS")) as shard_file:
+            self.assertEqual(sorted(node['_id_'] for node in json.load(shard_file)), ["DISK", "SYS", "TEMP"])
+        with open(shard_filename(self._shardDir, "ROOT")) as shard_file:
+            rootShardIds = [node['_id_'] for node in json.load(shard_file)]
+        self.assertIn("HELLO", rootShardIds)
+        self.assertIn("ORPHAN", rootShardIds)
+        self.assertIn("CONFIRMATION", rootShardIds)
+
+    def test_sharded_nodes_match_json(self):
+        split_menu_nodes(SEARCH_MENU_NODES, self._shardDir)
+        jsonMenus = Menus(SEARCH_MENU_NODES)
+        shardedNodes = ShardedMenuNodes(self._shardDir)
+
+        self.assertEqual(len(shardedNodes), len(jsonMenus.menu_nodes))
+        for menuNodeId, jsonNode in jsonMenus.menu_nodes.items():
+            shardedNode = shardedNodes[menuNodeId]
+            self.assertEqual(shardedNode.type, jsonNode.type)
+            self.assertEqual(shardedNode.executor_id, jsonNode.executor_id)
+            self.assertEqual(shardedNode.is_root, jsonNode.is_root)
+            self.assertEqual(shardedNode.is_confirm, jsonNode.is_confirm)
+            if jsonNode.selection_options is not None:
+                self.assertEqual([(so.id, so.display_name) for so in shardedNode.selection_options],
+                                 [(so.id, so.display_name) for so in jsonNode.selection_options])
+
+    def test_shards_load_on_navigation(self):
+        split_menu_nodes(SEARCH_MENU_NODES, self._shardDir)
+        menus = load_sharded_menus(self._shardDir)
+        self.assertEqual(menus.menu_nodes.loaded_shards, ["ROOT"])
+
+        navigator = Navigator(menus)
+        navigator.navigate_to_selected_option() # SYS
+        self.assertEqual(navigator.current_menu_node.id, "SYS")
+        self.assertEqual(menus.menu_nodes.loaded_shards, ["ROOT", "SYS"])
+
+        navigator.scroll_down()
+        navigator.scroll_down()
+        navigator.navigate_to_selected_option() # NET
+        self.assertEqual(navigator.current_menu_node.id, "NET")
+        self.assertEqual(menus.menu_nodes.loaded_shards, ["ROOT", "SYS", "NET"])
+        self.assertEqual(menus.get_menu_node("SCAN").type, MenuNodeType.EXECUTION)
+
+    def test_missing_menu_node(self):
+        split_menu_nodes(SEARCH_MENU_NODES, self._shardDir)
+        shardedNodes = ShardedMenuNodes(self._shardDir)
+        self.assertNotIn("BADID", shardedNodes)
+        self.assertNotIn("../ROOT", shardedNodes)
+
+    def test_evicts_least_recently_used_shard(self):
+        split_menu_nodes(SEARCH_MENU_NODES, self._shardDir)
+        instrumentation = MetricsInstrumentation()
+        shardedNodes = ShardedMenuNodes(self._shardDir, maxNodes=12, instrumentation=instrumentation)
+
+        shardedNodes["SYS"]
+        shardedNodes["NET"]
+        self.assertEqual(shardedNodes.loaded_shards, ["ROOT", "NET"])
+        self.assertEqual(instrumentation.counter_value('menu_shard_evictions_total'), 1)
+
+        # a dropped shard is loaded again, also through one of its inner menu nodes
+        self.assertEqual(shardedNodes["DISK"].type, MenuNodeType.EXECUTION)
+        self.assertEqual(shardedNodes.loaded_shards, ["ROOT", "SYS"])
+        self.assertEqual(instrumentation.counter_value('menu_shard_loads_total'), 4)
+
+    def test_invalid_shard_fails_on_first_use(self):
+        split_menu_nodes(SEARCH_MENU_NODES, self._shardDir)
+        self.write_shard("SYS", [{"_id_": "SYS", "type": "selection", "selectionOptions": [{"menuNodeId": "BADID", "displayName": "Bad"}]}])
+
+        shardedNodes = ShardedMenuNodes(self._shardDir)
+        with self.assertRaises(Exception) as context:
+            shardedNodes["SYS"]
+        self.assertIn("Selection Option must have valid menu node id", str(context.exception))
+
+    def test_shard_without_entry_node(self):
+        split_menu_nodes(SEARCH_MENU_NODES, self._shardDir)
+        self.write_shard("SYS", [{"_id_": "DISK", "type": "execution", "executorNodeId": "DISK"}])
+
+        shardedNodes = ShardedMenuNodes(self._shardDir)
+        with self.assertRaises(Exception) as context:
+            shardedNodes["SYS"]
+        self.assertIn("Menu shard must contain its entry menu node", str(context.exception))
+
+    def test_menu_node_in_two_shards(self):
+        split_menu_nodes(SEARCH_MENU_NODES, self._shardDir)
+        self.write_shard("SYS", [{"_id_": "SYS", "type": "selection", "selectionOptions": [{"menuNodeId": "HELLO", "displayName": "Hello"}]},
+                                 {"_id_": "HELLO", "type": "execution", "executorNodeId": "HELLO"}])
+
+        shardedNodes = ShardedMenuNodes(self._shardDir)
+        with self.assertRaises(Exception) as context:
+            shardedNodes["SYS"]
+        self.assertIn("Menu node id found in more than one shard", str(context.exception))
+
+    def test_split_generated_options(self):
+        shardIds = split_menu_nodes("test/test_input_menunode_files/menunodes_dynamic.json", self._shardDir)
+        self.assertEqual(sorted(shardIds), ["BROKEN", "LINES", "NETWORKS", "ROOT"])
+
+        shardedNodes = ShardedMenuNodes(self._shardDir)
+        selectionOptions = shardedNodes["NETWORKS"].selection_options
+        self.assertTrue(shardedNodes["NETWORKS"].is_dynamic)
+        self.assertEqual(selectionOptions.target_id, "JOIN")
+        self.assertEqual(shardedNodes["JOIN"].executor_id, "CONNECT")
+
+    def test_missing_root_shard(self):
+        os.makedirs(self._shardDir)
+        with self.assertRaises(FileNotFoundError):
+            ShardedMenuNodes(self._shardDir)
+
+if __name__ == '__main__':
+    unittest.main()
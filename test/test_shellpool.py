@@ -0,0 +1,78 @@
+import unittest
+import os, threading, time
+from subprocess import TimeoutExpired
+
+from menu.shellpool import ShellPool
+
+SCRIPTS = os.path.abspath("test/test_input_scripts")
+
+class TestShellPool(unittest.TestCase):
+
+    def setUp(self):
+        self._pool = ShellPool(size=2, maxRuns=3)
+
+    def tearDown(self):
+        self._pool.stop()
+
+    def script(self, name: str) -> str:
+        return os.path.join(SCRIPTS, name)
+
+    def test_run(self):
+        self.assertEqual(self._pool.run(self.script("echo.sh")), (b"hello async\n", 0))
+        self.assertEqual(self._pool.run(self.script("lines.sh"))[1], 0)
+
+    def test_exit_code(self):
+        self.assertEqual(self._pool.run(self.script("fail.sh")), (b"", 3))
+
+    def test_missing_script(self):
+        self.assertEqual(self._pool.run(self.script("missing.sh"))[1], 127)
+
+    def test_shell_reused_and_recycled(self):
+        pool = ShellPool(size=1, maxRuns=2)
+        try:
+            pids = []
+            for _ in range(3):
+                pool.run(self.script("echo.sh"), onStart=lambda process: pids.append(process.pid))
+            self.assertEqual(pids[0], pids[1])
+            # replaced after maxRuns
+            self.assertNotEqual(pids[1], pids[2])
+        finally:
+            pool.stop()
+
+    def test_concurrent_runs(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self._pool.run(self.script("echo.sh")))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [(b"hello async\n", 0)]*8)
+
+    def test_timeout(self):
+        start = time.monotonic()
+        with self.assertRaises(TimeoutExpired):
+            self._pool.run(self.script("sleep.sh"), timeout=0.3)
+        self.assertLess(time.monotonic()-start, 2)
+        # a new shell is started for the next run
+        self.assertEqual(self._pool.run(self.script("echo.sh")), (b"hello async\n", 0))
+
+    def test_memory_limit(self):
+        self.assertEqual(self._pool.run(self.script("memory.sh")), (b"allocated 33554432\n", 0))
+        self.assertNotEqual(self._pool.run(self.script("memory.sh"), memoryLimit=16*1024*1024)[1], 0)
+
+        pool = ShellPool(size=1, memoryLimit=16*1024*1024)
+        try:
+            self.assertNotEqual(pool.run(self.script("memory.sh"))[1], 0)
+            self.assertEqual(pool.run(self.script("echo.sh")), (b"hello async\n", 0))
+        finally:
+            pool.stop()
+
+    def test_killed_during_run(self):
+        with self.assertRaises(Exception) as ecm:
+            self._pool.run(self.script("sleep.sh"), onStart=lambda process: os.killpg(process.pid, 9))
+        self.assertEqual(str(ecm.exception), "Shell worker failed")
+        self.assertEqual(self._pool.run(self.script("echo.sh"))[1], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
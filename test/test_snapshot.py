@@ -0,0 +1,88 @@
+import unittest
+import os, shutil, tempfile
+
+from menu.menus import Menus, MenuNodeType
+from menu.snapshot import compile_snapshot, load_menus, SnapshotMenuNodes
+
+VALID_MENU_NODES = "test/test_input_menunode_files/menunodes_valid_init.json"
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpDir = tempfile.mkdtemp()
+        self._menuNodesFilename = os.path.join(self._tmpDir, "menunodes.json")
+        self._snapshotFilename = os.path.join(self._tmpDir, "menunodes.snapshot")
+        shutil.copyfile(VALID_MENU_NODES, self._menuNodesFilename)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpDir)
+
+    def test_snapshot_matches_json(self):
+        compile_snapshot(self._menuNodesFilename, self._snapshotFilename)
+        jsonMenus = Menus(self._menuNodesFilename)
+        snapshotNodes = SnapshotMenuNodes(self._snapshotFilename)
+
+        self.assertEqual(len(snapshotNodes), len(jsonMenus.menu_nodes))
+        self.assertEqual(snapshotNodes.root_node_id, "ROOT")
+        for menuNodeId, jsonNode in jsonMenus.menu_nodes.items():
+            snapshotNode = snapshotNodes[menuNodeId]
+            self.assertEqual(snapshotNode.id, jsonNode.id)
+            self.assertEqual(snapshotNode.type, jsonNode.type)
+            self.assertEqual(snapshotNode.executor_id, jsonNode.executor_id)
+            self.assertEqual(snapshotNode.is_root, jsonNode.is_root)
+            self.assertEqual(snapshotNode.is_confirm, jsonNode.is_confirm)
+            if jsonNode.selection_options is None:
+                self.assertIsNone(snapshotNode.selection_options)
+            else:
+                self.assertEqual([(so.id, so.display_name) for so in snapshotNode.selection_options],
+                                 [(so.id, so.display_name) for so in jsonNode.selection_options])
+
+    def test_snapshot_index_and_rows(self):
+        compile_snapshot(self._menuNodesFilename, self._snapshotFilename, numColumns=10)
+        jsonMenus = Menus(self._menuNodesFilename)
+        snapshotNodes = SnapshotMenuNodes(self._snapshotFilename)
+        menus = Menus.from_menu_nodes(snapshotNodes, snapshotNodes.root_node_id, snapshotNodes.index_data)
+
+        self.assertEqual(menus.index.path_to("YUAD5J"), jsonMenus.index.path_to("YUAD5J"))
+        self.assertEqual([(so.id, so.display_name) for so in menus.index.search("get")], [(so.id, so.display_name) for so in jsonMenus.index.search("get")])
+        self.assertEqual(snapshotNodes.row_geometry, (10, 'ascii'))
+        self.assertEqual(snapshotNodes["ROOT"].selection_options.rows, [b'1: Hello ', b'2: Get Ip'])
+
+    def test_snapshot_missing_node(self):
+        compile_snapshot(self._menuNodesFilename, self._snapshotFilename)
+        snapshotNodes = SnapshotMenuNodes(self._snapshotFilename)
+        self.assertNotIn("BADID", snapshotNodes)
+
+    def test_load_menus_compiles_missing_snapshot(self):
+        menus = load_menus(self._menuNodesFilename, self._snapshotFilename)
+        self.assertTrue(os.path.exists(self._snapshotFilename))
+        self.assertEqual(menus.get_root_menu_node().id, "ROOT")
+
+    def test_load_menus_uses_current_snapshot(self):
+        compile_snapshot(self._menuNodesFilename, self._snapshotFilename)
+        menus = load_menus(self._menuNodesFilename, self._snapshotFilename)
+        self.assertIsInstance(menus.menu_nodes, SnapshotMenuNodes)
+        self.assertEqual(menus.get_menu_node("YUAD5J").type, MenuNodeType.EXECUTION)
+
+    def test_load_menus_stale_snapshot(self):
+        compile_snapshot(self._menuNodesFilename, self._snapshotFilename)
+        with open(self._menuNodesFilename, "a") as menunodes_file:
+            menunodes_file.write("\n")
+
+        menus = load_menus(self._menuNodesFilename, self._snapshotFilename, recompile=False)
+        self.assertNotIsInstance(menus.menu_nodes, SnapshotMenuNodes)
+
+        menus = load_menus(self._menuNodesFilename, self._snapshotFilename)
+        menus = load_menus(self._menuNodesFilename, self._snapshotFilename)
+        self.assertIsInstance(menus.menu_nodes, SnapshotMenuNodes)
+
+
+    def test_load_menus_generated_options(self):
+        shutil.copyfile("test/test_input_menunode_files/menunodes_dynamic.json", self._menuNodesFilename)
+        menus = load_menus(self._menuNodesFilename, self._snapshotFilename)
+        self.assertNotIsInstance(menus.menu_nodes, SnapshotMenuNodes)
+        self.assertTrue(menus.get_menu_node("NETWORKS").is_dynamic)
+        self.assertFalse(os.path.exists(self._snapshotFilename))
+
+if __name__ == '__main__':
+    unittest.main()